@@ -0,0 +1,135 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.views import APIView, Response, status
+
+from apis.permission_control import IsAuthenticated, TokenAuthentication
+from comments.models import Comment
+from comments.serializers import CommentSerializer
+from comments.services import bulk_create_comments
+from likes.counters import TARGETS
+from likes.services import apply_like_operations, visible_targets
+
+ENGAGEMENT_ACTIONS = ('like', 'unlike', 'comment')
+
+
+def _invalid(message):
+    return {'status': 'invalid', 'message': message}
+
+
+def validate_operation(operation):
+    """Check the shape of one engagement operation; returns an error result, or None when it is valid."""
+    if not isinstance(operation, dict):
+        return _invalid('Each operation must be an object.')
+    if operation.get('action') not in ENGAGEMENT_ACTIONS:
+        return _invalid('action must be one of like, unlike or comment.')
+    if operation.get('type') not in TARGETS:
+        return _invalid('type must be one of post, story or comment.')
+    if not isinstance(operation.get('id'), int) or isinstance(operation.get('id'), bool):
+        return _invalid('id must be an integer.')
+    if operation['action'] != 'comment':
+        return None
+
+    if operation['type'] != 'post':
+        return _invalid('Only posts can be commented on.')
+    parent = operation.get('parent')
+    if parent is not None and (not isinstance(parent, int) or isinstance(parent, bool)):
+        return _invalid('parent must be an integer.')
+    serializer = CommentSerializer(data={'text': operation.get('text')})
+    if not serializer.is_valid():
+        return _invalid(serializer.errors)
+    return None
+
+
+class BulkEngagementAPIView(APIView):
+    """
+    API view to apply a batch of likes, unlikes and comments in a single request, e.g. when a client reconnects.
+
+    Permissions:
+        - IsAuthenticated: Only authenticated users can access this endpoint.
+
+    Methods:
+        POST:
+            Applies the operations in order and returns one result per operation.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Handles POST requests to apply a batch of engagement operations.
+
+        Args:
+            request (Request): The HTTP request object. Requires `operations`, a list of at most
+                ENGAGEMENT_MAX_OPERATIONS objects with an `action` (`like`, `unlike` or `comment`),
+                a `type` (`post`, `story` or `comment`) and the `id` of the target. Comments take
+                a `text` and an optional `parent` comment id, and can only be added to posts.
+
+        Returns:
+            Response:
+                - 200 OK: `results`, in the order of the operations, each with the `action`, `type`
+                  and `id` of the operation and a `status`: `applied`, `unchanged` for likes and
+                  unlikes that were already in effect, `invalid` (with a `message`) or `not_found`
+                  when the target does not exist or is not visible to the user. Applied comments
+                  carry the serialized `comment`.
+                - 400 Bad Request: If `operations` is missing, empty or too long.
+        """
+        operations = request.data.get('operations') if isinstance(request.data, dict) else None
+        if not isinstance(operations, list) or not 0 < len(operations) <= settings.ENGAGEMENT_MAX_OPERATIONS:
+            return Response({'message': f'operations must be a list of 1 to {settings.ENGAGEMENT_MAX_OPERATIONS} items'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [validate_operation(operation) for operation in operations]
+        valid = [index for index, result in enumerate(results) if result is None]
+
+        ids = defaultdict(set)
+        for index in valid:
+            ids[operations[index]['type']].add(operations[index]['id'])
+        targets = {}
+        for target_type, target_ids in ids.items():
+            found = visible_targets(request.user, target_type).in_bulk(target_ids)
+            targets.update({(target_type, target_id): target for target_id, target in found.items()})
+        parent_ids = {operations[index].get('parent') for index in valid if operations[index]['action'] == 'comment'}
+        parents = Comment.objects.in_bulk(parent_ids - {None})
+
+        likes, comments = [], []
+        for index in valid:
+            operation = operations[index]
+            target = targets.get((operation['type'], operation['id']))
+            if target is None:
+                results[index] = {'status': 'not_found'}
+            elif operation['action'] != 'comment':
+                likes.append(index)
+            elif operation.get('parent') is None:
+                comments.append((index, None))
+            elif operation['parent'] in parents and parents[operation['parent']].post_id == target.id:
+                comments.append((index, parents[operation['parent']]))
+            else:
+                results[index] = _invalid('parent must be a comment of the same post.')
+
+        with transaction.atomic():
+            changed = apply_like_operations(
+                request.user,
+                [(operations[index]['action'], operations[index]['type'], operations[index]['id']) for index in likes],
+                targets,
+            )
+            created = bulk_create_comments(request.user, [
+                (targets['post', operations[index]['id']], operations[index]['text'], parent)
+                for index, parent in comments
+            ]) if comments else []
+
+        for index, applied in zip(likes, changed):
+            results[index] = {'status': 'applied' if applied else 'unchanged'}
+        for (index, _), comment in zip(comments, created):
+            results[index] = {'status': 'applied', 'comment': CommentSerializer(comment).data}
+
+        return Response({'results': [
+            {
+                'action': operation.get('action') if isinstance(operation, dict) else None,
+                'type': operation.get('type') if isinstance(operation, dict) else None,
+                'id': operation.get('id') if isinstance(operation, dict) else None,
+                **result,
+            }
+            for operation, result in zip(operations, results)
+        ]}, status=status.HTTP_200_OK)
@@ -0,0 +1,96 @@
+from django.conf import settings
+from rest_framework import serializers
+from rest_framework.views import APIView, Response, status
+
+from apis.pagination import KeysetPagination
+from apis.permission_control import IsAuthenticated, TokenAuthentication
+from likes.counters import TARGET_TYPES, TARGETS
+from likes.models import LIKE_MODELS
+from likes.services import like_states, liker_summaries, reflect_pending_like
+
+
+class LikerPagination(KeysetPagination):
+    """
+    Keyset pagination class for liker lists, newest like first.
+    Follows the (target, created_at, user) index of the like tables.
+    """
+    ordering = ('created_at', 'user_id')
+
+
+def liker_list_response(request, target, view=None):
+    """
+    Builds the response of the GET like endpoints of posts, stories and comments.
+
+    Args:
+        request (Request): The HTTP request object. Accepts optional `cursor`, `page_size`
+            and `count_only` query parameters.
+        target (Post | Story | Comment): The liked object, already checked for visibility.
+
+    Returns:
+        Response:
+            - 200 OK: `like_count` alone in count-only mode, read from the denormalized column.
+              Otherwise a page of `{'user', 'created_at'}` entries, where `user` is a compact
+              summary, with `next` and `previous` cursor links.
+            - 404 Not Found: If the object has no likes yet or the cursor is invalid.
+    """
+    target_type = TARGET_TYPES[type(target)]
+    if request.query_params.get('count_only') in ('1', 'true'):
+        data = reflect_pending_like(request.user, target_type, {'id': target.pk, 'like_count': target.like_count})
+        return Response(data, status=status.HTTP_200_OK)
+
+    likes = LIKE_MODELS[target_type].objects.filter(**{target_type: target}).values('created_at', 'user_id')
+    pagination = LikerPagination()
+    page = pagination.paginate_queryset(likes, request, view=view)
+    if not page and not pagination.cursor:
+        return Response({'message': 'There are no likes yet.'}, status=status.HTTP_404_NOT_FOUND)
+
+    users = liker_summaries([row['user_id'] for row in page], request)
+    created_at = serializers.DateTimeField()
+    return pagination.get_paginated_response([
+        {'user': users.get(row['user_id']), 'created_at': created_at.to_representation(row['created_at'])}
+        for row in page
+    ])
+
+
+class LikeStateAPIView(APIView):
+    """
+    API view to read, in one call, whether the current user liked a batch of posts, stories or comments.
+
+    Permissions:
+        - IsAuthenticated: Only authenticated users can access this endpoint.
+
+    Methods:
+        GET:
+            Returns the viewer's like state and the like count of each requested object.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Handles GET requests to read the like state of a batch of objects.
+
+        Args:
+            request (Request): The HTTP request object. Requires the `type` (`post`, `story`
+                or `comment`) and `ids` (comma separated, at most LIKE_STATES_MAX_IDS) query parameters.
+
+        Returns:
+            Response:
+                - 200 OK: `results` with `id`, `viewer_has_liked` and `like_count` for every
+                  requested object the user can see, in the requested order.
+                - 400 Bad Request: If the type is unknown or the ids are missing, invalid or too many.
+        """
+        target_type = request.query_params.get('type')
+        if target_type not in TARGETS:
+            return Response({'message': 'type must be one of post, story or comment'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            ids = [int(value) for value in request.query_params.get('ids', '').split(',') if value]
+        except ValueError:
+            return Response({'message': 'ids must be a comma separated list of integers'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > settings.LIKE_STATES_MAX_IDS:
+            return Response({'message': f'Between 1 and {settings.LIKE_STATES_MAX_IDS} ids are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({'results': like_states(request.user, target_type, ids)}, status=status.HTTP_200_OK)
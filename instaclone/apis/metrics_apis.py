@@ -0,0 +1,49 @@
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView, Response, status
+
+from apis.permission_control import TokenAuthentication
+from apis.post_apis import open_posts_cache
+from likes.buffer import like_buffer
+from posts.audience import story_view_buffer
+from posts.expiry import sweeper_metrics
+from posts.renditions import rendition_metrics
+from posts.timeline import feed_metrics
+from posts.uploads import upload_metrics
+from utils.storage import blob_metrics
+
+
+class MetricsAPIView(APIView):
+    """
+    API view to expose runtime metrics of the feed, response caching, like buffering, story expiry, story view, media rendition, upload and media storage subsystems.
+
+    Permissions:
+        - IsAdminUser: Only staff users can read metrics.
+
+    Methods:
+        GET:
+            Returns the current counters and derived ratios, grouped by subsystem.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        """
+        Handles GET requests to read the current metrics.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            Response:
+                - 200 OK: Metrics grouped by subsystem.
+        """
+        return Response({
+            'feed': feed_metrics(),
+            'open_posts_cache': open_posts_cache.get_metrics(),
+            'like_buffer': like_buffer.get_metrics(),
+            'story_sweeper': sweeper_metrics(),
+            'story_views': story_view_buffer.get_metrics(),
+            'renditions': rendition_metrics(),
+            'uploads': upload_metrics(),
+            'media_blobs': blob_metrics(),
+        }, status=status.HTTP_200_OK)
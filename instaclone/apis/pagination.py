@@ -0,0 +1,140 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination:
+    """
+    Keyset (cursor) pagination over a fixed, newest-first ordering.
+
+    Pages are selected with a `(created_at, id) < (last_created_at, last_id)`
+    filter instead of OFFSET, and no COUNT(*) is issued, so a deep page costs
+    the same as the first one and concurrent inserts never shift a page.
+    Cursors are opaque base64 strings. The page size can be changed with the
+    `page_size` query parameter, up to `max_page_size`.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    ordering = ('created_at', 'id')
+    invalid_cursor_message = 'Invalid cursor.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """
+        Return one page of `queryset`, which must not be ordered by the caller.
+
+        Rows may be model instances or `.values()` dicts as long as they carry
+        every field of `ordering`.
+        """
+        def fetch(position, reverse, limit):
+            rows = queryset
+            if position is not None:
+                rows = rows.filter(self.keyset_filter(position, reverse))
+            return rows.order_by(*self.order_by(reverse))[:limit]
+
+        return self.paginate(fetch, request, queryset.model)
+
+    def paginate(self, fetch, request, model):
+        """
+        Paginate an arbitrary keyset source.
+
+        Args:
+            fetch (callable): `fetch(position, reverse, limit)` returning at most
+                `limit` rows after `position` (newest first, or oldest first when
+                `reverse` is set).
+            request (Request): The HTTP request object.
+            model (Model): Model whose fields are used to decode cursor values.
+
+        Returns:
+            list: The rows of the requested page, newest first.
+        """
+        self.request = request
+        self.limit = self.get_page_size(request)
+        self.cursor = request.query_params.get(self.cursor_query_param)
+        position, reverse = self.decode_cursor(self.cursor, model)
+
+        rows = list(fetch(position, reverse, self.limit + 1))
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+
+        self.next_position = self.get_key(rows[-1]) if rows and self.has_next else None
+        self.previous_position = self.get_key(rows[0]) if rows and self.has_previous else None
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_link(self.next_position, reverse=False),
+            'previous': self.get_link(self.previous_position, reverse=True),
+            'results': data,
+        })
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def order_by(self, reverse=False):
+        prefix = '' if reverse else '-'
+        return [f'{prefix}{field}' for field in self.ordering]
+
+    def keyset_filter(self, position, reverse=False):
+        """Build the row-value comparison `(f1, f2, ...) < (v1, v2, ...)` as a Q object."""
+        lookup = 'gt' if reverse else 'lt'
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            equal = {name: value for name, value in zip(self.ordering[:index], position)}
+            condition |= Q(**equal, **{f'{field}__{lookup}': position[index]})
+        return condition
+
+    def get_key(self, row):
+        if isinstance(row, dict):
+            return tuple(row[field] for field in self.ordering)
+        return tuple(getattr(row, field) for field in self.ordering)
+
+    def encode_cursor(self, position, reverse):
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+        payload = json.dumps({'p': values, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        if not cursor:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            values = payload['p']
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = tuple(
+                self.cursor_value(model, field, value) for field, value in zip(self.ordering, values)
+            )
+            return position, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, binascii.Error, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def cursor_value(self, model, field, value):
+        return model._meta.get_field(field).to_python(value)
+
+    def get_link(self, position, reverse):
+        if position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, self.cursor_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position, reverse))
@@ -8,33 +8,25 @@ from profiles.models import Profile
 from comments.models import Comment
 
 class HeHasPermission(BasePermission):
+    """
+    Privacy check for posts, stories and profiles.
+
+    Visibility is decided in the database with the same EXISTS subquery as
+    `visible_to`, instead of loading the owner's follower list.
+    """
     def has_object_permission(self, request, view, obj):
         if request.user.is_staff:
             return True
-        
-        if isinstance(obj, Story):
-            if obj.profile.profile_status == 'PRIVATE':
-                if request.user != obj.profile.user and request.user not in obj.profile.followers.all():
-                    return False
-            if view.action in ['update', 'partial_update'] and request.user != obj.profile.user:
-                return False
-            return True
 
-        if isinstance(obj, Profile):
-            if obj.profile_status == 'PRIVATE':
-                if request.user != obj.user and request.user not in obj.followers.all():
-                    return False
-            if view.action in ['update', 'partial_update'] and request.user != obj.user:
+        if isinstance(obj, (Post, Story)):
+            if request.method in ['PUT', 'PATCH'] and request.user != obj.user:
                 return False
-            return True
+            return type(obj).objects.visible_to(request.user).filter(pk=obj.pk).exists()
 
-        if isinstance(obj, Post):
-            if obj.profile.profile_status == 'PRIVATE':
-                if request.user != obj.profile.user and request.user not in obj.profile.followers.all():
-                    return False
-            if view.action in ['update', 'partial_update'] and request.user != obj.profile.user:
+        if isinstance(obj, Profile):
+            if request.method in ['PUT', 'PATCH'] and request.user != obj.user:
                 return False
-            return True
+            return obj.is_visible_to(request.user)
         
         return False
 
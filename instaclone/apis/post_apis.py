@@ -1,14 +1,71 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView, Response, status
 
+from apis.like_apis import liker_list_response
+from apis.pagination import KeysetPagination
 from apis.permission_control import HeHasPermission, IsAuthenticated, AllowAny, TokenAuthentication, IsOwner
-from posts.models import Post
-from profiles.models import Profile
+from posts import renditions
+from posts.models import Post, TimelineEntry
+from posts.ranking import ranked_candidates
+from posts.timeline import fan_out_post, read_home_timeline, remove_post
 from comments.models import Comment
-from likes.models import Like
-from likes.serializers import LikeSerializer
+from comments.services import create_comment, delete_comment, update_top_comments
+from likes.services import like, pending_like_vary, reflect_pending_like, toggle_like, unlike, visible_targets
 from posts.serializers import PostSerializer
 from comments.serializers import CommentSerializer
+from utils import versioning
+from utils.background import run_in_background
+from utils.response_cache import GenerationalResponseCache
+
+
+open_posts_cache = GenerationalResponseCache(
+    'open_posts',
+    'posts',
+    timeout=settings.OPEN_POSTS_CACHE_TIMEOUT,
+    stale_timeout=settings.OPEN_POSTS_CACHE_STALE_TIMEOUT,
+    lock_timeout=settings.RESPONSE_CACHE_LOCK_TIMEOUT,
+)
+
+
+class PostPagination(KeysetPagination):
+    """
+    Keyset pagination class for post lists.
+    Pages are keyed on (created_at, id), newest first, with a default page size of 20 and maximum page size of 100.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering = ('created_at', 'id')
+
+
+class TimelinePagination(KeysetPagination):
+    """
+    Keyset pagination class for home timelines.
+    Pages are keyed on (created_at, post_id) of the timeline entries, newest first.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering = ('created_at', 'post_id')
+
+
+class RankedPostPagination(KeysetPagination):
+    """
+    Keyset pagination class for the ranked feed.
+    Pages are keyed on (score, id), highest score first.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering = ('score', 'id')
+
+
+class CommentPagination(KeysetPagination):
+    """
+    Keyset pagination class for comment threads.
+    Pages are keyed on (created_at, id), newest first, following the (post, created_at, id) index of comments.
+    """
+    page_size = 20
+    max_page_size = 100
+    ordering = ('created_at', 'id')
 
 
 # Post APIs
@@ -21,28 +78,84 @@ class OpenPostListAPIView(APIView):
 
     Methods:
         GET:
-            Retrieves all posts from profiles with 'OPEN_PROFILE' status, ordered by creation date (newest first).
-            Returns a serialized list of posts or an error if none exist.
+            Retrieves posts visible to the requesting user, ordered by creation date (newest first).
+            Returns a cursor-paginated list of posts or an error if none exist.
+            Pages served to anonymous callers come from a versioned response cache.
     """
     permission_classes = [AllowAny]
+    pagination_class = PostPagination
 
     def get(self, request):  
         """
         Handles GET requests to retrieve posts from open profiles.
 
         Args:
-            request (Request): The HTTP request object.
+            request (Request): The HTTP request object. Accepts optional `cursor`
+                and `page_size` query parameters.
 
         Returns:
             Response:
-                - 200 OK: A serialized list of posts if any exist.
+                - 200 OK: A page of serialized posts with `next` and `previous` cursor links.
+                - 304 Not Modified: If no post changed since the client's `ETag` / `Last-Modified`.
                 - 400 Bad Request: If no posts are found.
+                - 404 Not Found: If the cursor is invalid.
         """
-        post = Post.objects.filter(profile__profile_status=Profile.OPEN_PROFILE).order_by('-created_at')
-        if post.exists():
-            serializer = PostSerializer(post, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({'message': 'There are no posts available yet.'}, status=status.HTTP_400_BAD_REQUEST)
+        version = versioning.get_list_version('posts')
+        vary = f'{request.user.id}:{request.get_full_path()}'
+        not_modified = versioning.not_modified(request, 'posts', version, vary)
+        if not_modified:
+            return not_modified
+
+        if request.user.is_authenticated:
+            data, token = self.build_page(request), version.token
+        else:
+            data, token = open_posts_cache.get_or_build(self.cache_variant(request), lambda: self.build_page(request))
+        if data is None:
+            return Response({'message': 'There are no posts available yet.'}, status=status.HTTP_400_BAD_REQUEST)
+        response = Response(data, status=status.HTTP_200_OK)
+        if token == version.token:
+            versioning.set_validators(response, 'posts', version, vary)
+        return response
+
+    def cache_variant(self, request):
+        """
+        Builds the response cache key of a page from the decoded cursor and the page size in effect.
+
+        Other query parameters are ignored, so they cannot be used to fill the cache
+        with copies of one page. The host stays in the key because the cursor links
+        in the payload are absolute.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            str: The cache variant of the page.
+
+        Raises:
+            NotFound: If the cursor is invalid.
+        """
+        pagination = self.pagination_class()
+        position, reverse = pagination.decode_cursor(request.query_params.get(pagination.cursor_query_param), Post)
+        cursor = pagination.encode_cursor(position, reverse) if position is not None else ''
+        return f'{request.scheme}://{request.get_host()}|{cursor}|{pagination.get_page_size(request)}'
+
+    def build_page(self, request):
+        """
+        Builds the paginated payload for one page of visible posts.
+
+        Args:
+            request (Request): The HTTP request object.
+
+        Returns:
+            dict: The page payload, or None if there are no posts at all.
+        """
+        posts = Post.objects.visible_to(request.user).values()
+        pagination = self.pagination_class()
+        page = pagination.paginate_queryset(posts, request, view=self)
+        if page or pagination.cursor:
+            serializer = PostSerializer(page, many=True, context={'viewer': request.user})
+            return pagination.get_paginated_response(serializer.data).data
+        return None
 
 
 class PrivatePostListAPIView(APIView):
@@ -55,31 +168,99 @@ class PrivatePostListAPIView(APIView):
 
     Methods:
         GET:
-            Retrieves all posts from profiles with 'OPEN_PROFILE' status, ordered by creation date (newest first).
-            Returns a serialized list of posts or an error if none exist.
+            Retrieves posts visible to the requesting user, ordered by creation date (newest first).
+            Returns a cursor-paginated list of posts or an error if none exist.
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, HeHasPermission]
+    pagination_class = PostPagination
 
     def get(self, request):  
         """
         Handles GET requests to retrieve posts from open profiles for authorized users.
 
         Args:
-            request (Request): The HTTP request object.
+            request (Request): The HTTP request object. Accepts optional `cursor`
+                and `page_size` query parameters.
 
         Returns:
             Response:
-                - 200 OK: A serialized list of posts if any exist.
+                - 200 OK: A page of serialized posts with `next` and `previous` cursor links.
+                - 304 Not Modified: If no post changed since the client's `ETag` / `Last-Modified`.
                 - 400 Bad Request: If no posts are found.
-        """
-        post = Post.objects.filter(profile__profile_status=Profile.OPEN_PROFILE).order_by('-created_at')
-        if post.exists():
-            serializer = PostSerializer(post, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+                - 404 Not Found: If the cursor is invalid.
+        """
+        version = versioning.get_list_version('posts')
+        vary = f'{request.user.id}:{request.get_full_path()}'
+        not_modified = versioning.not_modified(request, 'posts', version, vary)
+        if not_modified:
+            return not_modified
+
+        posts = Post.objects.visible_to(request.user).values()
+        pagination = self.pagination_class()
+        page = pagination.paginate_queryset(posts, request, view=self)
+        if page or pagination.cursor:
+            serializer = PostSerializer(page, many=True, context={'viewer': request.user})
+            return versioning.set_validators(pagination.get_paginated_response(serializer.data), 'posts', version, vary)
         return Response({'message': 'There are no posts available yet.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class HomeFeedAPIView(APIView):
+    """
+    API view to retrieve the authenticated user's home timeline.
+
+    Permissions:
+        - IsAuthenticated: Requires user authentication.
+
+    Methods:
+        GET:
+            Retrieves the posts pushed into the user's timeline by the accounts they follow,
+            merged with the recent posts of followed high-follower accounts,
+            ordered by creation date (newest first).
+            With `mode=ranked`, retrieves the same accounts' posts of the last FEED_RANKED_MAX_AGE
+            seconds ordered by engagement score.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = TimelinePagination
+    ranked_pagination_class = RankedPostPagination
+
+    def get(self, request):
+        """
+        Handles GET requests to read a page of the home timeline.
+
+        Args:
+            request (Request): The HTTP request object. Accepts optional `mode`
+                (`chronological` or `ranked`), `cursor` and `page_size` query parameters.
+
+        Returns:
+            Response:
+                - 200 OK: A page of serialized posts with `next` and `previous` cursor links.
+                - 404 Not Found: If the cursor is invalid.
+        """
+        if request.query_params.get('mode') == 'ranked':
+            pagination = self.ranked_pagination_class()
+            page = pagination.paginate_queryset(ranked_candidates(request.user).values(), request, view=self)
+            serializer = PostSerializer(page, many=True, context={'viewer': request.user})
+            return pagination.get_paginated_response(serializer.data)
+
+        pagination = self.pagination_class()
+        page = pagination.paginate(
+            lambda position, reverse, limit: read_home_timeline(request.user, position, reverse, limit),
+            request,
+            TimelineEntry,
+        )
+        # Entries pushed before an unfollow, or before an account went private, are not shown.
+        visible = Post.objects.visible_to(request.user).filter(id__in=[entry['post_id'] for entry in page])
+        posts = {post['id']: post for post in visible.values()}
+        serializer = PostSerializer(
+            [posts[entry['post_id']] for entry in page if entry['post_id'] in posts],
+            many=True,
+            context={'viewer': request.user},
+        )
+        return pagination.get_paginated_response(serializer.data)
+
+
 class PrivatePostDetailAPIView(APIView):
     """
     API view to retrieve, update, or delete a specific post for authorized users.
@@ -112,14 +293,18 @@ class PrivatePostDetailAPIView(APIView):
                 - 200 OK: Serialized post data.
                 - 404 Not Found: If the post does not exist.
         """
-        post = get_object_or_404(Post, id=post_id)
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
         serializer = PostSerializer(post)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = reflect_pending_like(request.user, 'post', serializer.data)
+        return Response(data, status=status.HTTP_200_OK)
 
     def patch(self, request, post_id, *args, **kwargs):
         """
         Handles PATCH requests to partially update a specific post's caption.
 
+        A new `image` drops the renditions of the old one and is rendered again
+        in the background, like a new upload.
+
         Args:
             request (Request): The HTTP request object containing update data.
             post_id (int): The ID of the post to update.
@@ -136,7 +321,10 @@ class PrivatePostDetailAPIView(APIView):
         caption_data = {'caption': request.data.get('caption', post.caption)}
         serializer = PostSerializer(post, data=request.data, partial=True)
         if serializer.is_valid():
+            replaced = post.renditions
             serializer.save()
+            if 'image' in serializer.validated_data:
+                renditions.schedule(post, replaced)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -158,6 +346,7 @@ class PrivatePostDetailAPIView(APIView):
         if post.user != request.user:
             return Response({'message': 'You are not authorized.'}, status=status.HTTP_400_BAD_REQUEST)
         post.delete()
+        run_in_background(remove_post, post_id, post.user_id)
         return Response({'message': 'Post deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -190,16 +379,27 @@ class OpenPostDetailAPIView(APIView):
         Returns:
             Response:
                 - 200 OK: Serialized post data.
+                - 304 Not Modified: If the post has not changed since the client's `ETag` / `Last-Modified`.
                 - 404 Not Found: If the post does not exist.
         """
-        post = get_object_or_404(Post, id=post_id)
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        version = versioning.get_version('post', post.id)
+        vary = pending_like_vary(request.user, 'post', post.id)
+        not_modified = versioning.not_modified(request, 'post', version, vary)
+        if not_modified:
+            return not_modified
+
         serializer = PostSerializer(post)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = reflect_pending_like(request.user, 'post', serializer.data)
+        return versioning.set_validators(Response(data, status=status.HTTP_200_OK), 'post', version, vary)
 
     def patch(self, request, post_id, *args, **kwargs):
         """
         Handles PATCH requests to partially update a specific post's caption.
 
+        A new `image` drops the renditions of the old one and is rendered again
+        in the background, like a new upload.
+
         Args:
             request (Request): The HTTP request object containing update data.
             post_id (int): The ID of the post to update.
@@ -216,7 +416,10 @@ class OpenPostDetailAPIView(APIView):
         caption_data = {'caption': request.data.get('caption', post.caption)}
         serializer = PostSerializer(post, data=request.data, partial=True)
         if serializer.is_valid():
+            replaced = post.renditions
             serializer.save()
+            if 'image' in serializer.validated_data:
+                renditions.schedule(post, replaced)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -238,6 +441,7 @@ class OpenPostDetailAPIView(APIView):
         if post.user != request.user:
             return Response({'message': 'You are not authorized.'}, status=status.HTTP_400_BAD_REQUEST)
         post.delete()
+        run_in_background(remove_post, post_id, post.user_id)
         return Response({'message': 'Post deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -259,6 +463,10 @@ class PostCreateAPIView(APIView):
         """
         Handles POST requests to create a new post.
 
+        The post is pushed into the followers' home timelines by a background task,
+        so publishing does not wait for the fan-out. Image renditions are rendered
+        in the background too; `media_status` tells when they are ready.
+
         Args:
             request (Request): The HTTP request object containing post data.
 
@@ -269,7 +477,9 @@ class PostCreateAPIView(APIView):
         """
         serializer = PostSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            post = serializer.save(user=request.user)
+            run_in_background(fan_out_post, post.id)
+            renditions.schedule(post)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -284,6 +494,10 @@ class OpenPostLikeAPIView(APIView):
     Methods:
         POST:
             Toggles like status for a specific post.
+        PUT:
+            Likes a specific post; safe to retry.
+        DELETE:
+            Removes the like of a specific post; safe to retry.
         GET:
             Retrieves a list of likes for a specific post.
     """
@@ -303,21 +517,45 @@ class OpenPostLikeAPIView(APIView):
                 - 200 OK: Confirmation message if like is added or removed.
                 - 404 Not Found: If the post does not exist.
         """
-        post = get_object_or_404(Post, id=post_id)
-        user = request.user
-        like_instance = Like.objects.filter(user=user, post=post).first()
-
-        if like_instance:
-            like_instance.delete()
-            post.like_count = max(0, post.like_count - 1)
-            post.save()
-            return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
-
-        Like.objects.create(user=user, post=post)
-        post.like_count += 1
-        post.save()
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        if toggle_like(request.user, post):
+            return Response({'detail': 'Post liked'}, status=status.HTTP_200_OK)
+        return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
+
+    def put(self, request, post_id):
+        """
+        Handles PUT requests to like a post. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            post_id (int): The ID of the post to like.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the post was already liked.
+                - 404 Not Found: If the post does not exist.
+        """
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        like(request.user, post)
         return Response({'detail': 'Post liked'}, status=status.HTTP_200_OK)
 
+    def delete(self, request, post_id):
+        """
+        Handles DELETE requests to remove the like of a post. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            post_id (int): The ID of the post to unlike.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the post was liked.
+                - 404 Not Found: If the post does not exist.
+        """
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        unlike(request.user, post)
+        return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
+
     def get(self, request, post_id):
         """
         Handles GET requests to retrieve likes for a specific post.
@@ -328,15 +566,12 @@ class OpenPostLikeAPIView(APIView):
 
         Returns:
             Response:
-                - 200 OK: A serialized list of likes if any exist.
-                - 404 Not Found: If no likes are found or the post does not exist.
+                - 200 OK: A page of likers (see `liker_list_response`), or the like count
+                  when `count_only` is set.
+                - 404 Not Found: If no likes are found, the cursor is invalid or the post does not exist.
         """
-        post = get_object_or_404(Post, id=post_id)
-        likes = Like.objects.filter(post=post)
-        if likes.exists():
-            serializer = LikeSerializer(likes, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({'message': 'There are no likes yet.'}, status=status.HTTP_404_NOT_FOUND)
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        return liker_list_response(request, post, view=self)
 
 
 class PrivatePostLikeAPIView(APIView):
@@ -350,6 +585,10 @@ class PrivatePostLikeAPIView(APIView):
     Methods:
         POST:
             Toggles like status for a specific post.
+        PUT:
+            Likes a specific post; safe to retry.
+        DELETE:
+            Removes the like of a specific post; safe to retry.
         GET:
             Retrieves a list of likes for a specific post.
     """
@@ -369,21 +608,45 @@ class PrivatePostLikeAPIView(APIView):
                 - 200 OK: Confirmation message if like is added or removed.
                 - 404 Not Found: If the post does not exist.
         """
-        post = get_object_or_404(Post, id=post_id)
-        user = request.user
-        like_instance = Like.objects.filter(user=user, post=post).first()
-
-        if like_instance:
-            like_instance.delete()
-            post.like_count = max(0, post.like_count - 1)
-            post.save()
-            return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
-
-        Like.objects.create(user=user, post=post)
-        post.like_count += 1
-        post.save()
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        if toggle_like(request.user, post):
+            return Response({'detail': 'Post liked'}, status=status.HTTP_200_OK)
+        return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
+
+    def put(self, request, post_id):
+        """
+        Handles PUT requests to like a post. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            post_id (int): The ID of the post to like.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the post was already liked.
+                - 404 Not Found: If the post does not exist.
+        """
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        like(request.user, post)
         return Response({'detail': 'Post liked'}, status=status.HTTP_200_OK)
 
+    def delete(self, request, post_id):
+        """
+        Handles DELETE requests to remove the like of a post. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            post_id (int): The ID of the post to unlike.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the post was liked.
+                - 404 Not Found: If the post does not exist.
+        """
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        unlike(request.user, post)
+        return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
+
     def get(self, request, post_id):
         """
         Handles GET requests to retrieve likes for a specific post.
@@ -394,15 +657,12 @@ class PrivatePostLikeAPIView(APIView):
 
         Returns:
             Response:
-                - 200 OK: A serialized list of likes if any exist.
-                - 404 Not Found: If no likes are found or the post does not exist.
+                - 200 OK: A page of likers (see `liker_list_response`), or the like count
+                  when `count_only` is set.
+                - 404 Not Found: If no likes are found, the cursor is invalid or the post does not exist.
         """
-        post = get_object_or_404(Post, id=post_id)
-        likes = Like.objects.filter(post=post)
-        if likes.exists():
-            serializer = LikeSerializer(likes, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({'message': 'There are no likes yet.'}, status=status.HTTP_404_NOT_FOUND)
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        return liker_list_response(request, post, view=self)
 
 
 class PostCommentManagementSection(APIView):
@@ -417,7 +677,7 @@ class PostCommentManagementSection(APIView):
         POST:
             Creates a new comment for a specific post.
         GET:
-            Retrieves all comments for a specific post.
+            Retrieves a page of comments, or of replies to a comment, for a specific post.
         PATCH:
             Updates a specific comment, restricted to the owner.
         DELETE:
@@ -425,46 +685,63 @@ class PostCommentManagementSection(APIView):
     """
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated, IsOwner]
+    pagination_class = CommentPagination
 
     def post(self, request, post_id):
         """
         Handles POST requests to create a new comment on a post.
 
         Args:
-            request (Request): The HTTP request object containing comment data.
+            request (Request): The HTTP request object containing comment data. An optional
+                `parent` comment ID makes the comment a reply; replies to replies join the
+                top-level thread.
             post_id (int): The ID of the post to comment on.
 
         Returns:
             Response:
                 - 201 Created: Serialized comment data if creation is successful.
-                - 400 Bad Request: If the data is invalid.
-                - 404 Not Found: If the post does not exist.
+                - 400 Bad Request: If the data or the `parent` ID is invalid.
+                - 404 Not Found: If the post or the parent comment does not exist.
         """
         serializer = CommentSerializer(data=request.data)  
-        post = get_object_or_404(Post, id=post_id)
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        parent = request.data.get('parent')
+        if parent is not None:
+            if not str(parent).isdigit():
+                return Response({'parent': ['A valid comment ID is required.']}, status=status.HTTP_400_BAD_REQUEST)
+            parent = get_object_or_404(Comment, id=parent, post=post)
         if serializer.is_valid():
-            serializer.save(user=request.user, post=post)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            comment = create_comment(serializer, request.user, post, parent)
+            return Response(CommentSerializer(comment).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     def get(self, request, post_id):
         """
-        Handles GET requests to retrieve all comments for a post.
+        Handles GET requests to retrieve a page of comments for a post, newest first.
 
         Args:
-            request (Request): The HTTP request object.
+            request (Request): The HTTP request object. Accepts optional `parent` (a comment ID,
+                to list its replies instead of the top-level comments), `cursor` and `page_size`
+                query parameters.
             post_id (int): The ID of the post to retrieve comments for.
 
         Returns:
             Response:
-                - 200 OK: A serialized list of comments if any exist.
-                - 404 Not Found: If no comments are found or the post does not exist.
-        """
-        post = get_object_or_404(Post, id=post_id)
-        comments = Comment.objects.filter(post=post)
-        if comments.exists():
-            serializer = CommentSerializer(comments, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+                - 200 OK: A page of serialized comments, each with its reply `comment_count`,
+                  and `next` / `previous` cursor links.
+                - 400 Bad Request: If `parent` is not a comment ID.
+                - 404 Not Found: If no comments are found, the cursor is invalid or the post does not exist.
+        """
+        post = get_object_or_404(Post.objects.visible_to(request.user), id=post_id)
+        parent = request.query_params.get('parent')
+        if parent is not None and not parent.isdigit():
+            return Response({'parent': ['A valid comment ID is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        comments = Comment.objects.filter(post=post, parent_id=parent).values()
+        pagination = self.pagination_class()
+        page = pagination.paginate_queryset(comments, request, view=self)
+        if page or pagination.cursor:
+            serializer = CommentSerializer(page, many=True, context={'viewer': request.user})
+            return pagination.get_paginated_response(serializer.data)
         return Response({'message': 'There are no comments yet.'}, status=status.HTTP_404_NOT_FOUND)
 
     def patch(self, request, comment_id):
@@ -479,14 +756,15 @@ class PostCommentManagementSection(APIView):
             Response:
                 - 200 OK: Updated serialized comment data if successful.
                 - 400 Bad Request: If the user is unauthorized or data is invalid.
-                - 404 Not Found: If the comment does not exist.
+                - 404 Not Found: If the comment does not exist or is on a post the user cannot see.
         """
-        comment = get_object_or_404(Comment, id=comment_id)
+        comment = get_object_or_404(visible_targets(request.user, 'comment'), id=comment_id)
         if comment.user != request.user:
             return Response({'message': 'You are not authorized.'}, status=status.HTTP_400_BAD_REQUEST)
         serializer = CommentSerializer(comment, data=request.data, partial=True)
         if serializer.is_valid():
             serializer.save()
+            update_top_comments(comment.id)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -500,14 +778,14 @@ class PostCommentManagementSection(APIView):
 
         Returns:
             Response:
-                - 204 No Content: If the comment is deleted successfully.
+                - 204 No Content: If the comment and its replies are deleted successfully.
                 - 400 Bad Request: If the user is unauthorized.
-                - 404 Not Found: If the comment does not exist.
+                - 404 Not Found: If the comment does not exist or is on a post the user cannot see.
         """
-        comment = get_object_or_404(Comment, id=comment_id)
+        comment = get_object_or_404(visible_targets(request.user, 'comment'), id=comment_id)
         if comment.user != request.user:
             return Response({'message': 'You are not authorized.'}, status=status.HTTP_400_BAD_REQUEST)
-        comment.delete()
+        delete_comment(comment)
         return Response({'message': 'Comment deleted successfully.'}, status=status.HTTP_204_NO_CONTENT)
 
 
@@ -521,6 +799,10 @@ class CommentLikeAPIView(APIView):
     Methods:
         POST:
             Toggles like status for a specific comment.
+        PUT:
+            Likes a specific comment; safe to retry.
+        DELETE:
+            Removes the like of a specific comment; safe to retry.
         GET:
             Retrieves a list of likes for a specific comment.
     """
@@ -538,23 +820,47 @@ class CommentLikeAPIView(APIView):
         Returns:
             Response:
                 - 200 OK: Confirmation message if like is added or removed.
-                - 404 Not Found: If the comment does not exist.
+                - 404 Not Found: If the comment does not exist or is on a post the user cannot see.
         """
-        comment = get_object_or_404(Comment, id=comment_id)
-        user = request.user
-        like_instance = Like.objects.filter(user=user, comment=comment).first()
+        comment = get_object_or_404(visible_targets(request.user, 'comment'), id=comment_id)
+        if toggle_like(request.user, comment):
+            return Response({'detail': 'Comment liked'}, status=status.HTTP_200_OK)
+        return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
 
-        if like_instance:
-            like_instance.delete()
-            comment.like_count = max(0, comment.like_count - 1)
-            comment.save()
-            return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
+    def put(self, request, comment_id):
+        """
+        Handles PUT requests to like a comment. Repeating the request has no further effect.
 
-        Like.objects.create(user=user, comment=comment)
-        comment.like_count += 1
-        comment.save()
+        Args:
+            request (Request): The HTTP request object.
+            comment_id (int): The ID of the comment to like.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the comment was already liked.
+                - 404 Not Found: If the comment does not exist or is on a post the user cannot see.
+        """
+        comment = get_object_or_404(visible_targets(request.user, 'comment'), id=comment_id)
+        like(request.user, comment)
         return Response({'detail': 'Comment liked'}, status=status.HTTP_200_OK)
 
+    def delete(self, request, comment_id):
+        """
+        Handles DELETE requests to remove the like of a comment. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            comment_id (int): The ID of the comment to unlike.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the comment was liked.
+                - 404 Not Found: If the comment does not exist or is on a post the user cannot see.
+        """
+        comment = get_object_or_404(visible_targets(request.user, 'comment'), id=comment_id)
+        unlike(request.user, comment)
+        return Response({'detail': 'Like removed'}, status=status.HTTP_200_OK)
+
     def get(self, request, comment_id):
         """
         Handles GET requests to retrieve likes for a specific comment.
@@ -565,12 +871,9 @@ class CommentLikeAPIView(APIView):
 
         Returns:
             Response:
-                - 200 OK: A serialized list of likes if any exist.
-                - 404 Not Found: If no likes are found or the comment does not exist.
+                - 200 OK: A page of likers (see `liker_list_response`), or the like count
+                  when `count_only` is set.
+                - 404 Not Found: If no likes are found, the cursor is invalid or the comment is not visible to the user.
         """
-        comment = get_object_or_404(Comment, id=comment_id)
-        likes = Like.objects.filter(comment=comment)
-        if likes.exists():
-            serializer = LikeSerializer(likes, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({'message': 'There are no likes yet.'}, status=status.HTTP_404_NOT_FOUND)
\ No newline at end of file
+        comment = get_object_or_404(visible_targets(request.user, 'comment'), id=comment_id)
+        return liker_list_response(request, comment, view=self)
\ No newline at end of file
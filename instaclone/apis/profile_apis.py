@@ -5,6 +5,7 @@ from rest_framework.pagination import PageNumberPagination
 from apis.permission_control import HeHasPermission, IsAuthenticated, AllowAny, TokenAuthentication
 from profiles.models import Profile
 from profiles.serializers import ProfileSerializer
+from utils import versioning
 
 
 class ProfilePagination(PageNumberPagination):
@@ -75,13 +76,19 @@ class ProfileDetailAPIView(APIView):
 
         Returns:
             - 200 OK: Profile data.
+            - 304 Not Modified: If the profile has not changed since the client's `ETag` / `Last-Modified`.
             - 403 Forbidden: If the user is not authorized to view the profile.
         """
         profile = get_object_or_404(Profile, id=profile_id)
-        if request.user == profile.user or profile.profile_status == Profile.OPEN_PROFILE or request.user in profile.followers.all():
-            serializer = ProfileSerializer(profile)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-        return Response({'Message':'You are not authorized to view this profile.'}, status=status.HTTP_403_FORBIDDEN)
+        if not profile.is_visible_to(request.user):
+            return Response({'Message':'You are not authorized to view this profile.'}, status=status.HTTP_403_FORBIDDEN)
+        version = versioning.get_version('profile', profile.id)
+        not_modified = versioning.not_modified(request, 'profile', version)
+        if not_modified:
+            return not_modified
+
+        serializer = ProfileSerializer(profile)
+        return versioning.set_validators(Response(serializer.data, status=status.HTTP_200_OK), 'profile', version)
     
     def post(self, request, profile_id):
         """
@@ -150,7 +157,7 @@ class ProfileFollowerListAPIView(APIView):
         """
         profile = get_object_or_404(Profile, id=profile_id)
         pagination = self.pagination_class
-        if request.user == profile.user or profile.profile_status == Profile.OPEN_PROFILE or request.user in profile.followers.all():
+        if profile.is_visible_to(request.user):
             followers = profile.followers.all()
             result_page = pagination.paginate_queryset(followers)
             serializer = ProfileSerializer(result_page, many=True)
@@ -185,7 +192,7 @@ class ProfileFollowingListAPIView(APIView):
         """
         profile = get_object_or_404(Profile, id=profile_id)
         pagination = self.pagination_class
-        if request.user == profile.user or profile.profile_status == Profile.OPEN_PROFILE or request.user in profile.followers.all():
+        if profile.is_visible_to(request.user):
             followings = profile.followings.all()
             result_page = pagination.paginate_queryset(followings)
             serializer = ProfileSerializer(result_page, many=True)
@@ -0,0 +1,84 @@
+from rest_framework.views import APIView, Response, status
+
+from apis.pagination import KeysetPagination
+from apis.permission_control import IsAuthenticated, TokenAuthentication
+from comments.serializers import CommentSerializer
+from posts import search
+from posts.serializers import PostSerializer, StorySerializer
+
+SEARCH_SERIALIZERS = {'post': PostSerializer, 'story': StorySerializer, 'comment': CommentSerializer}
+
+
+class SearchPagination(KeysetPagination):
+    """
+    Keyset pagination class for search results, best BM25 match first.
+    Pages are keyed on the (rank, rowid) of the full-text index, so no OFFSET is ever scanned.
+    """
+    ordering = ('rank', 'rowid')
+
+    def cursor_value(self, model, field, value):
+        return float(value) if field == 'rank' else int(value)
+
+
+class ContentSearchAPIView(APIView):
+    """
+    API view to search post captions, story captions and comments by their text.
+
+    Permissions:
+        - IsAuthenticated: Only authenticated users can access this endpoint.
+
+    Methods:
+        GET:
+            Returns the matches the user is allowed to see, ranked by relevance.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+    pagination_class = SearchPagination
+
+    def get(self, request):
+        """
+        Handles GET requests to run a full-text search.
+
+        Args:
+            request (Request): The HTTP request object. Requires the `query` query parameter;
+                every word of it must match. Accepts an optional `type` (comma separated
+                `post`, `story` and `comment`, all by default), `cursor` and `page_size`.
+
+        Returns:
+            Response:
+                - 200 OK: A page of `{'type', 'object'}` entries, best match first, where `object`
+                  is the serialized post, story or comment, with `next` and `previous` cursor links.
+                  Private content is only returned to the owner and the followers of its author.
+                - 400 Bad Request: If the query has no words or the type is unknown.
+                - 404 Not Found: If nothing matches or the cursor is invalid.
+                - 503 Service Unavailable: If the database has no full-text index.
+        """
+        if not search.search_available():
+            return Response({'message': 'Search is not available.'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+
+        expression = search.match_expression(request.query_params.get('query', ''))
+        if not expression:
+            return Response({'message': 'A search query is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        kinds = request.query_params.get('type', ','.join(search.KINDS)).split(',')
+        if not kinds or any(kind not in search.KINDS for kind in kinds):
+            return Response({'message': 'type must be a comma separated list of post, story or comment'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        pagination = self.pagination_class()
+        page = pagination.paginate(
+            lambda position, reverse, limit: search.search(request.user, expression, kinds, position, reverse, limit),
+            request,
+            None,
+        )
+        if not page and not pagination.cursor:
+            return Response({'message': 'No results found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        serialized = {}
+        for kind, serializer_class in SEARCH_SERIALIZERS.items():
+            rows = [match['row'] for match in page if match['type'] == kind]
+            if rows:
+                data = serializer_class(rows, many=True, context={'request': request, 'viewer': request.user}).data
+                serialized.update({(kind, item['id']): item for item in data})
+        return pagination.get_paginated_response([
+            {'type': match['type'], 'object': serialized[match['type'], match['row']['id']]} for match in page
+        ])
@@ -1,13 +1,18 @@
 from django.shortcuts import get_object_or_404
 from rest_framework.views import APIView, Response, status
 
+from apis.like_apis import liker_list_response
 from apis.permission_control import IsAuthenticated, TokenAuthentication, HeHasPermission, AllowAny, IsOwner
+from posts import renditions
+from posts.audience import get_viewer_count, story_view_buffer
 from posts.models import Story
 from direct_messages.models import DirectMessage
 from direct_messages.serializers import DirectMessageSerializer
-from likes.models import Like
-from likes.serializers import LikeSerializer
+from likes.models import StoryLike
+from likes.services import like, pending_like_vary, reflect_pending_like, toggle_like, unlike
 from posts.serializers import StorySerializer
+from posts.tray import get_story_tray
+from utils import versioning
 
 
 class OpenStoryListAPIView(APIView):
@@ -22,17 +27,24 @@ class OpenStoryListAPIView(APIView):
 
     def get(self, request):
         """
-        Retrieves all stories, ordered by creation date in descending order.
+        Retrieves the stories visible to the requesting user, ordered by creation date in descending order.
 
         Returns:
             Response:
                 - 200 OK: A serialized list of stories.
+                - 304 Not Modified: If no story changed since the client's `ETag` / `Last-Modified`.
                 - 400 Bad Request: If no stories are available.
         """
-        story = Story.objects.all().order_by('-created_at')
+        version = versioning.get_list_version('stories')
+        vary = f'{request.user.id}:{request.get_full_path()}'
+        not_modified = versioning.not_modified(request, 'stories', version, vary)
+        if not_modified:
+            return not_modified
+
+        story = Story.objects.visible_to(request.user).order_by('-created_at')
         if story.exists():
-            serializer = StorySerializer(story, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            serializer = StorySerializer(story, many=True, context={'viewer': request.user})
+            return versioning.set_validators(Response(serializer.data, status=status.HTTP_200_OK), 'stories', version, vary)
         return Response({'message': 'There are no stories available.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
@@ -49,20 +61,51 @@ class PrivateStoryListAPIView(APIView):
 
     def get(self, request):
         """
-        Retrieves all stories, ordered by creation date in descending order.
+        Retrieves the stories visible to the requesting user, ordered by creation date in descending order.
 
         Returns:
             Response:
                 - 200 OK: A serialized list of stories.
+                - 304 Not Modified: If no story changed since the client's `ETag` / `Last-Modified`.
                 - 400 Bad Request: If no stories are available.
         """
-        story = Story.objects.all().order_by('-created_at')
+        version = versioning.get_list_version('stories')
+        vary = f'{request.user.id}:{request.get_full_path()}'
+        not_modified = versioning.not_modified(request, 'stories', version, vary)
+        if not_modified:
+            return not_modified
+
+        story = Story.objects.visible_to(request.user).order_by('-created_at')
         if story.exists():
-            serializer = StorySerializer(story, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            serializer = StorySerializer(story, many=True, context={'viewer': request.user})
+            return versioning.set_validators(Response(serializer.data, status=status.HTTP_200_OK), 'stories', version, vary)
         return Response({'message': 'There are no stories available.'}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class StoryTrayAPIView(APIView):
+    """
+    API view to retrieve the story tray: the followed accounts that have live stories.
+
+    Permissions:
+    - IsAuthenticated: Only authenticated users can access this endpoint.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Retrieves the accounts the requesting user follows that have live stories,
+        the account with the newest story first.
+
+        Returns:
+            Response:
+                - 200 OK: `results`, each with a compact `user`, its live `story_ids` oldest first,
+                  `latest_at` and the `expires_at` of its oldest story. Empty when no followed
+                  account has a live story.
+        """
+        return Response({'results': get_story_tray(request.user, request)}, status=status.HTTP_200_OK)
+
+
 class OpenStoryDetailAPIView(APIView):
     """
     API view to retrieve or delete a specific story.
@@ -88,11 +131,21 @@ class OpenStoryDetailAPIView(APIView):
         Returns:
             Response:
                 - 200 OK: Serialized story data.
+                - 304 Not Modified: If the story has not changed since the client's `ETag` / `Last-Modified`.
                 - 404 Not Found: If the story does not exist.
         """
-        story = get_object_or_404(Story, id=story_id)
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        if story.user_id != request.user.id:
+            story_view_buffer.record(story.id, request.user.id)
+        version = versioning.get_version('story', story.id)
+        vary = pending_like_vary(request.user, 'story', story.id)
+        not_modified = versioning.not_modified(request, 'story', version, vary)
+        if not_modified:
+            return not_modified
+
         serializer = StorySerializer(story)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = reflect_pending_like(request.user, 'story', serializer.data)
+        return versioning.set_validators(Response(data, status=status.HTTP_200_OK), 'story', version, vary)
 
     def delete(self, request, story_id):
         """
@@ -137,12 +190,19 @@ class PrivateStoryDetailAPIView(APIView):
 
         Returns:
             Response:
-                - 200 OK: Serialized story data.
+                - 200 OK: Serialized story data. The owner also gets `viewer_count`, the number
+                  of unique viewers, exact for small audiences and estimated past
+                  STORY_VIEWERS_EXACT_LIMIT; views by anyone else are recorded.
                 - 404 Not Found: If the story does not exist.
         """
-        story = get_object_or_404(Story, id=story_id)
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
         serializer = StorySerializer(story)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = reflect_pending_like(request.user, 'story', serializer.data)
+        if story.user_id == request.user.id:
+            data['viewer_count'] = get_viewer_count(story.id)
+        else:
+            story_view_buffer.record(story.id, request.user.id)
+        return Response(data, status=status.HTTP_200_OK)
 
     def delete(self, request, story_id):
         """
@@ -177,6 +237,9 @@ class StoryCreateAPIView(APIView):
         """
         Creates a new story with the provided data.
 
+        Image renditions are rendered in the background; `media_status` tells
+        when they are ready.
+
         Args:
             request (Request): The request object containing story data.
 
@@ -187,7 +250,8 @@ class StoryCreateAPIView(APIView):
         """
         serializer = StorySerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            story = serializer.save()
+            renditions.schedule(story)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -215,20 +279,45 @@ class PrivateStoryLikeAPIView(APIView):
                 - 200 OK: If the like was added or removed successfully.
                 - 404 Not Found: If the story does not exist.
         """
-        story = get_object_or_404(Story, id=story_id)
-        user = request.user
-        like_instance = Like.objects.filter(user=user, story=story).first()
-        if like_instance:
-            like_instance.delete()
-            story.like_count = max(0, story.like_count - 1)
-            story.save()
-            return Response({'message': 'Like removed successfully.'}, status=status.HTTP_200_OK)
-
-        Like.objects.create(user=user, story=story)
-        story.like_count += 1
-        story.save()
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        if toggle_like(request.user, story):
+            return Response({'message': 'Story liked successfully.'}, status=status.HTTP_200_OK)
+        return Response({'message': 'Like removed successfully.'}, status=status.HTTP_200_OK)
+
+    def put(self, request, story_id):
+        """
+        Handles PUT requests to like a story. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            story_id (int): The ID of the story to like.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the story was already liked.
+                - 404 Not Found: If the story does not exist.
+        """
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        like(request.user, story)
         return Response({'message': 'Story liked successfully.'}, status=status.HTTP_200_OK)
 
+    def delete(self, request, story_id):
+        """
+        Handles DELETE requests to remove the like of a story. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            story_id (int): The ID of the story to unlike.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the story was liked.
+                - 404 Not Found: If the story does not exist.
+        """
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        unlike(request.user, story)
+        return Response({'message': 'Like removed successfully.'}, status=status.HTTP_200_OK)
+
     def get(self, request, story_id):
         """
         Retrieves a list of likes for a specific story.
@@ -238,16 +327,15 @@ class PrivateStoryLikeAPIView(APIView):
 
         Returns:
             Response:
-                - 200 OK: A serialized list of likes if the user is authorized.
+                - 200 OK: A page of likers (see `liker_list_response`), or the like count
+                  when `count_only` is set, if the user is authorized.
                 - 403 Forbidden: If the user is not authorized to view the likes.
                 - 404 Not Found: If the story does not exist.
         """
-        story = get_object_or_404(Story, id=story_id)
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
         user = request.user
-        if user == story.user or Like.objects.filter(user=user, story=story).exists():
-            likes = Like.objects.filter(story=story)
-            serializer = LikeSerializer(likes, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        if user == story.user or StoryLike.objects.filter(user=user, story=story).exists():
+            return liker_list_response(request, story, view=self)
         return Response({'message': 'You are not authorized to view likes for this story.'}, status=status.HTTP_403_FORBIDDEN)
 
 
@@ -273,20 +361,45 @@ class OpenStoryLikeAPIView(APIView):
                 - 200 OK: If the like was added or removed successfully.
                 - 404 Not Found: If the story does not exist.
         """
-        story = get_object_or_404(Story, id=story_id)
-        user = request.user
-        like_instance = Like.objects.filter(user=user, story=story).first()
-        if like_instance:
-            like_instance.delete()
-            story.like_count = max(0, story.like_count - 1)
-            story.save()
-            return Response({'message': 'Like removed successfully.'}, status=status.HTTP_200_OK)
-
-        Like.objects.create(user=user, story=story)
-        story.like_count += 1
-        story.save()
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        if toggle_like(request.user, story):
+            return Response({'message': 'Story liked successfully.'}, status=status.HTTP_200_OK)
+        return Response({'message': 'Like removed successfully.'}, status=status.HTTP_200_OK)
+
+    def put(self, request, story_id):
+        """
+        Handles PUT requests to like a story. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            story_id (int): The ID of the story to like.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the story was already liked.
+                - 404 Not Found: If the story does not exist.
+        """
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        like(request.user, story)
         return Response({'message': 'Story liked successfully.'}, status=status.HTTP_200_OK)
 
+    def delete(self, request, story_id):
+        """
+        Handles DELETE requests to remove the like of a story. Repeating the request has no further effect.
+
+        Args:
+            request (Request): The HTTP request object.
+            story_id (int): The ID of the story to unlike.
+
+        Returns:
+            Response:
+                - 200 OK: Confirmation message, whether or not the story was liked.
+                - 404 Not Found: If the story does not exist.
+        """
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
+        unlike(request.user, story)
+        return Response({'message': 'Like removed successfully.'}, status=status.HTTP_200_OK)
+
     def get(self, request, story_id):
         """
         Retrieves a list of likes for a specific story.
@@ -296,16 +409,15 @@ class OpenStoryLikeAPIView(APIView):
 
         Returns:
             Response:
-                - 200 OK: A serialized list of likes if the user is authorized.
+                - 200 OK: A page of likers (see `liker_list_response`), or the like count
+                  when `count_only` is set, if the user is authorized.
                 - 403 Forbidden: If the user is not authorized to view the likes.
                 - 404 Not Found: If the story does not exist.
         """
-        story = get_object_or_404(Story, id=story_id)
+        story = get_object_or_404(Story.objects.visible_to(request.user), id=story_id)
         user = request.user
-        if user == story.user or Like.objects.filter(user=user, story=story).exists():
-            likes = Like.objects.filter(story=story)
-            serializer = LikeSerializer(likes, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        if user == story.user or StoryLike.objects.filter(user=user, story=story).exists():
+            return liker_list_response(request, story, view=self)
         return Response({'message': 'You are not authorized to view likes for this story.'}, status=status.HTTP_403_FORBIDDEN)
 
 
@@ -1,3 +1,252 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache, caches
 from django.test import TestCase
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+
+from apis.post_apis import open_posts_cache
+from comments.models import Comment
+from likes.models import CommentLike
+from posts.models import ContentVersion, Post, Story
+from posts.tray import TRAY_KEY, tray_digest
+from profiles.models import CustomerUser, Profile
+from utils import versioning
+from utils.response_cache import GenerationalResponseCache
+
+
+def make_user(name, status=Profile.OPEN_PROFILE):
+    user = CustomerUser.objects.create_user(username=name, email=f'{name}@example.com', password='password')
+    Profile.objects.create(user=user, profile_status=status)
+    return user
+
+
+class PostListPaginationTests(TestCase):
+    """Keyset pages of the post lists stay stable while new posts are published."""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+        created_at = now() - timedelta(hours=1)
+        self.posts = [Post.objects.create(user=self.author, caption=f'post {i}') for i in range(23)]
+        # Groups of posts share a created_at, so the id tie-breaker decides their order.
+        for index, post in enumerate(self.posts):
+            Post.objects.filter(id=post.id).update(created_at=created_at + timedelta(minutes=index // 4))
+        self.expected = list(
+            Post.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+
+    def read_all_pages(self, url, page_size=5):
+        seen = []
+        response = self.client.get(url, {'page_size': page_size})
+        while True:
+            self.assertEqual(response.status_code, 200, response.data)
+            seen.extend(post['id'] for post in response.data['results'])
+            # Publish between requests: new posts are newer than every cursor position.
+            Post.objects.create(user=self.author, caption='published while paging')
+            if response.data['next'] is None:
+                return seen
+            response = self.client.get(response.data['next'])
+
+    def assert_stable(self, seen):
+        self.assertEqual(len(seen), len(set(seen)), 'a post was returned twice')
+        self.assertEqual(seen, self.expected)
+
+    def test_open_post_pages_are_stable_under_inserts(self):
+        self.assert_stable(self.read_all_pages('/api/v1/open_posts/'))
+
+    def test_private_post_pages_are_stable_under_inserts(self):
+        self.assert_stable(self.read_all_pages('/api/v1/private_posts/'))
+
+    def test_page_size_does_not_change_the_sequence(self):
+        self.assertEqual(self.read_all_pages('/api/v1/open_posts/', page_size=1), self.expected)
+
+    def test_previous_link_returns_the_same_page(self):
+        first = self.client.get('/api/v1/open_posts/', {'page_size': 5}).data
+        second = self.client.get(first['next']).data
+        back = self.client.get(second['previous']).data
+        self.assertEqual([post['id'] for post in back['results']], [post['id'] for post in first['results']])
+
+    def test_private_posts_of_unfollowed_profiles_are_skipped(self):
+        hidden = Post.objects.create(user=make_user('private', Profile.PRIVATE_PROFILE), caption='hidden')
+        self.assertNotIn(hidden.id, self.read_all_pages('/api/v1/open_posts/'))
+
+    def test_malformed_cursor_is_rejected(self):
+        for cursor in ('not-a-cursor', 'eyJwIjpbMV19', 'eyJwIjpbIngiLCAieSJdfQ=='):
+            for url in ('/api/v1/open_posts/', '/api/v1/private_posts/'):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404, (url, cursor))
+
+
+class ConditionalRequestTests(TestCase):
+    """A cached ETag never answers for an object the viewer may not see."""
+
+    def setUp(self):
+        self.author = make_user('author', Profile.PRIVATE_PROFILE)
+        self.follower = make_user('follower')
+        self.stranger = make_user('stranger')
+        self.author.profile.followers.add(self.follower)
+        self.post = Post.objects.create(user=self.author, caption='followers only')
+        self.client = APIClient()
+
+    def etag_for(self, user, url):
+        self.client.force_authenticate(user)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response['ETag']
+
+    def test_matching_etag_is_not_modified(self):
+        url = f'/api/v1/open_post_detail/{self.post.id}/'
+        etag = self.etag_for(self.follower, url)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_hidden_post_is_not_found_even_with_its_etag(self):
+        url = f'/api/v1/open_post_detail/{self.post.id}/'
+        etag = self.etag_for(self.follower, url)
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 404)
+
+    def test_hidden_profile_is_forbidden_even_with_its_etag(self):
+        url = f'/api/v1/profile_detail/{self.author.profile.id}/'
+        etag = self.etag_for(self.follower, url)
+        self.client.force_authenticate(self.stranger)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 403)
+
+    def test_missing_post_does_not_start_a_version(self):
+        self.client.force_authenticate(self.follower)
+        self.assertEqual(self.client.get('/api/v1/open_post_detail/999999/').status_code, 404)
+        self.assertFalse(ContentVersion.objects.filter(key='post:999999').exists())
+
+
+class CommentVisibilityTests(TestCase):
+    """Comments on posts the viewer may not see are reported as missing."""
+
+    def setUp(self):
+        author = make_user('author', Profile.PRIVATE_PROFILE)
+        post = Post.objects.create(user=author, caption='followers only')
+        self.comment = Comment.objects.create(user=author, post=post, text='hidden')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('stranger'))
+
+    def test_like_endpoints_hide_the_comment(self):
+        url = f'/api/v1/post/{self.comment.id}/like_comment'
+        for method in ('get', 'post', 'put', 'delete'):
+            self.assertEqual(getattr(self.client, method)(url).status_code, 404, method)
+        self.assertFalse(CommentLike.objects.exists())
+
+
+class OpenPostCacheTests(TestCase):
+    """Anonymous pages are cached per cursor and page size, not per URL."""
+
+    def setUp(self):
+        author = make_user('author')
+        for i in range(3):
+            Post.objects.create(user=author, caption=f'post {i}')
+        self.client = APIClient()
+
+    def test_extra_query_parameters_share_one_entry(self):
+        before = open_posts_cache.get_metrics()['rebuilds']
+        for junk in range(5):
+            self.assertEqual(self.client.get('/api/v1/open_posts/', {'page_size': 2, 'junk': junk}).status_code, 200)
+        self.client.get('/api/v1/open_posts/', {'page_size': 500})
+        self.client.get('/api/v1/open_posts/', {'page_size': 100})
+        rebuilds = open_posts_cache.get_metrics()['rebuilds'] - before
+        self.assertEqual(rebuilds, 2)
+
+    def test_workers_serve_the_stale_copy_while_another_rebuilds(self):
+        responses = GenerationalResponseCache('test_page', 'posts', timeout=30, stale_timeout=60, lock_timeout=10)
+        shared = caches[settings.RESPONSE_CACHE_ALIAS]
+        first = responses.get_or_build('page', lambda: 'first')
+        Post.objects.create(user=CustomerUser.objects.get(username='author'), caption='new')
+        token = versioning.get_list_version('posts').token
+
+        # The lock is in the cache every worker shares, as if another worker held it.
+        lock_key = responses._keys(token, 'page')[2]
+        self.assertTrue(shared.add(lock_key, 1))
+        self.assertEqual(responses.get_or_build('page', lambda: 'second'), first)
+        shared.delete(lock_key)
+        self.assertEqual(responses.get_or_build('page', lambda: 'second'), ('second', token))
+        self.assertEqual(responses.get_metrics()['stale_served'], 1)
+
+
+class StoryTrayCacheTests(TestCase):
+    """A cached tray follows the followed accounts, and only them."""
+
+    def setUp(self):
+        self.viewer = make_user('viewer')
+        self.followed = make_user('followed')
+        self.followed.profile.followers.add(self.viewer)
+        Story.objects.create(user=self.followed, caption='live')
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def tray(self):
+        response = self.client.get('/api/v1/story_tray/')
+        self.assertEqual(response.status_code, 200)
+        return response.data['results']
+
+    def is_cached(self):
+        return cache.get(TRAY_KEY.format(self.viewer.id, tray_digest(self.viewer))) is not None
+
+    def test_profile_picture_change_refreshes_the_tray(self):
+        self.assertIsNone(self.tray()[0]['user']['profile_picture'])
+        profile = Profile.objects.get(user=self.followed)
+        profile.profile_picture = 'profile_images/new.jpg'
+        profile.save()
+        self.assertTrue(self.tray()[0]['user']['profile_picture'].endswith('profile_images/new.jpg'))
+
+    def test_username_change_refreshes_the_tray(self):
+        self.tray()
+        self.followed.username = 'renamed'
+        self.followed.save()
+        self.assertEqual(self.tray()[0]['user']['username'], 'renamed')
+
+    def test_new_story_of_a_followed_account_refreshes_the_tray(self):
+        self.assertEqual(len(self.tray()[0]['story_ids']), 1)
+        Story.objects.create(user=self.followed, caption='another')
+        self.assertEqual(len(self.tray()[0]['story_ids']), 2)
+
+    def test_following_refreshes_the_tray(self):
+        self.assertEqual(len(self.tray()), 1)
+        other = make_user('other')
+        Story.objects.create(user=other, caption='live')
+        other.profile.followers.add(self.viewer)
+        self.assertEqual(len(self.tray()), 2)
+
+    def test_stories_of_other_accounts_keep_the_cached_tray(self):
+        self.tray()
+        Story.objects.create(user=make_user('stranger'), caption='unrelated')
+        self.assertTrue(self.is_cached())
+
+
+class VersionStoreTests(TestCase):
+    """Versions are kept until bumped, and likes do not bump the post collection."""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.client = APIClient()
+        self.client.force_authenticate(make_user('viewer'))
+
+    def test_versions_are_not_evicted(self):
+        posts = [Post.objects.create(user=self.author, caption=f'post {i}') for i in range(400)]
+        etags = {post.id: self.client.get(f'/api/v1/open_post_detail/{post.id}/')['ETag'] for post in posts[:5]}
+        for post in posts:
+            versioning.get_version('post', post.id)
+        for post_id, etag in etags.items():
+            response = self.client.get(f'/api/v1/open_post_detail/{post_id}/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
 
-# Create your tests here.
+    def test_like_bumps_the_post_but_not_the_collection(self):
+        post = Post.objects.create(user=self.author, caption='liked')
+        posts_version = versioning.get_version('posts')
+        etag = self.client.get(f'/api/v1/open_post_detail/{post.id}/')['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.put(f'/api/v1/open_post/{post.id}/like_post/').status_code, 200)
+        self.assertEqual(versioning.get_version('posts'), posts_version)
+        response = self.client.get(f'/api/v1/open_post_detail/{post.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['like_count'], 1)
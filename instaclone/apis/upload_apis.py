@@ -0,0 +1,222 @@
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from rest_framework.views import APIView, Response, status
+
+from apis.permission_control import IsAuthenticated, TokenAuthentication
+from direct_messages.serializers import DirectMessageSerializer
+from posts import uploads
+from posts.models import UploadSession
+from posts.serializers import PostSerializer, StorySerializer
+from posts.timeline import fan_out_post
+from profiles.models import Profile
+from utils import metrics
+from utils.background import run_in_background
+
+UPLOAD_TARGETS = ('post', 'story', 'message')
+
+
+def upload_error_response(error:uploads.UploadError):
+    return Response({'message': str(error), **error.details}, status=error.status)
+
+
+def session_data(session:UploadSession):
+    return {
+        'id': session.id,
+        'filename': session.filename,
+        'size': session.size,
+        'offset': session.offset,
+        'created_at': session.created_at,
+    }
+
+
+class UploadSessionCreateAPIView(APIView):
+    """
+    API view to start a resumable, chunked upload of a video.
+
+    Permissions:
+        - IsAuthenticated: Only authenticated users can upload.
+
+    Methods:
+        POST:
+            Creates an upload session to PUT the chunks of the video into.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Handles POST requests to start an upload.
+
+        Args:
+            request (Request): The HTTP request object. Requires the `filename` of the video
+                and its `size` in bytes, at most UPLOAD_MAX_SIZE.
+
+        Returns:
+            Response:
+                - 201 Created: The session `id`, `filename`, `size` and `offset` (0).
+                - 400 Bad Request: If the file is not a video or the size is invalid.
+        """
+        try:
+            size = int(request.data.get('size'))
+        except (TypeError, ValueError):
+            return Response({'message': 'size must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            session = uploads.create_session(request.user, request.data.get('filename'), size)
+        except uploads.UploadError as error:
+            return upload_error_response(error)
+        return Response(session_data(session), status=status.HTTP_201_CREATED)
+
+
+class UploadSessionAPIView(APIView):
+    """
+    API view to read, fill and cancel an upload session.
+
+    Permissions:
+        - IsAuthenticated: Only the user who started the upload can access it.
+
+    Methods:
+        GET:
+            Returns the session, with the offset to resume the upload from.
+        PUT:
+            Writes a chunk of the video at an offset.
+        DELETE:
+            Cancels the upload.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, session_id):
+        """
+        Handles GET requests to read an upload session, e.g. to resume after a dropped connection.
+
+        Returns:
+            Response:
+                - 200 OK: The session, where `offset` is the number of bytes received.
+                - 404 Not Found: If the session does not exist or has expired.
+        """
+        session = get_object_or_404(UploadSession, id=session_id, user=request.user)
+        return Response(session_data(session), status=status.HTTP_200_OK)
+
+    def put(self, request, session_id):
+        """
+        Handles PUT requests to upload a chunk.
+
+        The raw request body is the chunk; it is streamed to the partial file
+        without being parsed or buffered.
+
+        Args:
+            request (Request): The HTTP request object. Requires the `offset` query parameter,
+                which must be the current offset of the session, and a Content-Length of at
+                most UPLOAD_CHUNK_MAX_SIZE bytes.
+            session_id (UUID): The ID of the upload session.
+
+        Returns:
+            Response:
+                - 200 OK: The session, with the new `offset`.
+                - 400 Bad Request: If the offset or the chunk size is invalid.
+                - 404 Not Found: If the session does not exist or has expired.
+                - 409 Conflict: If the chunk does not start at the current `offset`, which is returned.
+                - 411 Length Required: If the request has no Content-Length.
+        """
+        session = get_object_or_404(UploadSession, id=session_id, user=request.user)
+        try:
+            offset = int(request.query_params.get('offset'))
+        except (TypeError, ValueError):
+            return Response({'message': 'offset must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length <= 0:
+            return Response({'message': 'Content-Length is required.'}, status=status.HTTP_411_LENGTH_REQUIRED)
+        try:
+            uploads.write_chunk(session, offset, request.stream, length)
+        except uploads.UploadError as error:
+            return upload_error_response(error)
+        return Response(session_data(session), status=status.HTTP_200_OK)
+
+    def delete(self, request, session_id):
+        """
+        Handles DELETE requests to cancel an upload and drop the received bytes.
+
+        Returns:
+            Response:
+                - 204 No Content: If the upload was cancelled.
+                - 404 Not Found: If the session does not exist or has expired.
+        """
+        session = get_object_or_404(UploadSession, id=session_id, user=request.user)
+        uploads.delete_session(session)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadSessionFinalizeAPIView(APIView):
+    """
+    API view to attach a completed upload to a new post, story or direct message.
+
+    Permissions:
+        - IsAuthenticated: Only the user who started the upload can finalize it.
+
+    Methods:
+        POST:
+            Creates the post, story or message with the uploaded video and ends the session.
+    """
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, session_id):
+        """
+        Handles POST requests to finalize an upload.
+
+        Args:
+            request (Request): The HTTP request object. Requires a `target`: `post` or `story`,
+                with an optional `caption`, or `message`, with the `profile_id` of the receiver
+                and a `text`.
+            session_id (UUID): The ID of the upload session.
+
+        Returns:
+            Response:
+                - 201 Created: The serialized post, story or message, with its video.
+                - 400 Bad Request: If the target or its data is invalid.
+                - 403 Forbidden: If the receiver of a message is a private profile the user does not follow.
+                - 404 Not Found: If the session or the receiver does not exist.
+                - 409 Conflict: If the upload is not complete.
+        """
+        session = get_object_or_404(UploadSession, id=session_id, user=request.user)
+        target = request.data.get('target')
+        if target not in UPLOAD_TARGETS:
+            return Response({'message': 'target must be one of post, story or message.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        if target == 'post':
+            serializer = PostSerializer(data={'caption': request.data.get('caption', '')})
+            extra = {'user': request.user}
+        elif target == 'story':
+            serializer = StorySerializer(data={'user': request.user.id, 'caption': request.data.get('caption', '')})
+            extra = {}
+        else:
+            profile = get_object_or_404(Profile, id=request.data.get('profile_id'))
+            if profile.user_id == request.user.id:
+                return Response({'message': 'You cannot send message to yourself'}, status=status.HTTP_400_BAD_REQUEST)
+            if not profile.is_visible_to(request.user):
+                return Response({'message': 'You do not follow this private profile.'}, status=status.HTTP_403_FORBIDDEN)
+            serializer = DirectMessageSerializer(data={
+                'sender_user': request.user.id, 'receiver_user': profile.user_id, 'text': request.data.get('text'),
+            })
+            extra = {}
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            video = uploads.open_upload(session)
+        except uploads.UploadError as error:
+            return upload_error_response(error)
+        with video, transaction.atomic():
+            # Deleting the session first makes a concurrent finalize of the same upload a 404.
+            if not UploadSession.objects.filter(id=session.id).delete()[0]:
+                return Response({'message': 'The upload was already finalized.'}, status=status.HTTP_404_NOT_FOUND)
+            instance = serializer.save(video=video, **extra)
+        uploads.delete_session(session)
+        metrics.incr('uploads.completed')
+        if target == 'post':
+            run_in_background(fan_out_post, instance.id)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
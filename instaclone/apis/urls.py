@@ -4,6 +4,11 @@ from .story_apis import *
 from .profile_apis import *
 from .direct_apis import *
 from .auth_apis import *
+from .metrics_apis import *
+from .like_apis import *
+from .search_apis import *
+from .engagement_apis import *
+from .upload_apis import *
 
 
 app_name = 'apis'
@@ -23,6 +28,10 @@ urlpatterns = [
         LogoutAPIView.as_view(),
         name='logout'),
 
+    path('metrics/',
+        MetricsAPIView.as_view(),
+        name='metrics'),
+
     path('open_posts/',
         OpenPostListAPIView.as_view(),
         name='posts'),
@@ -31,6 +40,10 @@ urlpatterns = [
         PrivatePostListAPIView.as_view(), 
         name='posts'),
         
+    path('home_feed/', 
+        HomeFeedAPIView.as_view(), 
+        name='home_feed'),
+
     path('post_create/', 
         PostCreateAPIView.as_view(), 
         name='post_create'),
@@ -62,11 +75,23 @@ urlpatterns = [
     path('post/<int:comment_id>/like_comment', 
         CommentLikeAPIView.as_view(), 
         name='comment_like'),
+
+    path('like_states/', 
+        LikeStateAPIView.as_view(), 
+        name='like_states'),
+
+    path('engagements/', 
+        BulkEngagementAPIView.as_view(), 
+        name='bulk_engagement'),
         
     path('stories/', 
         OpenStoryListAPIView.as_view(), 
         name='open-stories'),
 
+    path('story_tray/', 
+        StoryTrayAPIView.as_view(), 
+        name='story_tray'),
+
     path('story_create/', 
         StoryCreateAPIView.as_view(), 
         name='story_create'),
@@ -99,6 +124,10 @@ urlpatterns = [
         ProfileSearchAPIView.as_view(), 
         name='search_profile'),
 
+    path('search/', 
+        ContentSearchAPIView.as_view(), 
+        name='search_content'),
+
     path('profile_detail/<int:profile_id>/', 
         ProfileDetailAPIView.as_view(), 
         name='profile_detail'),
@@ -130,4 +159,16 @@ urlpatterns = [
     path('manage_message_with_private_profile/<int:profile_id>/', 
         PrivateProfileMessageManagementAPIView.as_view(), 
         name='manage_message_with_private_profile'),
+
+    path('upload_sessions/', 
+        UploadSessionCreateAPIView.as_view(), 
+        name='upload_session_create'),
+
+    path('upload_sessions/<uuid:session_id>/', 
+        UploadSessionAPIView.as_view(), 
+        name='upload_session'),
+
+    path('upload_sessions/<uuid:session_id>/finalize/', 
+        UploadSessionFinalizeAPIView.as_view(), 
+        name='upload_session_finalize'),
 ]
@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from comments.services import rebuild_top_comments
+from posts.models import Post
+from posts.signals import content_changed
+from utils import versioning
+
+
+class Command(BaseCommand):
+    help = 'Recompute the precomputed top comments of every post in batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        last_id = total = 0
+        while True:
+            ids = list(
+                Post.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not ids:
+                break
+            Post.objects.bulk_update(rebuild_top_comments(ids), ['top_comments'], batch_size=1000)
+            with versioning.coalesced():
+                for post_id in ids:
+                    content_changed('post', post_id)
+            last_id = ids[-1]
+            total += len(ids)
+            self.stdout.write(f'rebuilt {total} posts')
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the top comments of {total} posts in {time.perf_counter() - started:.2f}s'))
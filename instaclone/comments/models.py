@@ -5,13 +5,21 @@ from profiles.models import CustomerUser
 
 class Comment(models.Model):
     user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='comments')
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments')
-    story =  models.ForeignKey(Story, on_delete=models.CASCADE, related_name='comments')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='comments', null=True, blank=True)
+    story =  models.ForeignKey(Story, on_delete=models.CASCADE, related_name='comments', null=True, blank=True)
+    parent = models.ForeignKey('self', on_delete=models.CASCADE, related_name='replies', null=True, blank=True)
 
     text = models.CharField(max_length=2200)
     created_at = models.DateTimeField(auto_now_add=True)
     like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', 'created_at', 'id'], name='comment_post_created_idx'),
+            models.Index(fields=['parent', 'created_at', 'id'], name='comment_parent_created_idx'),
+            models.Index(fields=['post', '-like_count', 'created_at'], name='comment_post_likes_idx'),
+        ]
 
     def __str__(self):
         return f'{self.user.username} {self.text[:20]}'
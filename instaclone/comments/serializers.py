@@ -1,8 +1,10 @@
 from rest_framework import serializers
+from likes.serializers import ViewerLikesListSerializer
 from .models import Comment
 
 class CommentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Comment
         fields = '__all__'
-        exclude = ['id']
\ No newline at end of file
+        list_serializer_class = ViewerLikesListSerializer
+        read_only_fields = ['user', 'post', 'story', 'parent', 'like_count', 'comment_count']
@@ -0,0 +1,151 @@
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from comments.models import Comment
+from posts import search
+from posts.models import Post
+from posts.ranking import record_comment
+from posts.signals import content_changed
+
+TOP_COMMENT_COLUMNS = ('id', 'post_id', 'user_id', 'user__username', 'text', 'like_count', 'created_at')
+TOP_COMMENT_ORDERING = ('-like_count', 'created_at', 'id')
+
+
+def _top_entry(row:dict):
+    return {
+        'id': row['id'],
+        'user': row['user_id'],
+        'username': row['user__username'],
+        'text': row['text'],
+        'like_count': row['like_count'],
+        'created_at': row['created_at'],
+    }
+
+
+def refresh_top_comments(post_id:int):
+    """
+    Recompute the `TOP_COMMENTS_PER_POST` most-liked top-level comments stored
+    on the post, and invalidate its validators once the update commits.
+    """
+    rows = Comment.objects.filter(post_id=post_id, parent=None).order_by(*TOP_COMMENT_ORDERING) \
+        .values(*TOP_COMMENT_COLUMNS)[:settings.TOP_COMMENTS_PER_POST]
+    if Post.objects.filter(id=post_id).update(top_comments=[_top_entry(row) for row in rows]):
+        transaction.on_commit(lambda: content_changed('post', post_id))
+
+
+def _needs_refresh(top_comments:list, comment_id:int, like_count:int):
+    if any(entry['id'] == comment_id for entry in top_comments):
+        return True
+    if len(top_comments) < settings.TOP_COMMENTS_PER_POST:
+        return True
+    return like_count > top_comments[-1]['like_count']
+
+
+def update_top_comments(comment_id:int):
+    """
+    Refresh the top comments of the post of `comment_id` if the comment is or
+    should be one of them. Comments that cannot enter the list cost one query.
+    """
+    comment = Comment.objects.filter(id=comment_id, parent=None, post__isnull=False) \
+        .values('post_id', 'like_count', 'post__top_comments').first()
+    if comment is None:
+        return
+    if _needs_refresh(comment['post__top_comments'], comment_id, comment['like_count']):
+        refresh_top_comments(comment['post_id'])
+
+
+def rebuild_top_comments(post_ids:list):
+    """
+    Recompute the top comments of a batch of posts with two queries: one
+    windowed query ranking the top-level comments of every post, and one
+    reading the winning rows. Returns the posts with their `top_comments` set,
+    ready for `bulk_update`; the caller bumps their validators.
+    """
+    table = Comment._meta.db_table
+    placeholders = ', '.join(['%s'] * len(post_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY post_id ORDER BY like_count DESC, created_at, id) AS position '
+            f'FROM {table} WHERE post_id IN ({placeholders}) AND parent_id IS NULL) ranked '
+            f'WHERE position <= %s',
+            [*post_ids, settings.TOP_COMMENTS_PER_POST],
+        )
+        comment_ids = [comment_id for comment_id, in cursor.fetchall()]
+
+    top_comments = {post_id: [] for post_id in post_ids}
+    rows = Comment.objects.filter(id__in=comment_ids).order_by('post_id', *TOP_COMMENT_ORDERING) \
+        .values(*TOP_COMMENT_COLUMNS)
+    for row in rows:
+        top_comments[row['post_id']].append(_top_entry(row))
+    return [Post(id=post_id, top_comments=entries) for post_id, entries in top_comments.items()]
+
+
+def create_comment(serializer, user, post, parent:Comment=None):
+    """
+    Save a validated comment on `post`, optionally as a reply to `parent`.
+
+    Threads are one level deep: replying to a reply attaches the comment to
+    the top-level comment. The comment counts of the post and of the parent
+    are incremented atomically in the same transaction, and a new top-level
+    comment joins the top comments of the post while it has free slots.
+    """
+    if parent is not None and parent.parent_id is not None:
+        parent = parent.parent
+    with transaction.atomic():
+        comment = serializer.save(user=user, post=post, parent=parent)
+        if parent is not None:
+            Comment.objects.filter(id=parent.id).update(comment_count=F('comment_count') + 1)
+        record_comment(post, 1)
+        if parent is None and _needs_refresh(post.top_comments, comment.id, 0):
+            refresh_top_comments(post.id)
+    return comment
+
+
+def delete_comment(comment:Comment):
+    """Delete `comment` with its replies and decrement the comment counts of its post and parent."""
+    with transaction.atomic():
+        removed = 1 + comment.replies.count()
+        if comment.parent_id is not None:
+            Comment.objects.filter(id=comment.parent_id).update(
+                comment_count=Greatest(F('comment_count') - 1, Value(0))
+            )
+        post = comment.post
+        comment_id = comment.id
+        comment.delete()
+        if post is not None:
+            record_comment(post, -removed)
+            if any(entry['id'] == comment_id for entry in post.top_comments):
+                refresh_top_comments(post.id)
+
+
+def bulk_create_comments(user, entries:list):
+    """
+    Save a batch of `(post, text, parent)` comments of `user` with one bulk insert.
+
+    Bulk inserts send no signals, so the work of the comment signals is done
+    once per batch: the comment counts are incremented once per post and
+    parent, the texts are added to the search index together, and top comments
+    are refreshed for posts that still have free slots. Returns the comments.
+    """
+    comments = [
+        Comment(user=user, post=post, text=text,
+                parent_id=None if parent is None else parent.parent_id or parent.id)
+        for post, text, parent in entries
+    ]
+    posts = {post.id: post for post, _, _ in entries}
+    with transaction.atomic():
+        Comment.objects.bulk_create(comments)
+        for parent_id, count in Counter(comment.parent_id for comment in comments if comment.parent_id).items():
+            Comment.objects.filter(id=parent_id).update(comment_count=F('comment_count') + count)
+        for post_id, count in Counter(comment.post_id for comment in comments).items():
+            record_comment(posts[post_id], count)
+        search.index_rows('comment', [(comment.id, comment.text) for comment in comments])
+        for post_id in {comment.post_id for comment in comments if comment.parent_id is None}:
+            if len(posts[post_id].top_comments) < settings.TOP_COMMENTS_PER_POST:
+                refresh_top_comments(post_id)
+    return comments
@@ -1,3 +1,64 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from comments.models import Comment
+from comments.services import refresh_top_comments
+from likes.services import toggle_like
+from posts.models import Post
+from profiles.models import CustomerUser, Profile
+
+
+def make_user(name, status=Profile.OPEN_PROFILE):
+    user = CustomerUser.objects.create_user(username=name, email=f'{name}@example.com', password='password')
+    Profile.objects.create(user=user, profile_status=status)
+    return user
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True, TOP_COMMENTS_PER_POST=2, LIKE_COUNTER_HOT_RATE=10 ** 9)
+class TopCommentsTests(TestCase):
+    """The top comments stored on a post follow likes, edits and deletes, and so does its ETag."""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.post = Post.objects.create(user=self.author, caption='post')
+        self.comments = [Comment.objects.create(user=self.author, post=self.post, text=f'comment {i}') for i in range(3)]
+        refresh_top_comments(self.post.id)
+        self.client = APIClient()
+        self.client.force_authenticate(self.author)
+
+    def top_ids(self):
+        self.post.refresh_from_db()
+        return [entry['id'] for entry in self.post.top_comments]
+
+    def detail(self, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(f'/api/v1/open_post_detail/{self.post.id}/', **headers)
+
+    def test_oldest_comments_fill_the_free_slots(self):
+        self.assertEqual(self.top_ids(), [self.comments[0].id, self.comments[1].id])
+
+    def test_liked_comment_enters_the_top_comments_and_changes_the_etag(self):
+        etag = self.detail()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            toggle_like(make_user('fan'), self.comments[2])
+        self.assertEqual(self.top_ids(), [self.comments[2].id, self.comments[0].id])
+
+        response = self.detail(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['top_comments'][0]['id'], self.comments[2].id)
+
+    def test_edited_top_comment_is_refreshed(self):
+        etag = self.detail()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(f'/api/v1/post/{self.comments[0].id}/', {'text': 'edited'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.detail(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['top_comments'][0]['text'], 'edited')
+
+    def test_deleted_top_comment_is_replaced(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(f'/api/v1/post/{self.comments[0].id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(self.top_ids(), [self.comments[1].id, self.comments[2].id])
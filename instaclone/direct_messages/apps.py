@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MessagesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'direct_messages'
+
+    def ready(self):
+        from direct_messages import signals
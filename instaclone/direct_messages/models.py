@@ -1,17 +1,23 @@
 from django.db import models
 from posts.models import Post, Story
 from profiles.models import CustomerUser
+from utils.storage import media_storage
 
 
 class DirectMessage(models.Model):
     sender_user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='sent_messages')
     receiver_user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='received_messages')
     post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='post_messages', null=True, blank=True)
-    story =  models.ForeignKey(Story, on_delete=models.CASCADE, related_name='story_messages', null=True, blank=True)
+    story =  models.ForeignKey(Story, on_delete=models.SET_NULL, related_name='story_messages', null=True, blank=True)
 
     text = models.CharField(max_length=2200)
-    image = models.ImageField(upload_to='message_images/', null=True, blank=True)
-    video = models.FileField(upload_to='message_videos/', null=True, blank=True)
+    image = models.ImageField(upload_to='message_images/', storage=media_storage, null=True, blank=True)
+    video = models.FileField(upload_to='message_videos/', storage=media_storage, null=True, blank=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_size = models.PositiveBigIntegerField(null=True, blank=True)
+    video_size = models.PositiveBigIntegerField(null=True, blank=True)
+    video_duration = models.FloatField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -1,9 +1,10 @@
 from rest_framework import serializers
+from posts.serializers import MEDIA_METADATA_FIELDS
 from .models import  DirectMessage
 
 
 class DirectMessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = DirectMessage
-        fields = '__all__'
-        exclude = ['id']
\ No newline at end of file
+        exclude = ['id']
+        read_only_fields = MEDIA_METADATA_FIELDS
\ No newline at end of file
@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from direct_messages.models import DirectMessage
+from utils.media import record_media_metadata
+from utils.storage import release_files, release_replaced_files, remember_replaced_files
+
+
+@receiver(pre_save, sender=DirectMessage)
+def message_media_uploaded(sender, instance, **kwargs):
+    record_media_metadata(instance)
+    remember_replaced_files(instance)
+
+
+@receiver(post_save, sender=DirectMessage)
+def message_media_replaced(sender, instance, **kwargs):
+    release_replaced_files(instance)
+
+
+@receiver(post_delete, sender=DirectMessage)
+def message_media_deleted(sender, instance, **kwargs):
+    release_files(instance)
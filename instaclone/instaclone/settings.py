@@ -102,6 +102,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file, not SQLite's shared in-memory database, whose table locks fail
+        # at once instead of waiting, so the concurrency tests can run.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     },
     
     'mongo':  {
@@ -174,4 +177,127 @@ EMAIL_HOST = 'smtp.gmail.com'
 EMAIL_PORT = 587
 EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
-EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD') 
\ No newline at end of file
+EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+
+
+#Background tasks
+
+BACKGROUND_TASK_WORKERS = 4
+BACKGROUND_TASKS_EAGER = False
+# Start the periodic sweepers from AppConfig.ready(). Every process loading the
+# apps would start them, tests, migrate and shell included, so they are off and
+# their management commands run from cron; turn it on only in the settings of
+# the process that should host them.
+BACKGROUND_SWEEPERS = False
+
+
+#Feed
+
+TIMELINE_MAX_LENGTH = 800
+TIMELINE_FANOUT_BATCH_SIZE = 500
+FEED_FANOUT_FOLLOWER_THRESHOLD = 10000
+FEED_PULL_RECENT_LIMIT = 200
+FEED_RECENT_POSTS_CACHE_TIMEOUT = 60
+FEED_SCORE_COMMENT_WEIGHT = 2
+FEED_SCORE_DECAY_SECONDS = 45000
+FEED_RANKED_MAX_AGE = 60 * 60 * 24 * 30
+
+
+#Conditional requests
+
+CONDITIONAL_COUNTER_MAX_AGE = 30
+
+# Cached responses, their rebuild locks and stale copies must be shared by
+# every worker process, so they live in a database cache
+# (`python manage.py createcachetable`). Culled entries are only rebuilt.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'response_cache',
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+}
+RESPONSE_CACHE_ALIAS = 'responses'
+
+OPEN_POSTS_CACHE_TIMEOUT = 30
+OPEN_POSTS_CACHE_STALE_TIMEOUT = 60 * 10
+RESPONSE_CACHE_LOCK_TIMEOUT = 10
+
+
+#Like counters
+
+LIKE_COUNTER_SHARDS = 8
+LIKE_COUNTER_HOT_WINDOW = 10
+LIKE_COUNTER_HOT_RATE = 50
+LIKE_COUNTER_FOLD_INTERVAL = 5
+LIKE_STATES_MAX_IDS = 500
+
+
+#Like write-behind buffer
+
+LIKE_WRITE_BEHIND = False
+LIKE_BUFFER_FLUSH_INTERVAL = 2
+LIKE_BUFFER_BATCH_SIZE = 1000
+
+
+#Top comments
+
+TOP_COMMENTS_PER_POST = 3
+
+#Search
+
+SEARCH_SCAN_BATCH_SIZE = 200
+SEARCH_MAX_SCANNED = 5000
+SEARCH_MAX_TERMS = 10
+
+
+#Bulk engagement
+
+ENGAGEMENT_MAX_OPERATIONS = 500
+
+
+#Story expiry
+
+STORY_SWEEP_BATCH_SIZE = 500
+STORY_SWEEP_MAX_BATCHES = 20
+STORY_SWEEP_INTERVAL = 60 * 5
+STORY_TRAY_CACHE_TIMEOUT = 60 * 60
+
+
+#Story viewers
+
+STORY_VIEWERS_EXACT_LIMIT = 500
+STORY_VIEWERS_SKETCH_PRECISION = 12
+STORY_VIEWS_FLUSH_INTERVAL = 2
+STORY_VIEWS_BATCH_SIZE = 1000
+
+#Media renditions
+
+MEDIA_RENDITION_SIZES = {
+    'thumb': (320, 320, True),
+    'feed': (1080, 1350, False),
+    'full': (2048, 2048, False),
+}
+MEDIA_RENDITION_FORMATS = ('webp', 'jpeg')
+MEDIA_RENDITION_WORKERS = 2
+MEDIA_RENDITION_QUEUE_DEPTH = 32
+MEDIA_RENDITION_TIMEOUT = 60 * 10
+MEDIA_RENDITION_SWEEP_INTERVAL = 60
+
+#Resumable uploads
+
+UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+UPLOAD_MAX_SIZE = 4 * 1024 * 1024 * 1024
+UPLOAD_CHUNK_MAX_SIZE = 16 * 1024 * 1024
+UPLOAD_BUFFER_SIZE = 64 * 1024
+UPLOAD_SESSION_LIFETIME = 24 * 60 * 60
+UPLOAD_SESSION_SWEEP_INTERVAL = 60 * 60
+
+#Media deduplication
+
+MEDIA_BLOB_DIR = 'blobs'
+MEDIA_BLOB_GC_BATCH_SIZE = 500
+MEDIA_BLOB_GC_GRACE = 60 * 60
\ No newline at end of file
@@ -1,9 +1,25 @@
 from django.contrib import admin
-from .models import Like
+from .models import CommentLike, PostLike, StoryLike
 
-@admin.register(Like)
-class LikeAdmin(admin.ModelAdmin):
-    list_display = ('user', 'post', 'comment', 'story', 'created_at')
-    list_filter = ('created_at', 'post', 'story', 'comment')
-    search_fields = ('user__username', 'post__title', 'story_caption', 'comment__text')
+@admin.register(PostLike)
+class PostLikeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'post', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('user__username', 'post__caption')
+    ordering = ('-created_at',)
+
+
+@admin.register(StoryLike)
+class StoryLikeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'story', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('user__username',)
+    ordering = ('-created_at',)
+
+
+@admin.register(CommentLike)
+class CommentLikeAdmin(admin.ModelAdmin):
+    list_display = ('user', 'comment', 'created_at')
+    list_filter = ('created_at',)
+    search_fields = ('user__username', 'comment__text')
     ordering = ('-created_at',)
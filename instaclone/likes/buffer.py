@@ -0,0 +1,214 @@
+import atexit
+import threading
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from likes import counters
+from likes.models import LIKE_MODELS
+from utils import metrics, versioning
+from utils.background import run_in_background, run_periodically
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer of like and unlike events, used when LIKE_WRITE_BEHIND is on.
+
+    Events are kept per `(user_id, target_type, target_id)` together with the
+    state the database had when the first event arrived, so a like followed
+    by an unlike cancels out before reaching the database. A flusher applies
+    the remaining events every LIKE_BUFFER_FLUSH_INTERVAL seconds, at most
+    LIKE_BUFFER_BATCH_SIZE at a time, with one bulk insert, one delete per
+    target type and one counter update per liked object. The validators of the
+    liked objects are bumped by the flush too, once per object and in a single
+    statement; until then only the liker's responses differ (see
+    `likes.services.pending_like_vary`).
+
+    The buffer lives in the memory of the worker process; pending likes are
+    visible to the requests that worker serves and are flushed at exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._inflight = {}
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        run_periodically('flush_like_buffer', settings.LIKE_BUFFER_FLUSH_INTERVAL, self.flush_all)
+        atexit.register(self.flush_all)
+
+    def _record(self, user_id:int, target_type:str, target_id:int, liked=None):
+        key = (user_id, target_type, target_id)
+        with self._lock:
+            entry = self._pending.get(key)
+            flushing = self._inflight.get(key)
+        if entry is None:
+            if flushing is not None:
+                stored = flushing[1]
+            else:
+                stored = LIKE_MODELS[target_type].objects.filter(user_id=user_id, **{f'{target_type}_id': target_id}).exists()
+            entry = [stored, stored]
+
+        with self._lock:
+            entry = self._pending.setdefault(key, entry)
+            before = entry[1]
+            entry[1] = not before if liked is None else liked
+            after = entry[1]
+            if entry[0] == after:
+                del self._pending[key]
+            size = len(self._pending)
+
+        metrics.incr('like_buffer.events')
+        if before != after:
+            # Unbuffered, the change is a like INSERT/DELETE, a counter UPDATE and a
+            # version write for the object and, except for comments, its owner's profile.
+            metrics.incr('like_buffer.unbuffered_writes', 3 if target_type == 'comment' else 4)
+        self._start()
+        if size >= settings.LIKE_BUFFER_BATCH_SIZE:
+            run_in_background(self.flush)
+        return before, after
+
+    def toggle(self, user_id:int, target_type:str, target_id:int):
+        """Record a like toggle and return whether the object is liked afterwards."""
+        return self._record(user_id, target_type, target_id)[1]
+
+    def set(self, user_id:int, target_type:str, target_id:int, liked:bool):
+        """Record an idempotent like or unlike and return whether it changed the like state."""
+        before, after = self._record(user_id, target_type, target_id, liked)
+        return before != after
+
+    def has_liked(self, user_id:int, target_type:str, target_id:int):
+        """The pending state of the like, or None when nothing is buffered for it."""
+        with self._lock:
+            entry = self._pending.get((user_id, target_type, target_id))
+        return None if entry is None else entry[1]
+
+    def pending_delta(self, user_id:int, target_type:str, target_id:int):
+        """How much the buffered events of `user_id` will change the like count of the object."""
+        with self._lock:
+            entry = self._pending.get((user_id, target_type, target_id))
+        if entry is None:
+            return 0
+        return int(entry[1]) - int(entry[0])
+
+    def _take(self):
+        with self._lock:
+            keys = list(self._pending)[:settings.LIKE_BUFFER_BATCH_SIZE]
+            batch = [(key, self._pending.pop(key)) for key in keys]
+            self._inflight.update(batch)
+            return batch
+
+    def _release(self, batch:list, failed:bool):
+        with self._lock:
+            for key, entry in batch:
+                del self._inflight[key]
+                if not failed:
+                    continue
+                # Events recorded during the flush assumed it would succeed.
+                newer = self._pending.setdefault(key, entry)
+                newer[0] = entry[0]
+                if newer[0] == newer[1]:
+                    del self._pending[key]
+
+    def flush(self):
+        """Apply up to LIKE_BUFFER_BATCH_SIZE buffered events. Returns the number applied."""
+        batch = self._take()
+        if not batch:
+            return 0
+
+        try:
+            with versioning.coalesced() as versions:
+                writes = self._apply(batch)
+            writes += sum(versions)
+        except Exception:
+            self._release(batch, failed=True)
+            raise
+        self._release(batch, failed=False)
+        metrics.incr('like_buffer.flushed', len(batch))
+        metrics.incr('like_buffer.writes', writes)
+        return len(batch)
+
+    def _apply(self, batch:list):
+        wanted = defaultdict(dict)
+        for (user_id, target_type, target_id), (_, liked) in batch:
+            wanted[target_type][(user_id, target_id)] = liked
+
+        writes = 0
+        deltas = Counter()
+        with transaction.atomic():
+            for target_type, states in wanted.items():
+                model = LIKE_MODELS[target_type]
+                column = f'{target_type}_id'
+                user_ids = {user_id for user_id, _ in states}
+                target_ids = {target_id for _, target_id in states}
+                stored = {
+                    (user_id, target_id): like_id
+                    for like_id, user_id, target_id in model.objects.filter(
+                        user_id__in=user_ids, **{f'{column}__in': target_ids}
+                    ).values_list('id', 'user_id', column)
+                    if (user_id, target_id) in states
+                }
+                existing = set(
+                    counters.TARGETS[target_type].objects
+                    .filter(pk__in=target_ids).values_list('pk', flat=True)
+                )
+
+                created = [
+                    model(user_id=user_id, **{column: target_id})
+                    for (user_id, target_id), liked in states.items()
+                    if liked and (user_id, target_id) not in stored and target_id in existing
+                ]
+                removed = [
+                    (stored[pair], pair[1]) for pair, liked in states.items() if not liked and pair in stored
+                ]
+                if created:
+                    model.objects.bulk_create(created, batch_size=settings.LIKE_BUFFER_BATCH_SIZE)
+                    writes += 1
+                if removed:
+                    model.objects.filter(id__in=[like_id for like_id, _ in removed]).delete()
+                    writes += 1
+
+                for like in created:
+                    deltas[target_type, getattr(like, column)] += 1
+                for _, target_id in removed:
+                    deltas[target_type, target_id] -= 1
+
+            for target_type in {target_type for target_type, _ in deltas}:
+                targets = counters.TARGETS[target_type].objects.in_bulk(
+                    [target_id for kind, target_id in deltas if kind == target_type]
+                )
+                for target_id, target in targets.items():
+                    if deltas[target_type, target_id]:
+                        counters.add(target, deltas[target_type, target_id])
+                        writes += 1
+        return writes
+
+    def flush_all(self):
+        while self.flush():
+            pass
+
+    def get_metrics(self):
+        counts = metrics.get_counters(
+            'like_buffer.events', 'like_buffer.flushed', 'like_buffer.writes', 'like_buffer.unbuffered_writes'
+        )
+        writes, unbuffered = counts['like_buffer.writes'], counts['like_buffer.unbuffered_writes']
+        with self._lock:
+            pending = len(self._pending)
+        # Both write counts include the version writes that invalidate the validators.
+        return {
+            'events': counts['like_buffer.events'],
+            'flushed': counts['like_buffer.flushed'],
+            'pending': pending,
+            'writes': writes,
+            'unbuffered_writes': unbuffered,
+            'write_reduction': 1 - metrics.ratio(writes, unbuffered) if unbuffered else 0.0,
+        }
+
+
+like_buffer = LikeBuffer()
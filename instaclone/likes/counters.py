@@ -0,0 +1,131 @@
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Sum, Value
+from django.db.models.functions import Greatest
+
+from comments.models import Comment
+from comments.services import update_top_comments
+from likes.models import CounterShard
+from posts.models import Post, Story
+from posts.ranking import score_expression
+from posts.signals import content_changed
+from utils import versioning
+from utils.background import run_in_background, run_periodically
+
+TARGETS = {'post': Post, 'story': Story, 'comment': Comment}
+TARGET_TYPES = {model: name for name, model in TARGETS.items()}
+
+RATE_KEY = 'counter:rate:{}:{}:{}'
+
+logger = logging.getLogger(__name__)
+
+
+def is_hot(target_type:str, target_id:int):
+    """Whether the object received more than LIKE_COUNTER_HOT_RATE likes in the current window."""
+    window = int(time.time() // settings.LIKE_COUNTER_HOT_WINDOW)
+    key = RATE_KEY.format(target_type, target_id, window)
+    cache.add(key, 0, timeout=settings.LIKE_COUNTER_HOT_WINDOW * 2)
+    try:
+        return cache.incr(key) > settings.LIKE_COUNTER_HOT_RATE
+    except ValueError:
+        return False
+
+
+def _apply(target, delta:int):
+    updates = {'like_count': Greatest(F('like_count') + delta, Value(0))}
+    if isinstance(target, Post):
+        updates['score'] = score_expression(target.created_at, like_delta=delta)
+    type(target).objects.filter(pk=target.pk).update(**updates)
+    if isinstance(target, Comment):
+        run_in_background(update_top_comments, target.pk)
+    _changed(target)
+
+
+def _changed(target):
+    # Validators are bumped after commit, so a reader can never cache the old
+    # count under the new version, and the lookups stay out of the transaction.
+    target_type = TARGET_TYPES[type(target)]
+    if target_type == 'comment':
+        transaction.on_commit(lambda: versioning.bump('comment', target.pk))
+    else:
+        transaction.on_commit(lambda: content_changed(target_type, target.pk, target.user_id))
+
+
+def _add_to_shard(target_type:str, target_id:int, delta:int):
+    number = random.randrange(settings.LIKE_COUNTER_SHARDS)
+    shard = CounterShard.objects.filter(target_type=target_type, target_id=target_id, shard=number)
+    if shard.update(delta=F('delta') + delta):
+        return
+    try:
+        with transaction.atomic():
+            CounterShard.objects.create(target_type=target_type, target_id=target_id, shard=number, delta=delta)
+    except IntegrityError:
+        shard.update(delta=F('delta') + delta)
+
+
+def add(target, delta:int):
+    """
+    Atomically add `delta` to the like count of a post, story or comment.
+
+    Cold objects are updated in place with a single UPDATE. Hot objects get the
+    delta written to one of LIKE_COUNTER_SHARDS random shard rows instead, so
+    concurrent likes do not queue on one row lock; `fold_counters` moves those
+    deltas into `like_count` every LIKE_COUNTER_FOLD_INTERVAL seconds.
+    """
+    target_type = TARGET_TYPES[type(target)]
+    if not is_hot(target_type, target.pk):
+        _apply(target, delta)
+        return
+    _add_to_shard(target_type, target.pk, delta)
+    _changed(target)
+    run_periodically('fold_like_counters', settings.LIKE_COUNTER_FOLD_INTERVAL, fold_counters)
+
+
+def get_like_count(target):
+    """Exact like count of `target`: the stored column plus the deltas not folded yet."""
+    pending = CounterShard.objects.filter(
+        target_type=TARGET_TYPES[type(target)], target_id=target.pk
+    ).aggregate(total=Sum('delta'))['total']
+    like_count = type(target).objects.filter(pk=target.pk).values_list('like_count', flat=True).first() or 0
+    return max(0, like_count + (pending or 0))
+
+
+def fold_counters():
+    """
+    Move the pending shard deltas into `like_count`. Returns the number of objects folded.
+
+    Each shard is decremented by the amount it was read with rather than
+    reset, so increments landing while the fold runs are kept for the next one.
+    Objects whose fold hits a lock timeout are left for the next run.
+    """
+    pending = list(
+        CounterShard.objects.exclude(delta=0).values_list('target_type', 'target_id').distinct()
+    )
+    folded = 0
+    for target_type, target_id in pending:
+        try:
+            with transaction.atomic():
+                shards = list(
+                    CounterShard.objects.select_for_update()
+                    .filter(target_type=target_type, target_id=target_id)
+                    .exclude(delta=0)
+                    .values_list('id', 'delta')
+                )
+                for shard_id, delta in shards:
+                    CounterShard.objects.filter(id=shard_id).update(delta=F('delta') - delta)
+
+                target = TARGETS[target_type].objects.filter(pk=target_id).first()
+                total = sum(delta for _, delta in shards)
+                if target is not None and total:
+                    _apply(target, total)
+        except OperationalError as error:
+            logger.warning('Folding the like counter of %s %s deferred: %s', target_type, target_id, error)
+            continue
+        folded += 1
+    CounterShard.objects.filter(delta=0).delete()
+    return folded
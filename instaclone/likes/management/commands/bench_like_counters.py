@@ -0,0 +1,115 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection
+from django.test.utils import override_settings
+
+from likes.counters import fold_counters, get_like_count
+from likes.models import CounterShard, PostLike
+from likes.services import toggle_like
+from posts.models import Post
+from profiles.models import CustomerUser, Profile
+
+
+def legacy_toggle(user, post_id:int):
+    """The read-modify-write toggle the like views used before `likes.services.toggle_like`."""
+    post = Post.objects.get(id=post_id)
+    like_instance = PostLike.objects.filter(user=user, post=post).first()
+    if like_instance:
+        like_instance.delete()
+        post.like_count = max(0, post.like_count - 1)
+        post.save()
+        return False
+    PostLike.objects.create(user=user, post=post)
+    post.like_count += 1
+    post.save()
+    return True
+
+
+def counter_toggle(user, post_id:int):
+    return toggle_like(user, Post.objects.get(id=post_id))
+
+
+class Command(BaseCommand):
+    help = (
+        'Stress the like toggle with many threads liking and unliking one post, then check that the '
+        'final like count equals the number of likes. Compares the legacy toggle with the counter subsystem.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--users-per-thread', type=int, default=10)
+        parser.add_argument('--toggles', type=int, default=100, help='Toggles per thread.')
+        parser.add_argument('--hot-rate', type=int, default=settings.LIKE_COUNTER_HOT_RATE)
+        parser.add_argument('--retries', type=int, default=50, help='Retries of a toggle failing on a database lock.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        cache.clear()
+        owner = CustomerUser.objects.create(username='bench_likes_owner', email='bench_likes_owner@example.com')
+        Profile.objects.create(user=owner)
+        count = options['threads'] * options['users_per_thread']
+        CustomerUser.objects.bulk_create(
+            CustomerUser(username=f'bench_likes_{i}', email=f'bench_likes_{i}@example.com') for i in range(count)
+        )
+        users = list(CustomerUser.objects.filter(username__startswith='bench_likes_', id__gt=owner.id).order_by('id'))
+        try:
+            with override_settings(LIKE_COUNTER_HOT_RATE=options['hot_rate']):
+                for name, toggle in (('legacy', legacy_toggle), ('counters', counter_toggle)):
+                    self.run(name, toggle, owner, users, options)
+        finally:
+            CustomerUser.objects.filter(id__in=[owner.id, *(user.id for user in users)]).delete()
+            cache.clear()
+
+    def run(self, name:str, toggle, owner, users:list, options:dict):
+        post = Post.objects.create(user=owner, caption='benchmark')
+        per_thread = options['users_per_thread']
+        failures = []
+        retried = [0]
+
+        def work(thread_users:list, rng:random.Random):
+            try:
+                for _ in range(options['toggles']):
+                    user = rng.choice(thread_users)
+                    for attempt in range(options['retries'] + 1):
+                        try:
+                            toggle(user, post.id)
+                            break
+                        except OperationalError:
+                            if attempt == options['retries']:
+                                raise
+                            retried[0] += 1
+                            time.sleep(rng.random() / 100)
+            except Exception as error:
+                failures.append(error)
+            finally:
+                close_old_connections()
+                connection.close()
+
+        threads = [
+            threading.Thread(target=work, args=(users[i * per_thread:(i + 1) * per_thread], random.Random(random.random())))
+            for i in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        seconds = time.perf_counter() - started
+        fold_counters()
+
+        toggles = options['threads'] * options['toggles']
+        liked = PostLike.objects.filter(post=post).count()
+        stored = Post.objects.get(id=post.id).like_count
+        self.stdout.write(
+            f'{name:>8}: {toggles / seconds:8.0f} toggles/s, {retried[0]} lock retries, {len(failures)} failed threads, '
+            f'like_count={stored} likes={liked} exact={get_like_count(post)} '
+            + (self.style.SUCCESS('OK') if stored == liked and not failures else self.style.ERROR('LOST UPDATES'))
+        )
+        CounterShard.objects.filter(target_type='post', target_id=post.id).delete()
+        post.delete()
@@ -0,0 +1,85 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from likes.models import Like, PostLike
+from posts.management.commands.bench_feed import percentile
+from posts.models import Post
+from profiles.models import CustomerUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare like lookup latency on the former polymorphic likes table and on PostLike. '
+        'Both tables get the same synthetic likes inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--likes', type=int, default=200000)
+        parser.add_argument('--lookups', type=int, default=2000)
+        parser.add_argument('--batch', type=int, default=50, help='Posts per "which of these did I like" lookup.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        with transaction.atomic():
+            users, posts = self.build(options)
+            self.run(users, posts, options)
+            transaction.set_rollback(True)
+
+    def build(self, options:dict):
+        CustomerUser.objects.bulk_create(
+            CustomerUser(username=f'bench_lookup_{i}', email=f'bench_lookup_{i}@example.com')
+            for i in range(options['users'])
+        )
+        users = list(CustomerUser.objects.filter(username__startswith='bench_lookup_').values_list('id', flat=True))
+        Post.objects.bulk_create(Post(user_id=random.choice(users), caption='benchmark') for _ in range(options['posts']))
+        posts = list(Post.objects.filter(caption='benchmark').values_list('id', flat=True))
+
+        # Popular posts get most of the likes, as in production.
+        pairs = set()
+        weights = [1 / (rank + 1) for rank in range(len(posts))]
+        while len(pairs) < options['likes']:
+            pairs.update(
+                zip(random.choices(users, k=options['likes']), random.choices(posts, weights=weights, k=options['likes']))
+            )
+        pairs = list(pairs)[:options['likes']]
+        PostLike.objects.bulk_create((PostLike(user_id=user, post_id=post) for user, post in pairs), batch_size=5000)
+        Like.objects.bulk_create((Like(user_id=user, post_id=post) for user, post in pairs), batch_size=5000)
+        return users, posts
+
+    def measure(self, label:str, query, samples:list):
+        latencies = []
+        for sample in samples:
+            started = time.perf_counter()
+            query(*sample)
+            latencies.append((time.perf_counter() - started) * 1_000_000)
+        self.stdout.write(
+            f'{label:<40} p50 {percentile(latencies, 0.5):8.0f}us  p99 {percentile(latencies, 0.99):8.0f}us'
+        )
+
+    def run(self, users:list, posts:list, options:dict):
+        singles = [(random.choice(users), random.choice(posts[:50])) for _ in range(options['lookups'])]
+        batches = [(random.choice(users), random.sample(posts, options['batch'])) for _ in range(options['lookups'])]
+        hot = [(post,) for post in random.choices(posts[:20], k=options['lookups'])]
+
+        for label, model in (('Like', Like), ('PostLike', PostLike)):
+            self.measure(
+                f'{label}: has liked one post',
+                lambda user, post: model.objects.filter(user_id=user, post_id=post).exists(),
+                singles,
+            )
+            self.measure(
+                f'{label}: liked {options["batch"]} posts',
+                lambda user, ids: list(model.objects.filter(user_id=user, post_id__in=ids).values_list('post_id', flat=True)),
+                batches,
+            )
+            self.measure(
+                f'{label}: first 50 likers of a hot post',
+                lambda post: list(model.objects.filter(post_id=post).order_by('created_at').values_list('user_id', flat=True)[:50]),
+                hot,
+            )
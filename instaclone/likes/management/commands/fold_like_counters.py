@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from likes.counters import fold_counters
+
+
+class Command(BaseCommand):
+    help = 'Fold the pending sharded like-count deltas into like_count, e.g. from cron when no web worker is running.'
+
+    def handle(self, *args, **options):
+        folded = fold_counters()
+        self.stdout.write(self.style.SUCCESS(f'Folded like counters of {folded} objects'))
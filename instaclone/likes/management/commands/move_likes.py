@@ -0,0 +1,49 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from likes.models import LIKE_MODELS, Like
+
+
+class Command(BaseCommand):
+    help = (
+        'Copy the rows of the former polymorphic likes table into PostLike, StoryLike and CommentLike in chunks. '
+        'Safe to re-run: rows already copied are skipped.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--delete', action='store_true', help='Delete each chunk from the old table once copied.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        last_id = total = 0
+        while True:
+            rows = list(
+                Like.objects.filter(id__gt=last_id).order_by('id')
+                .values('id', 'user_id', 'post_id', 'story_id', 'comment_id', 'created_at')[:options['chunk_size']]
+            )
+            if not rows:
+                break
+
+            grouped = {target_type: [] for target_type in LIKE_MODELS}
+            for row in rows:
+                for target_type, model in LIKE_MODELS.items():
+                    target_id = row[f'{target_type}_id']
+                    if target_id is not None:
+                        grouped[target_type].append(
+                            model(user_id=row['user_id'], created_at=row['created_at'], **{f'{target_type}_id': target_id})
+                        )
+                        break
+
+            with transaction.atomic():
+                for target_type, likes in grouped.items():
+                    LIKE_MODELS[target_type].objects.bulk_create(likes, batch_size=1000, ignore_conflicts=True)
+                if options['delete']:
+                    Like.objects.filter(id__gt=last_id, id__lte=rows[-1]['id']).delete()
+
+            last_id = rows[-1]['id']
+            total += len(rows)
+            self.stdout.write(f'moved {total} likes')
+        self.stdout.write(self.style.SUCCESS(f'Moved {total} likes in {time.perf_counter() - started:.2f}s'))
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from posts.models import Post, Story
 from comments.models import Comment
 from profiles.models import CustomerUser
@@ -6,10 +7,14 @@ from profiles.models import CustomerUser
 # Create your models here.
 
 class Like(models.Model):
-    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='likes')
-    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes', null=True, blank=True)
-    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='likes', null=True, blank=True)
-    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='likes', null=True, blank=True)
+    """
+    Former polymorphic like table, kept only as the source of `manage.py move_likes`.
+    Likes are stored in `PostLike`, `StoryLike` and `CommentLike`.
+    """
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='+')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
 
@@ -23,4 +28,65 @@ class Like(models.Model):
             content= 'story'
         elif self.comment:
             content = 'comment'
-        return f'{content} liked by {self.user.username}'
\ No newline at end of file
+        return f'{content} liked by {self.user.username}'
+
+
+class PostLike(models.Model):
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='post_likes')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='likes')
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['post', 'user'], name='post_like_unique')]
+        indexes = [models.Index(fields=['post', 'created_at', 'user'], name='post_like_created_idx')]
+
+    def __str__(self):
+        return f'post liked by {self.user.username}'
+
+
+class StoryLike(models.Model):
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='story_likes')
+    story = models.ForeignKey(Story, on_delete=models.CASCADE, related_name='likes')
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['story', 'user'], name='story_like_unique')]
+        indexes = [models.Index(fields=['story', 'created_at', 'user'], name='story_like_created_idx')]
+
+    def __str__(self):
+        return f'story liked by {self.user.username}'
+
+
+class CommentLike(models.Model):
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='comment_likes')
+    comment = models.ForeignKey(Comment, on_delete=models.CASCADE, related_name='likes')
+
+    created_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['comment', 'user'], name='comment_like_unique')]
+        indexes = [models.Index(fields=['comment', 'created_at', 'user'], name='comment_like_created_idx')]
+
+    def __str__(self):
+        return f'comment liked by {self.user.username}'
+
+
+LIKE_MODELS = {'post': PostLike, 'story': StoryLike, 'comment': CommentLike}
+
+
+class CounterShard(models.Model):
+    """Pending like-count delta of a hot post, story or comment, spread over several rows."""
+    target_type = models.CharField(max_length=10)
+    target_id = models.BigIntegerField()
+    shard = models.PositiveSmallIntegerField()
+    delta = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['target_type', 'target_id', 'shard'], name='counter_shard_unique'),
+        ]
+
+    def __str__(self):
+        return f'{self.target_type} {self.target_id} shard {self.shard}: {self.delta}'
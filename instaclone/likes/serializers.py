@@ -1,8 +1,46 @@
 from rest_framework import serializers
-from .models import Like
+from utils.serializers import CompiledListSerializer
+from .counters import TARGET_TYPES
+from .models import CommentLike, PostLike, StoryLike
+from .services import liked_ids, reflect_pending_like
 
-class LikeSerializer(serializers.ModelSerializer):
+class PostLikeSerializer(serializers.ModelSerializer):
     class Meta:
-        model = Like
+        model = PostLike
         fields = '__all__'
-        exclude = ['id']
\ No newline at end of file
+        list_serializer_class = CompiledListSerializer
+
+
+class StoryLikeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StoryLike
+        fields = '__all__'
+        list_serializer_class = CompiledListSerializer
+
+
+class CommentLikeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CommentLike
+        fields = '__all__'
+        list_serializer_class = CompiledListSerializer
+
+
+class ViewerLikesListSerializer(CompiledListSerializer):
+    """
+    List serializer for likeable objects that adds `viewer_has_liked` to every
+    item when a `viewer` is passed in the context. The like states of the
+    whole list are read with a single query.
+    """
+
+    def to_representation(self, data):
+        items = super().to_representation(data)
+        viewer = self.context.get('viewer')
+        if viewer is None or not viewer.is_authenticated:
+            return items
+
+        target_type = TARGET_TYPES[self.child.Meta.model]
+        liked = liked_ids(viewer, target_type, [item['id'] for item in items])
+        for item in items:
+            item['viewer_has_liked'] = item['id'] in liked
+            reflect_pending_like(viewer, target_type, item)
+        return items
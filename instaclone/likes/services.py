@@ -0,0 +1,312 @@
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+
+from likes import counters
+from likes.buffer import like_buffer
+from likes.models import LIKE_MODELS
+from posts.models import Post, Story
+from profiles.models import CustomerUser, Profile
+
+BULK_LIKE_BATCH_SIZE = 250
+
+
+def _supports_returning():
+    return connection.vendor in ('postgresql', 'sqlite') and connection.features.can_return_columns_from_insert
+
+
+def _insert_like(target_type:str, user_id:int, target_id:int):
+    """Store the like in one INSERT ... ON CONFLICT DO NOTHING RETURNING; True when a row was added."""
+    model = LIKE_MODELS[target_type]
+    if not _supports_returning():
+        try:
+            with transaction.atomic():
+                model.objects.create(user_id=user_id, **{f'{target_type}_id': target_id})
+        except IntegrityError:
+            return False
+        return True
+
+    quote = connection.ops.quote_name
+    column = quote(f'{target_type}_id')
+    created_at = model._meta.get_field('created_at').get_db_prep_save(timezone.now(), connection)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({quote("user_id")}, {column}, {quote("created_at")}) '
+            f'VALUES (%s, %s, %s) ON CONFLICT ({column}, {quote("user_id")}) DO NOTHING RETURNING {quote("id")}',
+            [user_id, target_id, created_at],
+        )
+        return cursor.fetchone() is not None
+
+
+def _delete_like(target_type:str, user_id:int, target_id:int):
+    """Remove the like in one DELETE ... RETURNING; True when a row was removed."""
+    model = LIKE_MODELS[target_type]
+    if not _supports_returning():
+        deleted, _ = model.objects.filter(user_id=user_id, **{f'{target_type}_id': target_id}).delete()
+        return bool(deleted)
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(f"{target_type}_id")} = %s '
+            f'AND {quote("user_id")} = %s RETURNING {quote("id")}',
+            [target_id, user_id],
+        )
+        return cursor.fetchone() is not None
+
+
+def _insert_likes(target_type:str, user_id:int, target_ids:list):
+    """Store the likes of `user_id` on `target_ids` with multi-row inserts; returns the ids actually added."""
+    model = LIKE_MODELS[target_type]
+    column = f'{target_type}_id'
+    if not _supports_returning():
+        # Without RETURNING an ignored conflict is indistinguishable from an
+        # insert, so the likes already stored are skipped and the others are
+        # added one by one; a like stored meanwhile by another request fails
+        # its savepoint and is left out.
+        existing = set(
+            model.objects.filter(user_id=user_id, **{f'{column}__in': target_ids}).values_list(column, flat=True)
+        )
+        return [
+            target_id for target_id in target_ids
+            if target_id not in existing and _insert_like(target_type, user_id, target_id)
+        ]
+
+    quote = connection.ops.quote_name
+    created_at = model._meta.get_field('created_at').get_db_prep_save(timezone.now(), connection)
+    added = []
+    with connection.cursor() as cursor:
+        for start in range(0, len(target_ids), BULK_LIKE_BATCH_SIZE):
+            batch = target_ids[start:start + BULK_LIKE_BATCH_SIZE]
+            cursor.execute(
+                f'INSERT INTO {quote(model._meta.db_table)} ({quote("user_id")}, {quote(column)}, {quote("created_at")}) '
+                f'VALUES {", ".join(["(%s, %s, %s)"] * len(batch))} '
+                f'ON CONFLICT ({quote(column)}, {quote("user_id")}) DO NOTHING RETURNING {quote(column)}',
+                [value for target_id in batch for value in (user_id, target_id, created_at)],
+            )
+            added += [target_id for target_id, in cursor.fetchall()]
+    return added
+
+
+def _delete_likes(target_type:str, user_id:int, target_ids:list):
+    """Remove the likes of `user_id` on `target_ids` with one set-based delete; returns the ids actually removed."""
+    model = LIKE_MODELS[target_type]
+    column = f'{target_type}_id'
+    likes = model.objects.filter(user_id=user_id, **{f'{column}__in': target_ids})
+    if not _supports_returning():
+        removed = list(likes.values_list(column, flat=True))
+        likes.delete()
+        return removed
+
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote("user_id")} = %s '
+            f'AND {quote(column)} IN ({", ".join(["%s"] * len(target_ids))}) RETURNING {quote(column)}',
+            [user_id, *target_ids],
+        )
+        return [target_id for target_id, in cursor.fetchall()]
+
+
+def apply_like_operations(user, operations:list, targets:dict):
+    """
+    Apply a batch of `(action, target_type, target_id)` like and unlike operations of `user`, in order.
+
+    `targets` maps `(target_type, target_id)` to the liked objects. Returns, for
+    every operation, whether it changed the like state. Only the net change of
+    each like reaches the database: one multi-row insert and one delete per
+    target type, then one counter update per object whose count changed.
+    """
+    if settings.LIKE_WRITE_BEHIND:
+        return [
+            like_buffer.set(user.id, target_type, target_id, action == 'like')
+            for action, target_type, target_id in operations
+        ]
+
+    ids = defaultdict(set)
+    for _, target_type, target_id in operations:
+        ids[target_type].add(target_id)
+    initial = {}
+    for target_type, target_ids in ids.items():
+        liked = liked_ids(user, target_type, target_ids)
+        initial.update({(target_type, target_id): target_id in liked for target_id in target_ids})
+
+    states = dict(initial)
+    changed = []
+    for action, target_type, target_id in operations:
+        wanted = action == 'like'
+        changed.append(states[target_type, target_id] != wanted)
+        states[target_type, target_id] = wanted
+
+    deltas = Counter()
+    with transaction.atomic():
+        for target_type in ids:
+            keys = [key for key in states if key[0] == target_type and states[key] != initial[key]]
+            added = [target_id for kind, target_id in keys if states[kind, target_id]]
+            removed = [target_id for kind, target_id in keys if not states[kind, target_id]]
+            for target_id in _insert_likes(target_type, user.id, added) if added else []:
+                deltas[target_type, target_id] += 1
+            for target_id in _delete_likes(target_type, user.id, removed) if removed else []:
+                deltas[target_type, target_id] -= 1
+        for key, delta in deltas.items():
+            if delta:
+                counters.add(targets[key], delta)
+    return changed
+
+
+def like(user, target):
+    """
+    Idempotently like `target` (a post, story or comment) for `user`.
+
+    Returns True when the like was added, False when it already existed.
+    The like row and the counter change share one transaction of at most
+    two statements, so retried requests are safe.
+    """
+    target_type = counters.TARGET_TYPES[type(target)]
+    if settings.LIKE_WRITE_BEHIND:
+        return like_buffer.set(user.id, target_type, target.pk, True)
+
+    with transaction.atomic():
+        if not _insert_like(target_type, user.id, target.pk):
+            return False
+        counters.add(target, 1)
+        return True
+
+
+def unlike(user, target):
+    """Idempotently remove the like of `user` on `target`. Returns True when a like was removed."""
+    target_type = counters.TARGET_TYPES[type(target)]
+    if settings.LIKE_WRITE_BEHIND:
+        return like_buffer.set(user.id, target_type, target.pk, False)
+
+    with transaction.atomic():
+        if not _delete_like(target_type, user.id, target.pk):
+            return False
+        counters.add(target, -1)
+        return True
+
+
+def toggle_like(user, target):
+    """
+    Like `target` (a post, story or comment) for `user`, or remove the like if it exists.
+
+    Returns True when the object is liked afterwards. The insert is attempted
+    first, so the transaction starts with a write and takes its row (or, on
+    SQLite, database) lock up front instead of upgrading a read lock. The like
+    count is changed through `likes.counters`, never by saving the liked object.
+    With LIKE_WRITE_BEHIND on, the toggle is recorded in `likes.buffer` instead.
+    """
+    target_type = counters.TARGET_TYPES[type(target)]
+    if settings.LIKE_WRITE_BEHIND:
+        return like_buffer.toggle(user.id, target_type, target.pk)
+
+    with transaction.atomic():
+        if _insert_like(target_type, user.id, target.pk):
+            counters.add(target, 1)
+            return True
+        if _delete_like(target_type, user.id, target.pk):
+            counters.add(target, -1)
+        return False
+
+
+def reflect_pending_like(user, target_type:str, data:dict):
+    """Add the buffered, not yet flushed, like of `user` to the serialized `like_count` of an object."""
+    if settings.LIKE_WRITE_BEHIND and user.is_authenticated:
+        data['like_count'] += like_buffer.pending_delta(user.id, target_type, data['id'])
+    return data
+
+
+def pending_like_vary(user, target_type:str, target_id:int):
+    """
+    ETag variant for the responses `reflect_pending_like` changes.
+
+    Buffered likes bump the object's version only when they are flushed, so
+    until then the liker's response differs from everyone else's under the
+    same version.
+    """
+    if settings.LIKE_WRITE_BEHIND and user.is_authenticated:
+        delta = like_buffer.pending_delta(user.id, target_type, target_id)
+        if delta:
+            return f'{user.id}:{delta}'
+    return ''
+
+
+def visible_targets(user, target_type:str):
+    """Posts, stories or comments `user` may see; comments follow the post or story they belong to."""
+    if target_type == 'comment':
+        return counters.TARGETS['comment'].objects.filter(
+            Q(post__in=Post.objects.visible_to(user)) | Q(story__in=Story.objects.visible_to(user))
+        )
+    return counters.TARGETS[target_type].objects.visible_to(user)
+
+
+def liked_ids(user, target_type:str, ids:list):
+    """The subset of `ids` that `user` has liked, read with one query on the (target, user) unique index."""
+    if not user.is_authenticated or not ids:
+        return set()
+    column = f'{target_type}_id'
+    liked = set(
+        LIKE_MODELS[target_type].objects
+        .filter(user_id=user.id, **{f'{column}__in': ids}).values_list(column, flat=True)
+    )
+    if settings.LIKE_WRITE_BEHIND:
+        for target_id in ids:
+            pending = like_buffer.has_liked(user.id, target_type, target_id)
+            if pending is True:
+                liked.add(target_id)
+            elif pending is False:
+                liked.discard(target_id)
+    return liked
+
+
+def like_states(user, target_type:str, ids:list):
+    """
+    `{'id', 'viewer_has_liked', 'like_count'}` of each visible object in `ids`, in the given order.
+
+    The like state is an EXISTS subquery on the (target, user) unique index,
+    so the whole batch is a single query.
+    """
+    viewer_likes = LIKE_MODELS[target_type].objects.filter(user_id=user.id, **{target_type: OuterRef('pk')})
+    rows = {
+        row['id']: row
+        for row in visible_targets(user, target_type).filter(pk__in=ids)
+        .annotate(viewer_has_liked=Exists(viewer_likes))
+        .values('id', 'viewer_has_liked', 'like_count')
+    }
+    states = []
+    for target_id in dict.fromkeys(ids):
+        if target_id not in rows:
+            continue
+        row = reflect_pending_like(user, target_type, rows[target_id])
+        if settings.LIKE_WRITE_BEHIND:
+            pending = like_buffer.has_liked(user.id, target_type, target_id)
+            row['viewer_has_liked'] = row['viewer_has_liked'] if pending is None else pending
+        states.append(row)
+    return states
+
+
+def liker_summaries(user_ids, request=None):
+    """
+    Compact `{'id', 'username', 'profile_id', 'profile_picture'}` of each user in
+    `user_ids`, keyed by user id and read with a single query.
+    """
+    storage = Profile._meta.get_field('profile_picture').storage
+    summaries = {}
+    rows = CustomerUser.objects.filter(id__in=set(user_ids)).values(
+        'id', 'username', 'profile__id', 'profile__profile_picture'
+    )
+    for row in rows:
+        picture = row['profile__profile_picture']
+        if picture:
+            picture = storage.url(picture)
+            picture = request.build_absolute_uri(picture) if request is not None else picture
+        summaries[row['id']] = {
+            'id': row['id'],
+            'username': row['username'],
+            'profile_id': row['profile__id'],
+            'profile_picture': picture or None,
+        }
+    return summaries
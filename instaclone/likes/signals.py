@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from likes.models import CommentLike, PostLike, StoryLike
+from posts.signals import content_changed
+from utils import versioning
+
+
+@receiver([post_save, post_delete], sender=PostLike)
+def post_like_changed(sender, instance, **kwargs):
+    content_changed('post', instance.post_id)
+
+
+@receiver([post_save, post_delete], sender=StoryLike)
+def story_like_changed(sender, instance, **kwargs):
+    content_changed('story', instance.story_id)
+
+
+@receiver([post_save, post_delete], sender=CommentLike)
+def comment_like_changed(sender, instance, **kwargs):
+    versioning.bump('comment', instance.comment_id)
@@ -1,3 +1,149 @@
-from django.test import TestCase
+import random
+import threading
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import close_old_connections, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from likes.buffer import like_buffer
+from likes.counters import fold_counters, get_like_count
+from likes.models import CounterShard, PostLike
+from likes.services import _insert_likes, toggle_like
+from posts.models import Post
+from profiles.models import CustomerUser, Profile
+from utils import versioning
+
+THREADS = 8
+TOGGLES_PER_THREAD = 40
+
+
+class ConcurrentLikeCountTests(TransactionTestCase):
+    """Concurrent toggles leave `like_count` equal to the number of like rows."""
+
+    def setUp(self):
+        author = CustomerUser.objects.create_user(username='author', email='author@example.com', password='password')
+        self.post = Post.objects.create(user=author, caption='popular')
+        self.users = [
+            CustomerUser.objects.create_user(username=f'fan{i}', email=f'fan{i}@example.com', password='password')
+            for i in range(THREADS * 2)
+        ]
+
+    def toggle_concurrently(self):
+        errors = []
+        start = threading.Barrier(THREADS)
+
+        def worker(seed):
+            rng = random.Random(seed)
+            post = Post.objects.get(id=self.post.id)
+            try:
+                start.wait()
+                for _ in range(TOGGLES_PER_THREAD):
+                    toggle_like(rng.choice(self.users), post)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        close_old_connections()
+        self.assertEqual(errors, [])
+
+    def assert_counts_match(self):
+        likes = PostLike.objects.filter(post=self.post).count()
+        self.assertEqual(get_like_count(self.post), likes)
+        fold_counters()
+        self.assertFalse(CounterShard.objects.exclude(delta=0).exists())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, likes)
+
+    @override_settings(LIKE_COUNTER_HOT_RATE=10 ** 9)
+    def test_cold_counter(self):
+        self.toggle_concurrently()
+        self.assert_counts_match()
+
+    @override_settings(LIKE_COUNTER_HOT_RATE=0)
+    def test_sharded_counter(self):
+        self.toggle_concurrently()
+        self.assertTrue(CounterShard.objects.exists())
+        self.assert_counts_match()
+
+
+class BulkLikeInsertTests(TestCase):
+    """Bulk like inserts report only the likes they added."""
+
+    def setUp(self):
+        self.fan = CustomerUser.objects.create_user(username='fan', email='fan@example.com', password='password')
+        self.posts = [Post.objects.create(user=self.fan, caption=f'post {i}') for i in range(3)]
+        PostLike.objects.create(user=self.fan, post=self.posts[0])
+
+    def assert_added_once(self):
+        ids = [post.id for post in self.posts]
+        self.assertEqual(_insert_likes('post', self.fan.id, ids), ids[1:])
+        self.assertEqual(_insert_likes('post', self.fan.id, ids), [])
+        self.assertEqual(PostLike.objects.filter(user=self.fan).count(), 3)
+
+    def test_insert_with_returning(self):
+        self.assert_added_once()
+
+    def test_insert_without_returning(self):
+        with mock.patch.object(connection.features, 'can_return_columns_from_insert', False):
+            self.assert_added_once()
+
+
+@override_settings(LIKE_WRITE_BEHIND=True, LIKE_BUFFER_FLUSH_INTERVAL=3600, LIKE_COUNTER_HOT_RATE=10 ** 9)
+class LikeBufferFlushTests(TransactionTestCase):
+    """Buffered likes reach the database, the counters and the validators only when flushed."""
+
+    def setUp(self):
+        cache.clear()
+        author = CustomerUser.objects.create_user(username='author', email='author@example.com', password='password')
+        Profile.objects.create(user=author)
+        self.post = Post.objects.create(user=author, caption='buffered')
+        self.fan = CustomerUser.objects.create_user(username='fan', email='fan@example.com', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.fan)
+
+    def tearDown(self):
+        like_buffer.flush_all()
+
+    def detail(self, user, etag=None):
+        client = APIClient()
+        client.force_authenticate(user)
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return client.get(f'/api/v1/open_post_detail/{self.post.id}/', **headers)
+
+    def test_like_then_unlike_cancels_out(self):
+        version = versioning.get_version('post', self.post.id)
+        toggle_like(self.fan, self.post)
+        toggle_like(self.fan, self.post)
+        self.assertEqual(like_buffer.flush(), 0)
+        self.assertFalse(PostLike.objects.exists())
+        self.assertEqual(versioning.get_version('post', self.post.id), version)
+
+    def test_flush_applies_the_like_and_bumps_the_validators_once(self):
+        etag = self.detail(self.fan)['ETag']
+        toggle_like(self.fan, self.post)
+        self.assertFalse(PostLike.objects.exists())
+
+        # Only the liker sees the pending like, under an ETag of its own.
+        response = self.detail(self.fan, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['like_count'], 1)
+        self.assertEqual(self.detail(self.post.user, etag).status_code, 304)
+
+        self.assertEqual(like_buffer.flush(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.like_count, 1)
+        self.assertTrue(PostLike.objects.filter(user=self.fan, post=self.post).exists())
+        self.assertEqual(self.detail(self.post.user, etag).status_code, 200)
+
+        metrics = like_buffer.get_metrics()
+        # The INSERT, the counter UPDATE and the versions of the post and its owner's profile.
+        self.assertEqual(metrics['writes'], 4)
+        self.assertEqual(metrics['unbuffered_writes'], 4)
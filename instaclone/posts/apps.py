@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        from posts import expiry, renditions, signals, uploads
+        if settings.BACKGROUND_SWEEPERS:
+            expiry.schedule_sweeper()
+            renditions.schedule_sweeper()
+            uploads.schedule_expiry()
@@ -0,0 +1,134 @@
+import atexit
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from posts.models import Story, StoryAudience
+from utils import metrics
+from utils.background import run_in_background, run_periodically
+from utils.hyperloglog import HyperLogLog
+
+
+def add_viewers(audience:StoryAudience, user_ids):
+    """
+    Add `user_ids` to the viewers of `audience` and update its `viewer_count`.
+
+    The exact set is turned into a sketch the first time it would grow past
+    STORY_VIEWERS_EXACT_LIMIT. The count never goes down, so the switch and
+    the estimation error never make "seen by N" shrink.
+    """
+    if audience.sketch is None:
+        seen = set(audience.viewer_ids)
+        seen.update(user_ids)
+        if len(seen) <= settings.STORY_VIEWERS_EXACT_LIMIT:
+            audience.viewer_ids = sorted(seen)
+            audience.viewer_count = len(seen)
+            return audience
+        sketch = HyperLogLog(settings.STORY_VIEWERS_SKETCH_PRECISION)
+        sketch.update(seen)
+        audience.viewer_ids = []
+    else:
+        sketch = HyperLogLog.from_bytes(audience.sketch)
+        sketch.update(user_ids)
+    audience.sketch = sketch.to_bytes()
+    audience.viewer_count = max(audience.viewer_count, sketch.count())
+    return audience
+
+
+def get_viewer_count(story_id:int):
+    """The number of unique viewers of a story, read from its `StoryAudience` row."""
+    return StoryAudience.objects.filter(story_id=story_id).values_list('viewer_count', flat=True).first() or 0
+
+
+class StoryViewBuffer:
+    """
+    Per-process buffer of story views.
+
+    Views are collected as a set of viewer ids per story, so repeated views
+    cost nothing, and a flusher merges them into the `StoryAudience` rows every
+    STORY_VIEWS_FLUSH_INTERVAL seconds, at most STORY_VIEWS_BATCH_SIZE stories
+    at a time, with one read, one bulk insert and one bulk update. Views still
+    in the buffer are flushed at exit.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(set)
+        self._started = False
+
+    def _start(self):
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        run_periodically('flush_story_views', settings.STORY_VIEWS_FLUSH_INTERVAL, self.flush_all)
+        atexit.register(self.flush_all)
+
+    def record(self, story_id:int, user_id:int):
+        """Record that `user_id` saw the story."""
+        with self._lock:
+            self._pending[story_id].add(user_id)
+            size = len(self._pending)
+        metrics.incr('story_views.recorded')
+        self._start()
+        if size >= settings.STORY_VIEWS_BATCH_SIZE:
+            run_in_background(self.flush)
+
+    def _take(self):
+        with self._lock:
+            story_ids = list(self._pending)[:settings.STORY_VIEWS_BATCH_SIZE]
+            return {story_id: self._pending.pop(story_id) for story_id in story_ids}
+
+    def _restore(self, batch:dict):
+        with self._lock:
+            for story_id, user_ids in batch.items():
+                self._pending[story_id].update(user_ids)
+
+    def flush(self):
+        """Merge the views of up to STORY_VIEWS_BATCH_SIZE stories. Returns the number of stories flushed."""
+        batch = self._take()
+        if not batch:
+            return 0
+        try:
+            self._apply(batch)
+        except Exception:
+            self._restore(batch)
+            raise
+        metrics.incr('story_views.flushed', sum(len(user_ids) for user_ids in batch.values()))
+        return len(batch)
+
+    def _apply(self, batch:dict):
+        with transaction.atomic():
+            audiences = StoryAudience.objects.select_for_update().in_bulk(list(batch))
+            missing = set(batch) - set(audiences)
+            live = set(Story.objects.filter(id__in=missing).values_list('id', flat=True)) if missing else set()
+
+            created, updated = [], []
+            for story_id, user_ids in batch.items():
+                if story_id in audiences:
+                    updated.append(add_viewers(audiences[story_id], user_ids))
+                elif story_id in live:
+                    created.append(add_viewers(StoryAudience(story_id=story_id), user_ids))
+            if created:
+                StoryAudience.objects.bulk_create(created)
+            if updated:
+                StoryAudience.objects.bulk_update(updated, ['viewer_count', 'viewer_ids', 'sketch'])
+
+    def flush_all(self):
+        while self.flush():
+            pass
+
+    def get_metrics(self):
+        counts = metrics.get_counters('story_views.recorded', 'story_views.flushed')
+        with self._lock:
+            pending = sum(len(user_ids) for user_ids in self._pending.values())
+        return {
+            'recorded': counts['story_views.recorded'],
+            'flushed': counts['story_views.flushed'],
+            'pending': pending,
+        }
+
+
+story_view_buffer = StoryViewBuffer()
@@ -0,0 +1,159 @@
+import logging
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils.timezone import now
+
+from comments.models import Comment
+from direct_messages.models import DirectMessage
+from likes.models import CommentLike, CounterShard, Like, StoryLike
+from posts import search
+from posts.models import STORY_LIFETIME, Story, StoryAudience
+from profiles.models import Profile
+from utils import metrics, versioning
+from utils.background import run_periodically
+from utils.images import rendition_files
+from utils.storage import ContentAddressedStorage, release_references
+
+IN_CHUNK_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+def _delete_in(model, column:str, ids:list):
+    """
+    Delete the rows of `model` whose `column` is in `ids` with plain DELETE statements.
+
+    The receivers of these models do per-row cache work that makes no sense
+    for rows nobody can see any more, so the collector is bypassed and the
+    side effects are done once per batch by the sweeper.
+    """
+    quote = connection.ops.quote_name
+    deleted = 0
+    with connection.cursor() as cursor:
+        for start in range(0, len(ids), IN_CHUNK_SIZE):
+            chunk = ids[start:start + IN_CHUNK_SIZE]
+            cursor.execute(
+                f'DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({", ".join(["%s"] * len(chunk))})',
+                chunk,
+            )
+            deleted += cursor.rowcount
+    return deleted
+
+
+def _delete_files(storage, names):
+    """
+    Delete the files `names`. Returns `(files, bytes, references)`: the plain
+    files removed with their total size, and the references dropped to
+    content-addressed blobs, whose bytes are only freed by `collect_garbage`
+    once no row references them.
+    """
+    content_addressed = isinstance(storage, ContentAddressedStorage)
+    blobs = [name for name in names if content_addressed and storage.is_blob(name)]
+    if blobs:
+        release_references(blobs)
+
+    files = size = 0
+    for name in names:
+        if content_addressed and storage.is_blob(name):
+            continue
+        try:
+            file_size = storage.size(name)
+            storage.delete(name)
+        except OSError as error:
+            logger.warning('Could not remove the media file %s of an expired story: %s', name, error)
+            continue
+        files += 1
+        size += file_size
+    return files, size, len(blobs)
+
+
+def sweep_batch(cutoff, batch_size:int):
+    """
+    Delete up to `batch_size` stories created before `cutoff`, oldest first,
+    with everything that depends on them. Returns a report of the rows deleted
+    per table, the plain files and bytes removed and the blob references
+    released, or None when there was nothing to delete.
+
+    The rows go in one transaction; the media files are removed after it
+    commits, so a failed batch never leaves rows pointing at missing files.
+    """
+    stories = list(
+        Story.objects.filter(created_at__lt=cutoff).order_by('created_at')
+        .values('id', 'user_id', 'image', 'video', 'renditions')[:batch_size]
+    )
+    if not stories:
+        return None
+    story_ids = [story['id'] for story in stories]
+
+    with transaction.atomic():
+        comment_ids = list(Comment.objects.filter(story_id__in=story_ids).values_list('id', flat=True))
+        comment_ids += list(Comment.objects.filter(parent_id__in=comment_ids).values_list('id', flat=True))
+        DirectMessage.objects.filter(story_id__in=story_ids).update(story=None)
+        rows = {
+            'story_likes': _delete_in(StoryLike, 'story_id', story_ids),
+            'comment_likes': _delete_in(CommentLike, 'comment_id', comment_ids),
+            'legacy_likes': Like.objects.filter(story_id__in=story_ids).delete()[0]
+            + Like.objects.filter(comment_id__in=comment_ids).delete()[0],
+            'counter_shards': CounterShard.objects.filter(target_type='story', target_id__in=story_ids).delete()[0]
+            + CounterShard.objects.filter(target_type='comment', target_id__in=comment_ids).delete()[0],
+            'comments': _delete_in(Comment, 'id', comment_ids),
+            'story_audiences': StoryAudience.objects.filter(story_id__in=story_ids).delete()[0],
+            'stories': _delete_in(Story, 'id', story_ids),
+        }
+        search.remove_objects('story', story_ids)
+        search.remove_objects('comment', comment_ids)
+
+    versioning.bump('stories')
+    owners = {story['user_id'] for story in stories}
+    for user_id in owners:
+        versioning.bump('story_owner', user_id)
+    for profile_id in Profile.objects.filter(user_id__in=owners).values_list('id', flat=True):
+        versioning.bump('profile', profile_id)
+
+    # A list, not a set: stories sharing a blob each hold a reference to it.
+    originals = [story[field] for story in stories for field in ('image', 'video') if story[field]]
+    renditions = {name for story in stories for name in rendition_files(story['renditions'])}
+    files, size, references = _delete_files(Story._meta.get_field('image').storage, originals)
+    rendition_count, rendition_size, rendition_references = _delete_files(default_storage, renditions)
+    rows['files'], rows['bytes'] = files + rendition_count, size + rendition_size
+    rows['blob_references'] = references + rendition_references
+    return rows
+
+
+def sweep_expired_stories(batch_size:int=None, max_batches:int=None):
+    """
+    Delete the stories older than `STORY_LIFETIME` in batches of `batch_size`
+    (STORY_SWEEP_BATCH_SIZE by default), stopping after `max_batches` when it
+    is given. Returns the totals of `sweep_batch` reports.
+    """
+    batch_size = batch_size or settings.STORY_SWEEP_BATCH_SIZE
+    cutoff = now() - STORY_LIFETIME
+    totals = {}
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        report = sweep_batch(cutoff, batch_size)
+        if report is None:
+            break
+        batches += 1
+        for name, value in report.items():
+            totals[name] = totals.get(name, 0) + value
+    for name, value in totals.items():
+        metrics.incr(f'story_sweeper.{name}', value)
+    return totals
+
+
+def sweep_periodically():
+    sweep_expired_stories(max_batches=settings.STORY_SWEEP_MAX_BATCHES)
+
+
+def schedule_sweeper():
+    """Start, once per process, the background sweep of expired stories every STORY_SWEEP_INTERVAL seconds."""
+    run_periodically('sweep_expired_stories', settings.STORY_SWEEP_INTERVAL, sweep_periodically)
+
+
+def sweeper_metrics():
+    names = ('stories', 'story_likes', 'comments', 'comment_likes', 'files', 'bytes', 'blob_references')
+    counters = metrics.get_counters(*(f'story_sweeper.{name}' for name in names))
+    return {name: counters[f'story_sweeper.{name}'] for name in names}
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand
+
+from direct_messages.models import DirectMessage
+from posts.models import Post, Story
+from profiles.models import Profile
+from utils.media import media_fields, read_metadata
+
+MODELS = [Post, Story, DirectMessage, Profile]
+
+
+def backfill_file(field, name:str, strip:bool):
+    """Read the metadata columns of a stored file. Returns `(columns, new name)`, or None when it cannot be read."""
+    storage = field.storage
+    try:
+        with storage.open(name, 'rb') as file:
+            columns, data = read_metadata(field, file)
+            size = file.size
+    except OSError:
+        return None
+    if data is None:
+        return columns, name
+    if not strip:
+        columns[f'{field.name}_size'] = size
+        return columns, name
+    storage.delete(name)
+    return columns, storage.save(name, ContentFile(data))
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the media metadata columns (dimensions, byte size, duration) of files uploaded before '
+        'they existed. Files are read in parallel, one batch of rows at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument(
+            '--strip-exif', action='store_true',
+            help='Also store images again without their EXIF, like new uploads.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            for model in MODELS:
+                for field in media_fields(model):
+                    self._backfill(pool, model, field, options)
+        self.stdout.write(self.style.SUCCESS(f'Done in {time.perf_counter() - started:.2f}s'))
+
+    def _backfill(self, pool, model, field, options):
+        pending = model.objects.exclude(**{field.name: ''}).filter(
+            **{f'{field.name}__isnull': False, f'{field.name}_size__isnull': True}
+        )
+        label = f'{model.__name__}.{field.name}'
+        last_id = done = missing = 0
+        while True:
+            rows = list(
+                pending.filter(id__gt=last_id).order_by('id')
+                .values_list('id', field.name)[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            results = pool.map(lambda row: backfill_file(field, row[1], options['strip_exif']), rows)
+
+            updated, columns = [], set()
+            for (pk, name), result in zip(rows, results):
+                if result is None:
+                    missing += 1
+                    continue
+                values, new_name = result
+                instance = model(id=pk, **values)
+                setattr(instance, field.name, new_name)
+                updated.append(instance)
+                columns.update(values)
+            if updated:
+                model.objects.bulk_update(updated, [*columns, field.name])
+            done += len(updated)
+            self.stdout.write(f'{label}: {done} files')
+        self.stdout.write(f'{label}: {done} files backfilled, {missing} missing')
@@ -0,0 +1,90 @@
+import random
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from posts.models import Post
+from posts.timeline import fan_out_post, feed_metrics, read_home_timeline
+from profiles.models import CustomerUser, Profile
+
+
+def percentile(samples:list, fraction:float):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the hybrid feed on a synthetic follower graph with a long tail of popular accounts. '
+        'Everything runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=2000)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--reads', type=int, default=500)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--zipf', type=float, default=1.1, help='Exponent of the follower-count distribution.')
+        parser.add_argument('--threshold', type=int, default=settings.FEED_FANOUT_FOLLOWER_THRESHOLD)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        cache.clear()
+        with override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=options['threshold']), transaction.atomic():
+            users, follower_counts = self.build_graph(options['users'], options['zipf'])
+            self.run(users, follower_counts, options)
+            transaction.set_rollback(True)
+        cache.clear()
+
+    def build_graph(self, count:int, exponent:float):
+        CustomerUser.objects.bulk_create(
+            CustomerUser(username=f'bench_feed_{i}', email=f'bench_feed_{i}@example.com') for i in range(count)
+        )
+        users = list(CustomerUser.objects.filter(username__startswith='bench_feed_').order_by('id'))
+        Profile.objects.bulk_create(Profile(user=user) for user in users)
+        profiles = {profile.user_id: profile.id for profile in Profile.objects.filter(user__in=users)}
+
+        Followers = Profile.followers.through
+        follower_counts = {}
+        ids = [user.id for user in users]
+        rows = []
+        for rank, user in enumerate(users):
+            wanted = min(count - 1, max(1, int((count - 1) / (rank + 1) ** exponent)))
+            followers = random.sample(ids, wanted + 1)
+            followers = [follower for follower in followers if follower != user.id][:wanted]
+            follower_counts[user.id] = len(followers)
+            rows.extend(Followers(profile_id=profiles[user.id], customeruser_id=follower) for follower in followers)
+        Followers.objects.bulk_create(rows, batch_size=5000)
+        return users, follower_counts
+
+    def run(self, users:list, follower_counts:dict, options:dict):
+        authors = random.choices(users, k=options['posts'])
+        pushed_rows = push_only_rows = 0
+        started = time.perf_counter()
+        for author in authors:
+            post = Post.objects.create(user=author, caption='benchmark')
+            pushed_rows += fan_out_post(post.id)
+            push_only_rows += 1 + follower_counts[author.id]
+        write_seconds = time.perf_counter() - started
+
+        latencies = []
+        for reader in random.choices(users, k=options['reads']):
+            started = time.perf_counter()
+            read_home_timeline(reader, None, False, options['page_size'])
+            latencies.append((time.perf_counter() - started) * 1000)
+
+        popular = sum(1 for count in follower_counts.values() if count > options['threshold'])
+        self.stdout.write(f"users: {len(users)}, follower edges: {sum(follower_counts.values())}, "
+                          f"accounts above threshold {options['threshold']}: {popular}")
+        self.stdout.write(f"largest follower counts: {sorted(follower_counts.values(), reverse=True)[:5]}")
+        self.stdout.write(f"posts: {len(authors)} in {write_seconds:.2f}s")
+        self.stdout.write(f"write amplification: hybrid {pushed_rows / len(authors):.1f} rows/post, "
+                          f"push-only {push_only_rows / len(authors):.1f} rows/post")
+        self.stdout.write(f"read latency over {len(latencies)} reads: p50 {percentile(latencies, 0.5):.2f}ms, "
+                          f"p99 {percentile(latencies, 0.99):.2f}ms")
+        self.stdout.write(f"feed metrics: {feed_metrics()}")
@@ -0,0 +1,56 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.images import render_image
+
+IMAGE_SUFFIXES = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tif', '.tiff'}
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the rendering of image renditions over a folder of images, serially and with a '
+        'process pool. Nothing is written to the storage or the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('folder', help='Folder of images to render.')
+        parser.add_argument('--workers', type=int, default=settings.MEDIA_RENDITION_WORKERS)
+        parser.add_argument('--skip-serial', action='store_true')
+
+    def handle(self, *args, **options):
+        paths = sorted(
+            path for path in Path(options['folder']).iterdir() if path.suffix.lower() in IMAGE_SUFFIXES
+        )
+        if not paths:
+            raise CommandError(f'No images in {options["folder"]}')
+        images = [path.read_bytes() for path in paths]
+        sizes, formats = settings.MEDIA_RENDITION_SIZES, settings.MEDIA_RENDITION_FORMATS
+        self.stdout.write(
+            f'{len(images)} images, {sum(map(len, images))} bytes, '
+            f'renditions {", ".join(sizes)} in {", ".join(formats)}'
+        )
+
+        if not options['skip_serial']:
+            started = time.perf_counter()
+            outputs = [render_image(data, sizes, formats) for data in images]
+            self._report('serial', images, outputs, time.perf_counter() - started)
+
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=options['workers'], mp_context=context) as pool:
+            # Start the workers before timing, like the long-lived pool of the server.
+            list(pool.map(abs, range(options['workers'])))
+            started = time.perf_counter()
+            outputs = list(pool.map(render_image, images, [sizes] * len(images), [formats] * len(images)))
+            self._report(f'{options["workers"]} workers', images, outputs, time.perf_counter() - started)
+
+    def _report(self, label, images, outputs, seconds):
+        self.stdout.write(f'{label}: {len(images) / seconds:.1f} images/s ({seconds:.2f}s)')
+        for output_format in settings.MEDIA_RENDITION_FORMATS:
+            for name in settings.MEDIA_RENDITION_SIZES:
+                size = sum(len(output[name][output_format]) for output in outputs)
+                self.stdout.write(f'  {name:<6} {output_format:<5} {size:>10} bytes out, {size // len(outputs):>8} per image')
@@ -0,0 +1,115 @@
+import itertools
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+from posts.management.commands.bench_feed import percentile
+from posts.models import Post
+from profiles.models import CustomerUser, Profile
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark full-text search on synthetic captions with a Zipf word distribution, against a LIKE scan. '
+        'Everything runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--vocabulary', type=int, default=50000)
+        parser.add_argument('--words', type=int, default=12, help='Words per caption.')
+        parser.add_argument('--queries', type=int, default=200)
+        parser.add_argument('--like-queries', type=int, default=5)
+        parser.add_argument('--private-share', type=float, default=0.5)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if not search.search_available():
+            raise CommandError('Full-text search needs the SQLite FTS5 extension.')
+        random.seed(options['seed'])
+        with transaction.atomic():
+            search.create_index()
+            viewer, vocabulary = self.build(options)
+            self.run(viewer, vocabulary, options)
+            transaction.set_rollback(True)
+
+    def build(self, options:dict):
+        CustomerUser.objects.bulk_create(
+            CustomerUser(username=f'bench_search_{i}', email=f'bench_search_{i}@example.com')
+            for i in range(options['authors'] + 1)
+        )
+        users = list(CustomerUser.objects.filter(username__startswith='bench_search_').order_by('id'))
+        viewer, authors = users[0], users[1:]
+        Profile.objects.bulk_create(
+            Profile(user=user, profile_status=Profile.PRIVATE_PROFILE if random.random() < options['private_share']
+                    else Profile.OPEN_PROFILE)
+            for user in users
+        )
+        Followers = Profile.followers.through
+        followed = Profile.objects.filter(user__in=random.sample(authors, len(authors) // 10))
+        Followers.objects.bulk_create(Followers(profile=profile, customeruser=viewer) for profile in followed)
+
+        vocabulary = [f'w{i:x}' for i in range(options['vocabulary'])]
+        weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(vocabulary))))
+        started = time.perf_counter()
+        chunk = 20000
+        for offset in range(0, options['rows'], chunk):
+            size = min(chunk, options['rows'] - offset)
+            words = random.choices(vocabulary, cum_weights=weights, k=size * options['words'])
+            Post.objects.bulk_create(
+                Post(user=random.choice(authors), caption=' '.join(words[i * options['words']:(i + 1) * options['words']]))
+                for i in range(size)
+            )
+        insert_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        last_id = 0
+        while True:
+            rows = list(
+                Post.objects.filter(id__gt=last_id, user__in=authors).order_by('id')
+                .values_list('id', 'caption')[:chunk]
+            )
+            if not rows:
+                break
+            search.index_rows('post', rows)
+            last_id = rows[-1][0]
+        search.optimize_index()
+        index_seconds = time.perf_counter() - started
+        self.stdout.write(f"rows: {options['rows']}, inserted in {insert_seconds:.2f}s, "
+                          f"indexed in {index_seconds:.2f}s ({options['rows'] / index_seconds:.0f} rows/s)")
+        return viewer, vocabulary
+
+    def run(self, viewer, vocabulary:list, options:dict):
+        bands = {
+            'common': vocabulary[:10],
+            'medium': vocabulary[500:1500],
+            'rare': vocabulary[20000:],
+            'two words': [f'{a} {b}' for a, b in zip(vocabulary[10:200], vocabulary[200:390])],
+        }
+        for band, terms in bands.items():
+            first, deep = [], []
+            for _ in range(options['queries']):
+                expression = search.match_expression(random.choice(terms))
+                started = time.perf_counter()
+                page = search.search(viewer, expression, ['post'], limit=21)
+                first.append((time.perf_counter() - started) * 1000)
+                if len(page) > 20:
+                    started = time.perf_counter()
+                    search.search(viewer, expression, ['post'], (page[19]['rank'], page[19]['rowid']), limit=21)
+                    deep.append((time.perf_counter() - started) * 1000)
+            line = f'{band}: first page p50 {percentile(first, 0.5):.2f}ms, p99 {percentile(first, 0.99):.2f}ms'
+            if deep:
+                line += f', next page p50 {percentile(deep, 0.5):.2f}ms, p99 {percentile(deep, 0.99):.2f}ms'
+            self.stdout.write(line)
+
+        scans = []
+        for _ in range(options['like_queries']):
+            term = random.choice(bands['rare'])
+            started = time.perf_counter()
+            list(Post.objects.visible_to(viewer).filter(caption__icontains=term).order_by('-id')[:21])
+            scans.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(f'LIKE scan, rare words: p50 {percentile(scans, 0.5):.2f}ms, max {max(scans):.2f}ms')
@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import serializers
+from rest_framework.renderers import JSONRenderer
+
+from posts.models import Post
+from posts.serializers import PostSerializer
+from profiles.models import CustomerUser
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare rows per second of the regular DRF list path and the compiled read-only path '
+        'for PostSerializer, and check that both render the same JSON bytes. '
+        'Everything runs inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            user = CustomerUser.objects.create(username='bench_serializers', email='bench_serializers@example.com')
+            Post.objects.bulk_create(
+                (Post(user=user, caption=f'caption {i}', like_count=i % 97) for i in range(options['rows'])),
+                batch_size=1000,
+            )
+            posts = Post.objects.filter(user=user).order_by('-created_at', '-id')
+
+            def regular():
+                return serializers.ListSerializer(list(posts), child=PostSerializer()).data
+
+            def compiled():
+                return PostSerializer(posts, many=True).data
+
+            results = {}
+            for name, path in (('drf', regular), ('compiled', compiled)):
+                best = None
+                for _ in range(options['repeat']):
+                    started = time.perf_counter()
+                    data = path()
+                    elapsed = time.perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                results[name] = (best, JSONRenderer().render(data))
+                self.stdout.write(f'{name}: {options["rows"] / best:,.0f} rows/s ({best * 1000:.1f}ms)')
+
+            identical = results['drf'][1] == results['compiled'][1]
+            self.stdout.write(f'speedup: {results["drf"][0] / results["compiled"][0]:.1f}x, identical JSON: {identical}')
+            transaction.set_rollback(True)
@@ -0,0 +1,49 @@
+import json
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.audience import add_viewers
+from posts.models import StoryAudience
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the storage per story and the counting error of story audiences, exact and sketched, '
+        'for a range of audience sizes. Nothing is written to the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='10,100,500,1000,10000,100000,1000000')
+        parser.add_argument('--trials', type=int, default=5)
+        parser.add_argument('--flush-size', type=int, default=1000, help='Viewers merged per flush.')
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        self.stdout.write(f'exact limit {settings.STORY_VIEWERS_EXACT_LIMIT}, '
+                          f'sketch precision {settings.STORY_VIEWERS_SKETCH_PRECISION}')
+        for size in [int(value) for value in options['sizes'].split(',')]:
+            errors = []
+            started = time.perf_counter()
+            for _ in range(options['trials']):
+                offset = random.randrange(10 ** 9)
+                viewers = list(range(offset, offset + size))
+                # Every viewer is seen twice, in a different flush, like a story watched again.
+                views = viewers + random.sample(viewers, size)
+                audience = StoryAudience(story_id=0)
+                for start in range(0, len(views), options['flush_size']):
+                    add_viewers(audience, views[start:start + options['flush_size']])
+                errors.append(abs(audience.viewer_count - size) / size * 100)
+            seconds = (time.perf_counter() - started) / options['trials']
+
+            stored = len(json.dumps(audience.viewer_ids)) + len(audience.sketch or b'')
+            exact = len(json.dumps(sorted(viewers)))
+            kind = 'exact' if audience.sketch is None else 'sketch'
+            self.stdout.write(
+                f'{size:>8} viewers: {kind:<6} {stored:>8} bytes (exact set {exact} bytes), '
+                f'error mean {sum(errors) / len(errors):.2f}% max {max(errors):.2f}%, '
+                f'{seconds * 1000:.0f}ms per story'
+            )
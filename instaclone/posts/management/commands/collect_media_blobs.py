@@ -0,0 +1,39 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from direct_messages.models import DirectMessage
+from posts.models import Post, Story
+from utils.storage import blob_metrics, collect_garbage, recount_references
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete, in batches, the media blobs no post, story or message has referenced for the grace '
+        'period, then report the deduplication ratio and the bytes it saves.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.MEDIA_BLOB_GC_BATCH_SIZE)
+        parser.add_argument('--grace', type=float, default=settings.MEDIA_BLOB_GC_GRACE,
+                            help='Seconds a blob must have been unreferenced before it is deleted.')
+        parser.add_argument('--recount', action='store_true',
+                            help='Recompute the reference counts from the rows first, e.g. after raw SQL deletes.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['recount']:
+            fixed = recount_references([Post, Story, DirectMessage])
+            self.stdout.write(f'recounted references, {fixed} blobs fixed')
+        removed, removed_bytes = collect_garbage(options['batch_size'], options['grace'])
+        report = blob_metrics()
+        ratio = report['dedup_ratio']
+        self.stdout.write(
+            f'{report["blobs"]} blobs, {report["references"]} references: '
+            f'{report["stored_bytes"]} bytes stored for {report["referenced_bytes"]} referenced, '
+            f'dedup ratio {ratio if ratio is not None else "-"}, {report["bytes_saved"]} bytes saved'
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'Deleted {removed} unreferenced blobs ({removed_bytes} bytes) in {time.perf_counter() - started:.2f}s'
+        ))
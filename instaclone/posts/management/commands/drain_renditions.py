@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import renditions
+from posts.models import MEDIA_PENDING, MEDIA_PROCESSING, Post, Story
+
+
+class Command(BaseCommand):
+    help = (
+        'Put uploads stuck in processing for longer than MEDIA_RENDITION_TIMEOUT back to pending, '
+        'then render the pending ones and wait for them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--timeout', type=float, default=None,
+                            help='Seconds an upload may stay processing before it is reclaimed.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        reclaimed = renditions.reclaim_stale(options['timeout'])
+        renditions.drain()
+        # Renders finish on the background threads; the command waits for the ones it started.
+        statuses = [MEDIA_PENDING, MEDIA_PROCESSING]
+        while renditions.rendition_metrics()['in_flight']:
+            time.sleep(0.5)
+        left = sum(model.objects.filter(media_status__in=statuses).count() for model in (Post, Story))
+        report = renditions.rendition_metrics()
+        self.stdout.write(self.style.SUCCESS(
+            f'Reclaimed {reclaimed} stalled uploads; rendered {report["done"]}, {report["failed"]} failed, '
+            f'{left} still waiting, in {time.perf_counter() - started:.2f}s'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from posts.uploads import expire_sessions
+
+
+class Command(BaseCommand):
+    help = 'Delete the upload sessions older than UPLOAD_SESSION_LIFETIME with their partial files.'
+
+    def handle(self, *args, **options):
+        expired = expire_sessions()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {expired} expired upload sessions'))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Recreate the full-text search index of post captions, story captions and comments from scratch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        if not search.search_available():
+            raise CommandError('Full-text search needs the SQLite FTS5 extension.')
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            search.drop_index()
+            search.create_index()
+            for kind, (model, column) in search.SOURCES.items():
+                last_id = total = 0
+                while True:
+                    rows = list(
+                        model.objects.filter(id__gt=last_id).order_by('id')
+                        .values_list('id', column)[:options['chunk_size']]
+                    )
+                    if not rows:
+                        break
+                    search.index_rows(kind, rows)
+                    last_id = rows[-1][0]
+                    total += len(rows)
+                    self.stdout.write(f'indexed {total} {kind} rows')
+            search.optimize_index()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the search index in {time.perf_counter() - started:.2f}s'))
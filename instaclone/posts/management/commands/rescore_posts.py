@@ -0,0 +1,34 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.ranking import rescore_chunk
+
+
+class Command(BaseCommand):
+    help = 'Recompute the ranking score of every post in chunks, e.g. after a change of the scoring formula.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        last_id = total = 0
+        while True:
+            rows = list(
+                Post.objects.filter(id__gt=last_id).order_by('id')
+                .values_list('id', 'like_count', 'comment_count', 'created_at')[:options['chunk_size']]
+            )
+            if not rows:
+                break
+            ids, scores = rescore_chunk(rows)
+            Post.objects.bulk_update(
+                [Post(id=post_id, score=score) for post_id, score in zip(ids, scores)],
+                ['score'],
+                batch_size=1000,
+            )
+            last_id = ids[-1]
+            total += len(rows)
+            self.stdout.write(f'rescored {total} posts')
+        self.stdout.write(self.style.SUCCESS(f'Rescored {total} posts in {time.perf_counter() - started:.2f}s'))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts.expiry import sweep_expired_stories
+
+
+class Command(BaseCommand):
+    help = 'Delete expired stories with their likes, comments and media files, in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--max-batches', type=int, default=None)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = sweep_expired_stories(options['batch_size'], options['max_batches'])
+        if not report:
+            self.stdout.write('No expired stories.')
+            return
+        for name, value in report.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(self.style.SUCCESS(
+            f"Reclaimed {report['stories']} stories and {report['bytes']} bytes of media files, and released "
+            f"{report['blob_references']} references to shared blobs in {time.perf_counter() - started:.2f}s"
+        ))
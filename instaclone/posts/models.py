@@ -1,7 +1,45 @@
+import math
+import uuid
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
 from datetime import timedelta
 from django.utils.timezone import now
-from profiles.models import CustomerUser
+from profiles.models import CustomerUser, Profile
+from utils.storage import media_storage
+
+STORY_LIFETIME = timedelta(hours=24)
+
+MEDIA_PENDING = 'pending'
+MEDIA_PROCESSING = 'processing'
+MEDIA_READY = 'ready'
+MEDIA_FAILED = 'failed'
+MEDIA_STATUSES = [
+    (MEDIA_PENDING, 'Pending'),
+    (MEDIA_PROCESSING, 'Processing'),
+    (MEDIA_READY, 'Ready'),
+    (MEDIA_FAILED, 'Failed'),
+]
+
+
+class VisibleContentQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """
+        Rows `user` may see: their own, those of open profiles, and those of private profiles they follow.
+
+        The follow check is a single EXISTS subquery, so the query count does not
+        depend on the number of rows or followers.
+        """
+        if user.is_authenticated and user.is_staff:
+            return self
+        condition = Q(user__profile__profile_status=Profile.OPEN_PROFILE)
+        if user.is_authenticated:
+            follows = Profile.followers.through.objects.filter(
+                profile__user_id=OuterRef('user_id'), customeruser_id=user.id
+            )
+            condition |= Q(user_id=user.id) | Exists(follows)
+        return self.filter(condition)
 
 
 class Post(models.Model):
@@ -9,9 +47,45 @@ class Post(models.Model):
 
     caption = models.CharField(max_length=2200, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    image = models.ImageField(upload_to='images/', null=True, blank=True)
-    video = models.FileField(upload_to='videos/', null=True, blank=True)
+    image = models.ImageField(upload_to='images/', storage=media_storage, null=True, blank=True)
+    video = models.FileField(upload_to='videos/', storage=media_storage, null=True, blank=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_size = models.PositiveBigIntegerField(null=True, blank=True)
+    video_size = models.PositiveBigIntegerField(null=True, blank=True)
+    video_duration = models.FloatField(null=True, blank=True)
     like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    score = models.FloatField(default=0)
+    top_comments = models.JSONField(default=list, blank=True, encoder=DjangoJSONEncoder)
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUSES, blank=True, default='')
+    media_started_at = models.DateTimeField(null=True, blank=True)
+    renditions = models.JSONField(default=dict, blank=True)
+
+    objects = VisibleContentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='post_created_id_idx'),
+            models.Index(fields=['-score', '-id'], name='post_score_id_idx'),
+            models.Index(fields=['media_status'], name='post_media_status_idx'),
+        ]
+
+    @staticmethod
+    def engagement_score(like_count, comment_count, created_at):
+        """
+        Ranking score of a post: log-scaled engagement plus an age term.
+
+        Newer posts get a larger age term, so older posts decay relative to them
+        without ever being rescored for the passage of time.
+        """
+        engagement = max(like_count + settings.FEED_SCORE_COMMENT_WEIGHT * comment_count, 1)
+        return math.log10(engagement) + created_at.timestamp() / settings.FEED_SCORE_DECAY_SECONDS
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.score = self.engagement_score(self.like_count, self.comment_count, self.created_at or now())
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f'{self.user.username}: {self.caption[:20]}'
@@ -22,13 +96,119 @@ class Story(models.Model):
 
     caption = models.CharField(max_length=2200, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    image = models.ImageField(upload_to='images/', null=True, blank=True)
-    video = models.FileField(upload_to='videos/', null=True, blank=True)
+    image = models.ImageField(upload_to='images/', storage=media_storage, null=True, blank=True)
+    video = models.FileField(upload_to='videos/', storage=media_storage, null=True, blank=True)
+    image_width = models.PositiveIntegerField(null=True, blank=True)
+    image_height = models.PositiveIntegerField(null=True, blank=True)
+    image_size = models.PositiveBigIntegerField(null=True, blank=True)
+    video_size = models.PositiveBigIntegerField(null=True, blank=True)
+    video_duration = models.FloatField(null=True, blank=True)
     like_count = models.PositiveIntegerField(default=0)
+    media_status = models.CharField(max_length=10, choices=MEDIA_STATUSES, blank=True, default='')
+    media_started_at = models.DateTimeField(null=True, blank=True)
+    renditions = models.JSONField(default=dict, blank=True)
+
+    objects = VisibleContentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='story_created_idx'),
+            models.Index(fields=['user', 'created_at'], name='story_user_created_idx'),
+            models.Index(fields=['media_status'], name='story_media_status_idx'),
+        ]
 
     @classmethod
     def visible_stories(cls):
-        return cls.objects.filter(created_at__gte=now() - timedelta(hours=24))
+        return cls.objects.filter(created_at__gte=now() - STORY_LIFETIME)
     
     def __str__(self):
         return f'{self.user.username}: {self.caption[:20]}'
+
+
+class StoryAudience(models.Model):
+    """
+    Unique viewers of a story: an exact set of user ids while the audience is
+    small, a HyperLogLog sketch once it passes STORY_VIEWERS_EXACT_LIMIT.
+    `viewer_count` always holds the current count, so reading it is O(1).
+    """
+    story = models.OneToOneField(Story, on_delete=models.CASCADE, primary_key=True, related_name='audience')
+    viewer_count = models.PositiveIntegerField(default=0)
+    viewer_ids = models.JSONField(default=list, blank=True)
+    sketch = models.BinaryField(null=True, blank=True)
+
+    def __str__(self):
+        return f'{self.story_id} seen by {self.viewer_count}'
+
+
+class TimelineEntry(models.Model):
+    owner = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='timeline_entries')
+    post = models.ForeignKey(Post, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    created_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='timeline_owner_post_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-post'], name='timeline_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.owner_id}: {self.post_id}'
+
+
+class UploadSession(models.Model):
+    """
+    A resumable upload of a video, written to a partial file chunk by chunk.
+    `offset` is the number of bytes received so far, where the next chunk starts.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(CustomerUser, on_delete=models.CASCADE, related_name='upload_sessions')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    offset = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='upload_session_created_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.filename}: {self.offset}/{self.size}'
+
+
+class ContentVersion(models.Model):
+    """
+    Current validator version of an object (`post:12`) or a collection
+    (`posts:*`), see `utils.versioning`. Rows are never evicted, so an ETag
+    only changes when its object is bumped.
+    """
+    key = models.CharField(max_length=100, unique=True)
+    token = models.CharField(max_length=32)
+    last_modified = models.BigIntegerField()
+
+    def __str__(self):
+        return f'{self.key} {self.token}'
+
+
+class MediaBlob(models.Model):
+    """
+    A file of the content-addressed media storage, stored once whatever the
+    number of posts, stories and messages using it. `ref_count` is the number
+    of those references; blobs left with none are removed by the garbage
+    collector.
+    """
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    released_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ref_count', 'released_at'], name='media_blob_unused_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} x{self.ref_count}'
@@ -0,0 +1,76 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F, FloatField, Q, Value
+from django.db.models.functions import Cast, Greatest, Log
+from django.utils.timezone import now
+
+from posts.models import Post
+from posts.signals import content_changed
+from profiles.models import Profile
+
+
+def score_expression(created_at, like_delta:int=0, comment_delta:int=0):
+    """
+    SQL version of `Post.engagement_score` for use in an UPDATE.
+
+    The deltas let the counters and the score change in the same statement,
+    since every column reference in an UPDATE reads the old row values.
+    """
+    engagement = (
+        F('like_count') + like_delta
+        + settings.FEED_SCORE_COMMENT_WEIGHT * (F('comment_count') + comment_delta)
+    )
+    engagement = Cast(Greatest(engagement, Value(1)), FloatField())
+    return Log(Value(10.0), engagement) + Value(created_at.timestamp() / settings.FEED_SCORE_DECAY_SECONDS)
+
+
+def rescore_post(post:Post):
+    """Recompute the stored score of `post` from its current counters."""
+    Post.objects.filter(id=post.id).update(score=score_expression(post.created_at))
+    content_changed('post', post.id, post.user_id)
+
+
+def record_comment(post:Post, delta:int):
+    """Atomically add `delta` to the comment count of `post` and update its score."""
+    Post.objects.filter(id=post.id).update(
+        comment_count=Greatest(F('comment_count') + delta, Value(0)),
+        score=score_expression(post.created_at, comment_delta=delta),
+    )
+    content_changed('post', post.id, post.user_id)
+
+
+def ranked_candidates(user):
+    """
+    Posts eligible for the ranked feed of `user`: their own and those of the
+    accounts they follow, published in the last FEED_RANKED_MAX_AGE seconds.
+
+    A score is never below its age term, so the age limit is also a score
+    floor: the (score, id) index is read as a range that ends at the oldest
+    eligible post, however few of the rows it passes belong to followed
+    accounts, instead of being walked to the end when a page cannot be filled.
+    """
+    Followers = Profile.followers.through
+    followings = Followers.objects.filter(customeruser_id=user.id).values('profile__user_id')
+    since = now() - timedelta(seconds=settings.FEED_RANKED_MAX_AGE)
+    return Post.objects.filter(
+        Q(user_id=user.id) | Q(user_id__in=followings),
+        score__gte=since.timestamp() / settings.FEED_SCORE_DECAY_SECONDS,
+        created_at__gte=since,
+    )
+
+
+def rescore_chunk(rows:list):
+    """
+    Vectorized rescoring of `(id, like_count, comment_count, created_at)` rows.
+
+    Returns `(ids, scores)` with the scores computed by NumPy in one pass.
+    """
+    import numpy as np
+
+    ids, like_counts, comment_counts, created_at = zip(*rows)
+    engagement = np.asarray(like_counts, dtype=np.float64) \
+        + settings.FEED_SCORE_COMMENT_WEIGHT * np.asarray(comment_counts, dtype=np.float64)
+    timestamps = np.fromiter((value.timestamp() for value in created_at), dtype=np.float64, count=len(rows))
+    scores = np.log10(np.maximum(engagement, 1.0)) + timestamps / settings.FEED_SCORE_DECAY_SECONDS
+    return ids, scores.tolist()
@@ -0,0 +1,227 @@
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from posts.models import MEDIA_FAILED, MEDIA_PENDING, MEDIA_PROCESSING, MEDIA_READY, Post, Story
+from posts.signals import content_changed
+from utils import metrics
+from utils.background import run_in_background, run_periodically
+from utils.images import EXTENSIONS, render_image, rendition_files
+
+MODELS = {'post': Post, 'story': Story}
+RENDITION_PATH = 'renditions/{kind}/{pk}/{name}.{extension}'
+
+logger = logging.getLogger(__name__)
+
+_pool = None
+_lock = threading.Lock()
+_in_flight = 0
+
+
+def _get_pool():
+    global _pool
+    with _lock:
+        if _pool is None:
+            # Spawned workers start clean instead of forking a process full of threads and connections.
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.MEDIA_RENDITION_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+    return _pool
+
+
+def _reserve():
+    global _in_flight
+    with _lock:
+        if _in_flight >= settings.MEDIA_RENDITION_QUEUE_DEPTH:
+            return False
+        _in_flight += 1
+        return True
+
+
+def _release():
+    global _in_flight
+    with _lock:
+        _in_flight -= 1
+
+
+def _claim_next():
+    """Move the oldest pending upload to processing; returns `(kind, pk)` or None when none is left."""
+    for kind, model in MODELS.items():
+        for pk in model.objects.filter(media_status=MEDIA_PENDING).order_by('id').values_list('id', flat=True)[:10]:
+            claimed = model.objects.filter(id=pk, media_status=MEDIA_PENDING).update(
+                media_status=MEDIA_PROCESSING, media_started_at=now()
+            )
+            if claimed:
+                return kind, pk
+    return None
+
+
+def reclaim_stale(timeout:float=None):
+    """
+    Put back to pending the uploads that have been processing for longer than
+    `timeout` seconds (MEDIA_RENDITION_TIMEOUT by default), e.g. because the
+    process rendering them died. Returns the number of uploads reclaimed.
+    """
+    timeout = settings.MEDIA_RENDITION_TIMEOUT if timeout is None else timeout
+    cutoff = now() - timedelta(seconds=timeout)
+    stale = Q(media_started_at__lt=cutoff) | Q(media_started_at__isnull=True)
+    reclaimed = 0
+    for model in MODELS.values():
+        reclaimed += model.objects.filter(stale, media_status=MEDIA_PROCESSING).update(media_status=MEDIA_PENDING)
+    metrics.incr('renditions.reclaimed', reclaimed)
+    return reclaimed
+
+
+def drain():
+    """
+    Start rendering pending uploads while fewer than MEDIA_RENDITION_QUEUE_DEPTH are in flight.
+
+    Uploads past the queue depth simply stay pending in the database and are
+    picked up, oldest first, as running ones complete, so a burst of uploads
+    never grows an in-memory queue.
+    """
+    while _reserve():
+        claimed = _claim_next()
+        if claimed is None:
+            _release()
+            return
+        metrics.incr('renditions.queued')
+        run_in_background(_submit, *claimed)
+
+
+def sweep():
+    reclaim_stale()
+    drain()
+
+
+def schedule_sweeper():
+    """Start, once per process, the reclaim and drain of pending uploads every MEDIA_RENDITION_SWEEP_INTERVAL seconds."""
+    run_periodically('drain_renditions', settings.MEDIA_RENDITION_SWEEP_INTERVAL, sweep)
+
+
+def schedule(instance, replaced:dict=None):
+    """
+    Mark the uploaded image of a post or story pending and start rendering it after the commit.
+
+    `replaced` are the renditions of the image it replaces; their files are
+    deleted once the change commits.
+    """
+    model = type(instance)
+    if replaced:
+        transaction.on_commit(lambda: delete_renditions(default_storage, replaced))
+    instance.renditions = {}
+    if not instance.image:
+        model.objects.filter(id=instance.id).update(renditions={}, media_status='')
+        instance.media_status = ''
+        return
+    model.objects.filter(id=instance.id).update(renditions={}, media_status=MEDIA_PENDING)
+    instance.media_status = MEDIA_PENDING
+    with _lock:
+        if _in_flight >= settings.MEDIA_RENDITION_QUEUE_DEPTH:
+            metrics.incr('renditions.deferred')
+    run_in_background(drain)
+
+
+def _submit(kind:str, pk:int):
+    # The background thread only reads the original; it does not wait for the worker process.
+    model = MODELS[kind]
+    try:
+        name = model.objects.filter(id=pk).values_list('image', flat=True).first()
+        if not name:
+            _done()
+            return
+        with model._meta.get_field('image').storage.open(name, 'rb') as original:
+            data = original.read()
+        future = _get_pool().submit(
+            render_image, data, settings.MEDIA_RENDITION_SIZES, settings.MEDIA_RENDITION_FORMATS
+        )
+    except Exception:
+        _failed(kind, pk)
+        _done()
+        return
+    future.add_done_callback(lambda future: run_in_background(_store, kind, pk, name, future))
+
+
+def _failed(kind:str, pk:int):
+    logger.exception('Rendering the image of %s %s failed', kind, pk)
+    MODELS[kind].objects.filter(id=pk).update(media_status=MEDIA_FAILED)
+    metrics.incr('renditions.failed')
+
+
+def _done():
+    _release()
+    drain()
+
+
+def _store(kind:str, pk:int, image:str, future):
+    try:
+        try:
+            output = future.result()
+        except Exception:
+            _failed(kind, pk)
+            return
+        store_renditions(kind, pk, output, image)
+    finally:
+        _done()
+
+
+def store_renditions(kind:str, pk:int, output:dict, image:str=None):
+    """
+    Save the files returned by `render_image` and mark the post or story ready.
+
+    When `image` is given the renditions are only kept if the post or story
+    still has that image, so a render that was overtaken by a new upload
+    does not overwrite the renditions of the new one.
+    """
+    model = MODELS[kind]
+    # Renditions are derived per post or story, so they are not worth deduplicating.
+    storage = default_storage
+    renditions = {}
+    for rendition_name, rendition in output.items():
+        entry = {'width': rendition['width'], 'height': rendition['height']}
+        for output_format, extension in EXTENSIONS.items():
+            if output_format not in rendition:
+                continue
+            path = RENDITION_PATH.format(kind=kind, pk=pk, name=rendition_name, extension=extension)
+            entry[output_format] = storage.save(path, ContentFile(rendition[output_format]))
+        renditions[rendition_name] = entry
+
+    rows = model.objects.filter(id=pk)
+    if image is not None:
+        rows = rows.filter(image=image)
+    if not rows.update(renditions=renditions, media_status=MEDIA_READY):
+        # The post or story was deleted, or its image replaced, while the image was rendering.
+        delete_renditions(storage, renditions)
+        return
+    metrics.incr('renditions.done')
+    content_changed(kind, pk)
+
+
+def delete_renditions(storage, renditions:dict):
+    for name in rendition_files(renditions):
+        storage.delete(name)
+
+
+def rendition_metrics():
+    counts = metrics.get_counters(
+        'renditions.queued', 'renditions.done', 'renditions.failed', 'renditions.deferred', 'renditions.reclaimed'
+    )
+    with _lock:
+        in_flight = _in_flight
+    return {
+        'queued': counts['renditions.queued'],
+        'done': counts['renditions.done'],
+        'failed': counts['renditions.failed'],
+        'deferred': counts['renditions.deferred'],
+        'reclaimed': counts['renditions.reclaimed'],
+        'in_flight': in_flight,
+    }
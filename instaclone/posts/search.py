@@ -0,0 +1,179 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Exists, OuterRef, Q
+
+from comments.models import Comment
+from posts.models import Post, Story
+
+TABLE = 'search_index'
+
+# Every indexed object gets the rowid `pk * KIND_SLOTS + code`, so updates and
+# deletes address the FTS row directly and the kind is recovered from the rowid.
+KIND_SLOTS = 4
+KINDS = {'post': 1, 'story': 2, 'comment': 3}
+KIND_CODES = {code: kind for kind, code in KINDS.items()}
+SOURCES = {'post': (Post, 'caption'), 'story': (Story, 'caption'), 'comment': (Comment, 'text')}
+
+_index_ready = False
+
+
+def search_available():
+    """Full-text search needs the FTS5 extension of SQLite."""
+    return connection.vendor == 'sqlite'
+
+
+def create_index():
+    global _index_ready
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(body, tokenize='unicode61 remove_diacritics 2')"
+        )
+    _index_ready = True
+
+
+def drop_index():
+    global _index_ready
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+    _index_ready = False
+
+
+def _rowid(kind:str, pk:int):
+    return pk * KIND_SLOTS + KINDS[kind]
+
+
+def index_object(kind:str, pk:int, text:str):
+    """Insert or replace the indexed text of a post, story or comment; empty text removes it."""
+    if not search_available():
+        return
+    if not _index_ready:
+        create_index()
+    rowid = _rowid(kind, pk)
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE rowid = %s', [rowid])
+        if text:
+            cursor.execute(f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)', [rowid, text])
+
+
+def remove_object(kind:str, pk:int):
+    index_object(kind, pk, None)
+
+
+def remove_objects(kind:str, pks:list):
+    """Remove a batch of posts, stories or comments from the index with one statement."""
+    if not search_available() or not pks:
+        return
+    if not _index_ready:
+        create_index()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {TABLE} WHERE rowid IN ({", ".join(["%s"] * len(pks))})',
+            [_rowid(kind, pk) for pk in pks],
+        )
+
+
+def index_rows(kind:str, rows:list):
+    """Bulk insert `(pk, text)` rows that are not indexed yet, as the rebuild does."""
+    if not search_available():
+        return
+    if not _index_ready:
+        create_index()
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {TABLE} (rowid, body) VALUES (%s, %s)',
+            [(_rowid(kind, pk), text) for pk, text in rows if text],
+        )
+
+
+def optimize_index():
+    """Merge the b-trees of the index into one, which makes later queries cheaper."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE} ({TABLE}) VALUES ('optimize')")
+
+
+def match_expression(query:str):
+    """
+    Turn free text into an FTS5 query matching every word, or '' when there is no word.
+
+    Each word is quoted, so FTS5 operators and column filters typed by users are
+    searched as plain text instead of being interpreted.
+    """
+    words = re.findall(r'\w+', query)[:settings.SEARCH_MAX_TERMS]
+    return ' '.join(f'"{word}"' for word in words)
+
+
+def ranked_hits(expression:str, kinds:list, position=None, reverse=False, limit=20):
+    """
+    Return `(rank, rowid)` of the matches of `expression`, best BM25 score first.
+
+    FTS5 reports BM25 as a negative `rank`, so the best match has the lowest
+    rank; `(rank, rowid)` is the keyset the results are paginated on.
+    """
+    codes = ', '.join(str(KINDS[kind]) for kind in kinds)
+    lookup, direction = ('<', 'DESC') if reverse else ('>', 'ASC')
+    condition, params = '', [expression]
+    if position is not None:
+        condition = f'AND (rank {lookup} %s OR (rank = %s AND rowid {lookup} %s)) '
+        params += [position[0], position[0], position[1]]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rank, rowid FROM {TABLE} WHERE {TABLE} MATCH %s AND rowid %% {KIND_SLOTS} IN ({codes}) '
+            f'{condition}ORDER BY rank {direction}, rowid {direction} LIMIT %s',
+            [*params, limit],
+        )
+        return cursor.fetchall()
+
+
+def visible_objects(user, kind:str):
+    """
+    Posts, stories or comments `user` may see, with the rules of `HeHasPermission`.
+
+    Comments follow the post or story they belong to, checked with a correlated
+    EXISTS per comment so large tables are never materialized. Expired stories
+    are left out like everywhere else.
+    """
+    if kind == 'post':
+        return Post.objects.visible_to(user)
+    stories = Story.visible_stories().visible_to(user)
+    if kind == 'story':
+        return stories
+    return Comment.objects.filter(
+        Q(Exists(Post.objects.visible_to(user).filter(id=OuterRef('post_id'))))
+        | Q(Exists(stories.filter(id=OuterRef('story_id'))))
+    )
+
+
+def search(user, expression:str, kinds:list, position=None, reverse=False, limit=20):
+    """
+    Return up to `limit` matches visible to `user`, each as `{'type', 'rank', 'rowid', 'row'}`.
+
+    Matches are read from the index in batches of SEARCH_SCAN_BATCH_SIZE and
+    checked for visibility with one query per kind and batch, which also loads
+    the `.values()` row of the object. At most SEARCH_MAX_SCANNED matches are
+    examined per call, so a query whose matches are almost all private ends
+    early instead of walking the whole index.
+    """
+    found = []
+    scanned = 0
+    batch_size = max(limit, settings.SEARCH_SCAN_BATCH_SIZE)
+    while len(found) < limit and scanned < settings.SEARCH_MAX_SCANNED:
+        hits = ranked_hits(expression, kinds, position, reverse, batch_size)
+        scanned += len(hits)
+
+        ids = {}
+        for _, rowid in hits:
+            ids.setdefault(KIND_CODES[rowid % KIND_SLOTS], []).append(rowid // KIND_SLOTS)
+        rows = {}
+        for kind, pks in ids.items():
+            for row in visible_objects(user, kind).filter(id__in=pks).values():
+                rows[_rowid(kind, row['id'])] = {'type': kind, 'row': row}
+
+        for rank, rowid in hits:
+            if rowid in rows:
+                found.append({**rows[rowid], 'rank': rank, 'rowid': rowid})
+        if len(hits) < batch_size:
+            break
+        position = hits[-1]
+    return found[:limit]
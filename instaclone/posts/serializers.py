@@ -1,15 +1,56 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from likes.serializers import ViewerLikesListSerializer
+from utils.images import EXTENSIONS
+from utils.serializers import file_url_factory
 from .models import Post, Story
 
+MEDIA_METADATA_FIELDS = ['image_width', 'image_height', 'image_size', 'video_size', 'video_duration']
+
+class RenditionsField(serializers.JSONField):
+    """Renditions of an image, with absolute URLs in place of the storage names of their files."""
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault('read_only', True)
+        super().__init__(**kwargs)
+
+    def representation_factory(self, model_field):
+        file_factory = file_url_factory(default_storage)
+
+        def bind(request):
+            url = file_factory(request)
+
+            def convert(renditions):
+                return {
+                    name: {key: url(value) if key in EXTENSIONS else value for key, value in entry.items()}
+                    for name, entry in renditions.items()
+                }
+            return convert
+        return bind
+
+    def to_representation(self, value):
+        model_field = self.parent.Meta.model._meta.get_field(self.source)
+        return self.representation_factory(model_field)(self.context.get('request'))(value)
+
+
 class PostSerializer(serializers.ModelSerializer):
-    class meta:
+    renditions = RenditionsField()
+
+    class Meta:
         model = Post
         fields = '__all__'
-        exlude = ['id']
+        list_serializer_class = ViewerLikesListSerializer
+        read_only_fields = [
+            'user', 'like_count', 'comment_count', 'score', 'top_comments', 'media_status', 'media_started_at',
+            *MEDIA_METADATA_FIELDS,
+        ]
 
 
 class StorySerializer(serializers.ModelSerializer):
+    renditions = RenditionsField()
+
     class Meta:
         model = Story
         fields = '__all__'
-        exclude = ['id']
\ No newline at end of file
+        list_serializer_class = ViewerLikesListSerializer
+        read_only_fields = ['like_count', 'media_status', 'media_started_at', *MEDIA_METADATA_FIELDS]
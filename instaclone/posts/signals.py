@@ -0,0 +1,104 @@
+from django.core.files.storage import default_storage
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import search
+from posts.models import Post, Story
+from profiles.models import Profile
+from utils import versioning
+from utils.media import record_media_metadata
+from utils.storage import release_files, release_replaced_files, remember_replaced_files
+
+COLLECTIONS = {'post': 'posts', 'story': 'stories'}
+
+
+def content_changed(kind:str, pk:int, user_id:int=None):
+    """
+    Invalidate the validators of a post or story and of its owner's profile.
+
+    The collection is not bumped: like and comment counts change all the time,
+    and lists refresh them with `versioning.get_list_version` instead. Saves
+    and deletes, which change what the lists hold, bump it in `post_changed`
+    and `story_changed`.
+    """
+    collection = COLLECTIONS[kind]
+    versioning.bump(kind, pk)
+    if user_id is not None:
+        profiles = Profile.objects.filter(user_id=user_id)
+    else:
+        profiles = Profile.objects.filter(**{f'user__{collection}': pk})
+    for profile_id in profiles.values_list('id', flat=True):
+        versioning.bump('profile', profile_id)
+
+
+@receiver(pre_save, sender=Post)
+@receiver(pre_save, sender=Story)
+def media_uploaded(sender, instance, **kwargs):
+    record_media_metadata(instance)
+    remember_replaced_files(instance)
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_save, sender=Story)
+def media_replaced(sender, instance, **kwargs):
+    release_replaced_files(instance)
+
+
+@receiver(post_delete, sender=Post)
+@receiver(post_delete, sender=Story)
+def media_deleted(sender, instance, **kwargs):
+    release_files(instance)
+    if instance.renditions:
+        from posts.renditions import delete_renditions
+
+        # Renditions are plain files on the default storage, removed once the delete commits.
+        renditions = instance.renditions
+        transaction.on_commit(lambda: delete_renditions(default_storage, renditions))
+
+
+@receiver([post_save, post_delete], sender=Post)
+def post_changed(sender, instance, **kwargs):
+    content_changed('post', instance.pk, instance.user_id)
+    versioning.bump('posts')
+
+
+@receiver([post_save, post_delete], sender=Story)
+def story_changed(sender, instance, **kwargs):
+    content_changed('story', instance.pk, instance.user_id)
+    versioning.bump('stories')
+    versioning.bump('story_owner', instance.user_id)
+
+
+def caption_changed(update_fields):
+    return update_fields is None or 'caption' in update_fields
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, update_fields=None, **kwargs):
+    if caption_changed(update_fields):
+        search.index_object('post', instance.pk, instance.caption)
+
+
+@receiver(post_save, sender=Story)
+def index_story(sender, instance, update_fields=None, **kwargs):
+    if caption_changed(update_fields):
+        search.index_object('story', instance.pk, instance.caption)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_object('post', instance.pk)
+
+
+@receiver(post_delete, sender=Story)
+def unindex_story(sender, instance, **kwargs):
+    search.remove_object('story', instance.pk)
+
+
+@receiver(post_migrate, dispatch_uid='posts.create_search_index')
+def create_search_index(sender, using=DEFAULT_DB_ALIAS, **kwargs):
+    # Created with the tables rather than on the first indexed object, where a
+    # rolled back transaction could drop it behind the module's ready flag.
+    if sender.name == 'posts' and using == DEFAULT_DB_ALIAS and search.search_available():
+        search.create_index()
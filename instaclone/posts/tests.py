@@ -1,3 +1,337 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils.timezone import now
+from PIL import Image
+from rest_framework.test import APIClient
+
+from comments.models import Comment
+from likes.models import StoryLike
+from likes.services import toggle_like
+from posts import renditions
+from posts.expiry import sweep_expired_stories
+from posts.models import (
+    MEDIA_PENDING, MEDIA_PROCESSING, MEDIA_READY, STORY_LIFETIME, MediaBlob, Post, Story, TimelineEntry, UploadSession,
+)
+from posts.ranking import rescore_post
+from posts.timeline import fan_out_post, followed_celebrities
+from posts.uploads import UploadError, part_path, write_chunk
+from utils.images import render_image, rendition_files
+from profiles.models import CustomerUser, Profile
+
+
+def make_user(name, status=Profile.OPEN_PROFILE):
+    user = CustomerUser.objects.create_user(username=name, email=f'{name}@example.com', password='password')
+    Profile.objects.create(user=user, profile_status=status)
+    return user
+
+
+@override_settings(BACKGROUND_TASKS_EAGER=True)
+class HomeTimelineTests(TestCase):
+    """Fan-out, trimming and unfollows of the chronological home feed."""
+
+    def setUp(self):
+        self.author = make_user('author', Profile.PRIVATE_PROFILE)
+        self.viewer = make_user('viewer')
+        self.author.profile.followers.add(self.viewer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def publish(self, caption='post'):
+        client = APIClient()
+        client.force_authenticate(self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.post('/api/v1/post_create/', {'caption': caption})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def feed(self):
+        response = self.client.get('/api/v1/home_feed/')
+        self.assertEqual(response.status_code, 200)
+        return [post['id'] for post in response.data['results']]
+
+    def test_published_post_is_pushed_to_followers(self):
+        post_id = self.publish()
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.viewer, post_id=post_id).exists())
+        self.assertEqual(self.feed(), [post_id])
+
+    def test_unfollowing_a_private_account_hides_its_posts(self):
+        post_id = self.publish()
+        self.author.profile.followers.remove(self.viewer)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.viewer).exists())
+        self.assertEqual(self.feed(), [])
+        self.assertEqual(self.client.get(f'/api/v1/open_post_detail/{post_id}/').status_code, 404)
+
+    def test_unfollowing_from_the_follower_side_and_clearing(self):
+        self.publish()
+        self.viewer.followings.remove(self.author.profile)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.viewer).exists())
+
+        self.author.profile.followers.add(self.viewer)
+        self.publish()
+        self.author.profile.followers.clear()
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.viewer).exists())
+        # The author's own timeline is kept.
+        self.assertTrue(TimelineEntry.objects.filter(owner=self.author).exists())
+
+    def test_stale_entries_are_filtered_by_visibility(self):
+        stranger = make_user('stranger', Profile.PRIVATE_PROFILE)
+        hidden = Post.objects.create(user=stranger, caption='hidden')
+        TimelineEntry.objects.create(owner=self.viewer, post=hidden, created_at=hidden.created_at)
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_MAX_LENGTH=3)
+    def test_timelines_are_trimmed_to_the_newest_entries(self):
+        post_ids = [self.publish(f'post {i}') for i in range(5)]
+        kept = TimelineEntry.objects.filter(owner=self.viewer).values_list('post_id', flat=True)
+        self.assertEqual(sorted(kept), post_ids[-3:])
+
+    @override_settings(FEED_FANOUT_FOLLOWER_THRESHOLD=0)
+    def test_posts_of_high_follower_accounts_are_pulled(self):
+        post_id = self.publish()
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.viewer).exists())
+        self.assertEqual(self.feed(), [post_id])
+        with self.assertNumQueries(1):
+            self.assertEqual(followed_celebrities(self.viewer.id), [self.author.id])
+
+    def test_follower_counts_follow_both_sides_of_the_relation(self):
+        fan = make_user('fan')
+        profile = self.author.profile
+
+        def follower_count():
+            profile.refresh_from_db()
+            return profile.follower_count
+
+        self.assertEqual(follower_count(), 1)
+        profile.followers.add(fan, self.viewer)
+        self.assertEqual(follower_count(), 2)
+        fan.followings.remove(profile)
+        fan.followings.remove(profile)
+        self.assertEqual(follower_count(), 1)
+        profile.followers.clear()
+        self.assertEqual(follower_count(), 0)
+        fan.followings.add(profile)
+        self.assertEqual(follower_count(), 1)
+
+    def test_fan_out_of_a_deleted_post_writes_nothing(self):
+        self.assertEqual(fan_out_post(123456), 0)
+
+
+@override_settings(LIKE_COUNTER_HOT_RATE=10 ** 9)
+class RankedFeedTests(TestCase):
+    """The ranked home feed orders recent posts of followed accounts by engagement."""
+
+    def setUp(self):
+        self.author = make_user('author')
+        self.viewer = make_user('viewer')
+        self.author.profile.followers.add(self.viewer)
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+        self.liked = Post.objects.create(user=self.author, caption='liked')
+        self.newer = Post.objects.create(user=self.author, caption='newer')
+        for i in range(3):
+            toggle_like(make_user(f'fan{i}'), self.liked)
+
+    def ranked(self, **params):
+        response = self.client.get('/api/v1/home_feed/', {'mode': 'ranked', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_engagement_outranks_recency(self):
+        self.assertEqual([post['id'] for post in self.ranked()['results']], [self.liked.id, self.newer.id])
+
+    def test_pages_follow_the_score(self):
+        first = self.ranked(page_size=1)
+        self.assertEqual([post['id'] for post in first['results']], [self.liked.id])
+        response = self.client.get(first['next'])
+        self.assertEqual([post['id'] for post in response.data['results']], [self.newer.id])
+
+    @override_settings(FEED_RANKED_MAX_AGE=60 * 60)
+    def test_old_posts_and_unfollowed_accounts_are_left_out(self):
+        Post.objects.filter(id=self.liked.id).update(created_at=now() - timedelta(hours=2))
+        rescore_post(Post.objects.get(id=self.liked.id))
+        Post.objects.create(user=make_user('stranger'), caption='stranger')
+        self.assertEqual([post['id'] for post in self.ranked()['results']], [self.newer.id])
+
+
+def make_image(name='image.png', color='red'):
+    content = BytesIO()
+    Image.new('RGB', (8, 8), color).save(content, 'PNG')
+    return SimpleUploadedFile(name, content.getvalue(), content_type='image/png')
+
+
+class StoryExpiryTests(TestCase):
+    """The sweeper deletes expired stories with what depends on them, and only them."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.author = make_user('author')
+        self.fan = make_user('fan')
+        self.expired = Story.objects.create(user=self.author, caption='old', image=make_image())
+        self.live = Story.objects.create(user=self.author, caption='new', image=make_image('copy.png'))
+        Story.objects.filter(id=self.expired.id).update(created_at=now() - STORY_LIFETIME * 2)
+        comment = Comment.objects.create(user=self.fan, story=self.expired, text='nice')
+        Comment.objects.create(user=self.author, story=self.expired, parent=comment, text='thanks')
+        StoryLike.objects.create(user=self.fan, story=self.expired)
+
+    def test_expired_stories_are_deleted_with_their_comments_and_likes(self):
+        report = sweep_expired_stories(batch_size=1)
+        self.assertEqual((report['stories'], report['comments'], report['story_likes']), (1, 2, 1))
+        self.assertEqual(list(Story.objects.values_list('id', flat=True)), [self.live.id])
+        self.assertFalse(Comment.objects.exists())
+        self.assertFalse(StoryLike.objects.exists())
+        self.assertEqual(sweep_expired_stories(), {})
+
+    def test_shared_blobs_are_released_not_counted_as_freed(self):
+        # Both stories hold the same image, stored once.
+        self.assertEqual(self.expired.image.name, self.live.image.name)
+        report = sweep_expired_stories()
+        self.assertEqual((report['blob_references'], report['files'], report['bytes']), (1, 0, 0))
+        blob = MediaBlob.objects.get(name=self.live.image.name)
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(self.live.image.storage.exists(blob.name))
+
+
+class RenditionQueueTests(TestCase):
+    """Uploads wait in the database for a rendering slot and are marked ready only for their own image."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        author = make_user('author')
+        self.posts = []
+        for color in ('red', 'blue'):
+            post = Post.objects.create(user=author, caption=color, image=make_image(f'{color}.png', color))
+            renditions.schedule(post)
+            self.posts.append(post)
+
+    def statuses(self):
+        return list(Post.objects.order_by('id').values_list('media_status', flat=True))
+
+    def render(self, post):
+        with post.image.open('rb') as image:
+            return render_image(image.read(), {'thumb': (4, 4, True)}, ('jpeg',))
+
+    def test_uploads_past_the_queue_depth_stay_pending(self):
+        self.assertEqual(self.statuses(), [MEDIA_PENDING, MEDIA_PENDING])
+        with override_settings(MEDIA_RENDITION_QUEUE_DEPTH=1), self.captureOnCommitCallbacks() as submitted:
+            renditions.drain()
+        # The captured submission never runs, so its slot is given back here.
+        self.addCleanup(renditions._release)
+        self.assertEqual(len(submitted), 1)
+        self.assertEqual(self.statuses(), [MEDIA_PROCESSING, MEDIA_PENDING])
+
+    def test_stalled_uploads_are_reclaimed(self):
+        Post.objects.filter(id=self.posts[0].id).update(
+            media_status=MEDIA_PROCESSING, media_started_at=now() - timedelta(hours=1)
+        )
+        Post.objects.filter(id=self.posts[1].id).update(media_status=MEDIA_PROCESSING, media_started_at=now())
+        self.assertEqual(renditions.reclaim_stale(timeout=60), 1)
+        self.assertEqual(self.statuses(), [MEDIA_PENDING, MEDIA_PROCESSING])
+
+    def test_stored_renditions_mark_the_post_ready(self):
+        post = self.posts[0]
+        client = APIClient()
+        client.force_authenticate(post.user)
+        etag = client.get(f'/api/v1/open_post_detail/{post.id}/')['ETag']
+        renditions.store_renditions('post', post.id, self.render(post), post.image.name)
+
+        post.refresh_from_db()
+        self.assertEqual(post.media_status, MEDIA_READY)
+        self.assertTrue(all(default_storage.exists(name) for name in rendition_files(post.renditions)))
+        response = client.get(f'/api/v1/open_post_detail/{post.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_renditions_of_a_replaced_image_are_discarded(self):
+        post = self.posts[0]
+        renditions.store_renditions('post', post.id, self.render(post), 'images/replaced.png')
+        post.refresh_from_db()
+        self.assertEqual((post.media_status, post.renditions), (MEDIA_PENDING, {}))
+        self.assertFalse(default_storage.exists(f'renditions/post/{post.id}/thumb.jpg'))
+
+
+class InterruptedStream(BytesIO):
+    """A request body whose client goes away after `available` bytes."""
+
+    def __init__(self, content, available):
+        super().__init__(content[:available])
+
+    def read(self, size=-1):
+        data = super().read(size)
+        if not data:
+            raise ConnectionError('client disconnected')
+        return data
+
+
+class ResumableUploadTests(TestCase):
+    """Chunked uploads resume from the received bytes and accept one chunk per offset."""
+
+    def setUp(self):
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root, ignore_errors=True)
+        paths = override_settings(MEDIA_ROOT=f'{root}/media', UPLOAD_SESSION_DIR=f'{root}/uploads')
+        paths.enable()
+        self.addCleanup(paths.disable)
+
+        self.user = make_user('author')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.content = bytes(range(256)) * 40
+        response = self.client.post('/api/v1/upload_sessions/', {'filename': 'clip.mp4', 'size': len(self.content)})
+        self.assertEqual(response.status_code, 201)
+        self.session_id = response.data['id']
+
+    def put(self, offset, chunk):
+        return self.client.put(
+            f'/api/v1/upload_sessions/{self.session_id}/?offset={offset}', chunk,
+            content_type='application/octet-stream',
+        )
+
+    def received(self):
+        with open(part_path(UploadSession.objects.get(id=self.session_id)), 'rb') as part:
+            return part.read()
+
+    def test_chunks_resume_from_the_received_offset(self):
+        self.assertEqual(self.put(0, self.content[:4000]).data['offset'], 4000)
+        response = self.put(1000, self.content[1000:5000])
+        self.assertEqual((response.status_code, response.data['offset']), (409, 4000))
+        self.assertEqual(self.client.get(f'/api/v1/upload_sessions/{self.session_id}/').data['offset'], 4000)
+        self.assertEqual(self.put(4000, self.content[4000:]).data['offset'], len(self.content))
+        self.assertEqual(self.received(), self.content)
+
+        response = self.client.post(f'/api/v1/upload_sessions/{self.session_id}/finalize/', {'target': 'post'})
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(user=self.user)
+        with post.video.open('rb') as video:
+            self.assertEqual(video.read(), self.content)
+        self.assertFalse(UploadSession.objects.exists())
+
+    def test_interrupted_chunk_keeps_the_received_bytes(self):
+        session = UploadSession.objects.get(id=self.session_id)
+        self.assertEqual(write_chunk(session, 0, InterruptedStream(self.content, 1500), 4000), 1500)
+        self.assertEqual(self.received(), self.content[:1500])
+        self.assertEqual(self.put(1500, self.content[1500:]).data['offset'], len(self.content))
+        self.assertEqual(self.received(), self.content)
+
+    def test_losing_chunk_at_an_offset_leaves_the_file_alone(self):
+        first = UploadSession.objects.get(id=self.session_id)
+        second = UploadSession.objects.get(id=self.session_id)
+        write_chunk(first, 0, BytesIO(self.content[:100]), 100)
+        with self.assertRaises(UploadError) as raised:
+            write_chunk(second, 0, BytesIO(b'x' * 200), 200)
+        self.assertEqual((raised.exception.status, raised.exception.details['offset']), (409, 100))
+        self.assertEqual(self.received(), self.content[:100])
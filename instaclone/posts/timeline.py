@@ -0,0 +1,183 @@
+import heapq
+from itertools import chain
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Q
+
+from posts.models import Post, TimelineEntry
+from profiles.models import Profile
+from utils import metrics
+
+RECENT_POSTS_KEY = 'feed:recent:{}'
+
+
+def follower_batches(user_id:int, size:int):
+    """Yield the follower ids of `user_id` in keyset-ordered batches of at most `size`."""
+    Followers = Profile.followers.through
+    followers = Followers.objects.filter(profile__user_id=user_id).order_by('customeruser_id')
+    last_id = 0
+    while True:
+        batch = list(followers.filter(customeruser_id__gt=last_id).values_list('customeruser_id', flat=True)[:size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]
+
+
+def trim_timelines(owner_ids:list):
+    """Drop everything past the newest `TIMELINE_MAX_LENGTH` entries of each given timeline."""
+    table = TimelineEntry._meta.db_table
+    placeholders = ', '.join(['%s'] * len(owner_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {table} WHERE id IN ('
+            f'SELECT id FROM (SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY owner_id ORDER BY created_at DESC, post_id DESC) AS position '
+            f'FROM {table} WHERE owner_id IN ({placeholders})) ranked '
+            f'WHERE position > %s)',
+            [*owner_ids, settings.TIMELINE_MAX_LENGTH],
+        )
+
+
+def is_celebrity(user_id:int):
+    """Whether `user_id` has more followers than `FEED_FANOUT_FOLLOWER_THRESHOLD`, read from `follower_count`."""
+    threshold = settings.FEED_FANOUT_FOLLOWER_THRESHOLD
+    return Profile.objects.filter(user_id=user_id, follower_count__gt=threshold).exists()
+
+
+def followed_celebrities(user_id:int):
+    """
+    User ids of the accounts `user_id` follows that are above the follower threshold.
+
+    One query on the follow table joined to the denormalized `follower_count`,
+    so neither the following list nor any follower list is read.
+    """
+    threshold = settings.FEED_FANOUT_FOLLOWER_THRESHOLD
+    return list(
+        Profile.objects.filter(followers=user_id, follower_count__gt=threshold).values_list('user_id', flat=True)
+    )
+
+
+def _recent_posts(user_id:int):
+    """Newest-first `(created_at, post_id)` pairs of a pulled account, cached between posts."""
+    key = RECENT_POSTS_KEY.format(user_id)
+    recent = cache.get(key)
+    if recent is not None:
+        metrics.incr('feed.recent_cache.hits')
+        return recent
+    metrics.incr('feed.recent_cache.misses')
+    recent = list(
+        Post.objects.filter(user_id=user_id)
+        .order_by('-created_at', '-id')
+        .values_list('created_at', 'id')[:settings.FEED_PULL_RECENT_LIMIT]
+    )
+    cache.set(key, recent, timeout=settings.FEED_RECENT_POSTS_CACHE_TIMEOUT)
+    return recent
+
+
+def fan_out_post(post_id:int):
+    """
+    Push a new post into the home timeline of its author and of every follower.
+
+    Accounts above the follower threshold are only pushed to their own timeline;
+    their followers pull the post at read time instead.
+
+    Returns the number of timeline rows written.
+    """
+    post = Post.objects.filter(id=post_id).values('id', 'user_id', 'created_at').first()
+    if post is None:
+        return 0
+
+    cache.delete(RECENT_POSTS_KEY.format(post['user_id']))
+    batches = [[post['user_id']]]
+    if is_celebrity(post['user_id']):
+        metrics.incr('feed.fanout.skipped')
+    else:
+        batches = chain(batches, follower_batches(post['user_id'], settings.TIMELINE_FANOUT_BATCH_SIZE))
+
+    written = 0
+    for batch in batches:
+        TimelineEntry.objects.bulk_create(
+            [TimelineEntry(owner_id=owner_id, post_id=post['id'], created_at=post['created_at']) for owner_id in batch],
+            ignore_conflicts=True,
+        )
+        trim_timelines(batch)
+        written += len(batch)
+    metrics.incr('feed.fanout.posts')
+    metrics.incr('feed.fanout.rows', written)
+    return written
+
+
+def remove_post(post_id:int, user_id:int):
+    """Remove a deleted post from every timeline it was pushed to."""
+    cache.delete(RECENT_POSTS_KEY.format(user_id))
+    return TimelineEntry.objects.filter(post_id=post_id).delete()[0]
+
+
+def remove_follows(follower_ids, author_ids):
+    """Remove the posts of `author_ids` from the timelines of `follower_ids`, after an unfollow."""
+    authored = Post.objects.filter(user_id__in=author_ids).values('id')
+    return TimelineEntry.objects.filter(owner_id__in=follower_ids, post_id__in=authored).delete()[0]
+
+
+def read_home_timeline(user, position, reverse:bool, limit:int):
+    """
+    Read up to `limit` home timeline rows after the keyset `position`.
+
+    Pushed timeline entries and the recent posts of followed high-follower
+    accounts are combined with a k-way merge on `(created_at, post_id)`.
+    Rows are newest first, or oldest first when `reverse` is set, and are
+    dicts with `created_at` and `post_id` keys.
+    """
+    entries = TimelineEntry.objects.filter(owner=user)
+    if position is not None:
+        lookup = 'gt' if reverse else 'lt'
+        entries = entries.filter(
+            Q(**{f'created_at__{lookup}': position[0]}) | Q(created_at=position[0], **{f'post_id__{lookup}': position[1]})
+        )
+    order = ('created_at', 'post_id') if reverse else ('-created_at', '-post_id')
+    sources = [list(entries.order_by(*order).values_list('created_at', 'post_id')[:limit])]
+
+    for celebrity_id in followed_celebrities(user.id):
+        recent = _recent_posts(celebrity_id)
+        if position is not None:
+            recent = [key for key in recent if (key > position if reverse else key < position)]
+        sources.append(recent[::-1][:limit] if reverse else recent[:limit])
+
+    merged = heapq.merge(*sources, reverse=not reverse)
+    rows, seen, examined = [], set(), 0
+    for created_at, post_id in merged:
+        examined += 1
+        if post_id in seen:
+            continue
+        seen.add(post_id)
+        rows.append({'created_at': created_at, 'post_id': post_id})
+        if len(rows) == limit:
+            break
+
+    metrics.incr('feed.reads')
+    metrics.incr('feed.merge.sources', len(sources))
+    metrics.incr('feed.merge.examined', examined)
+    return rows
+
+
+def feed_metrics():
+    """Threshold, write amplification, merge cost and cache hit rate of the feed engine."""
+    counters = metrics.get_counters(
+        'feed.fanout.posts', 'feed.fanout.rows', 'feed.fanout.skipped',
+        'feed.reads', 'feed.merge.sources', 'feed.merge.examined',
+        'feed.recent_cache.hits', 'feed.recent_cache.misses',
+    )
+    recent_lookups = counters['feed.recent_cache.hits'] + counters['feed.recent_cache.misses']
+    return {
+        'fanout_follower_threshold': settings.FEED_FANOUT_FOLLOWER_THRESHOLD,
+        'posts_fanned_out': counters['feed.fanout.posts'],
+        'posts_pulled_instead': counters['feed.fanout.skipped'],
+        'write_amplification': metrics.ratio(counters['feed.fanout.rows'], counters['feed.fanout.posts']),
+        'reads': counters['feed.reads'],
+        'merge_sources_per_read': metrics.ratio(counters['feed.merge.sources'], counters['feed.reads']),
+        'merge_rows_examined_per_read': metrics.ratio(counters['feed.merge.examined'], counters['feed.reads']),
+        'recent_posts_cache_hit_rate': metrics.ratio(counters['feed.recent_cache.hits'], recent_lookups),
+    }
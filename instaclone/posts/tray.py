@@ -0,0 +1,102 @@
+import hashlib
+from itertools import groupby
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.timezone import now
+from rest_framework import serializers
+
+from posts.models import STORY_LIFETIME, Story
+from profiles.models import Profile
+from utils import versioning
+
+TRAY_KEY = 'story_tray:{}:{}'
+
+
+def build_story_tray(user, request=None):
+    """
+    Return `(tray, next_expiry)`: the accounts `user` follows that have live
+    stories, newest first, each as `{'user', 'story_ids', 'latest_at',
+    'expires_at'}` with the story ids oldest first and `expires_at` the expiry
+    of the oldest one, and the earliest of those expiries (None when empty).
+
+    Everything is read with one query: the live stories of followed accounts,
+    joined with their owner's profile and ordered by account, which the
+    (user, created_at) index of stories serves directly.
+    """
+    Followers = Profile.followers.through
+    followings = Followers.objects.filter(customeruser_id=user.id).values('profile__user_id')
+    rows = Story.visible_stories().filter(user_id__in=followings).order_by('user_id', 'created_at', 'id').values(
+        'id', 'created_at', 'user_id', 'user__username', 'user__profile__id', 'user__profile__profile_picture'
+    )
+
+    storage = Profile._meta.get_field('profile_picture').storage
+    created_at = serializers.DateTimeField()
+    tray = []
+    for user_id, stories in groupby(rows, key=lambda row: row['user_id']):
+        stories = list(stories)
+        first, last = stories[0], stories[-1]
+        picture = first['user__profile__profile_picture']
+        if picture:
+            picture = storage.url(picture)
+            picture = request.build_absolute_uri(picture) if request is not None else picture
+        tray.append({
+            'user': {
+                'id': user_id,
+                'username': first['user__username'],
+                'profile_id': first['user__profile__id'],
+                'profile_picture': picture or None,
+            },
+            'story_ids': [story['id'] for story in stories],
+            'latest_at': last['created_at'],
+            'expires_at': first['created_at'] + STORY_LIFETIME,
+        })
+    tray.sort(key=lambda entry: entry['latest_at'], reverse=True)
+    next_expiry = min((entry['expires_at'] for entry in tray), default=None)
+    for entry in tray:
+        entry['latest_at'] = created_at.to_representation(entry['latest_at'])
+        entry['expires_at'] = created_at.to_representation(entry['expires_at'])
+    return tray, next_expiry
+
+
+def tray_digest(user):
+    """
+    Digest of the accounts `user` follows and of their `story_owner` versions.
+
+    That version moves when the account's stories change or expire and when
+    its username or profile is saved, e.g. with a new picture, so the digest
+    only changes for the followers of that account; following or unfollowing
+    changes the set of accounts hashed.
+    """
+    Followers = Profile.followers.through
+    user_ids = sorted(
+        Followers.objects.filter(customeruser_id=user.id).values_list('profile__user_id', flat=True)
+    )
+    versions = versioning.get_versions('story_owner', user_ids)
+    digest = hashlib.blake2b(digest_size=16)
+    for user_id in user_ids:
+        digest.update(f'{user_id}:{versions[user_id].token};'.encode())
+    return digest.hexdigest()
+
+
+def get_story_tray(user, request=None):
+    """
+    The story tray of `user`, cached per viewer.
+
+    The cache key carries `tray_digest(user)`, so a story or profile change
+    only invalidates the trays of that account's followers, and the entry
+    lives until the first story of the tray expires, so a cached tray never
+    lists an expired story.
+    """
+    key = TRAY_KEY.format(user.id, tray_digest(user))
+    tray = cache.get(key)
+    if tray is not None:
+        return tray
+
+    tray, next_expiry = build_story_tray(user, request)
+    timeout = settings.STORY_TRAY_CACHE_TIMEOUT
+    if next_expiry is not None:
+        timeout = min(timeout, (next_expiry - now()).total_seconds())
+    if timeout >= 1:
+        cache.set(key, tray, timeout=int(timeout))
+    return tray
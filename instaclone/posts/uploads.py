@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.http import UnreadablePostError
+from django.utils.timezone import now
+
+from posts.models import UploadSession
+from utils import metrics
+from utils.background import run_periodically
+
+VIDEO_EXTENSIONS = {'mp4', 'm4v', 'mov', 'webm', 'mkv'}
+
+
+class UploadError(Exception):
+    """A request the upload session cannot accept; `status` is the HTTP status to answer with."""
+
+    def __init__(self, message:str, status:int=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class SessionFile(File):
+    """
+    The finished file of an upload session.
+
+    Local file storage moves a file with `temporary_file_path()` into place
+    instead of copying it, so attaching the video costs a rename.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(session:UploadSession):
+    return os.path.join(settings.UPLOAD_SESSION_DIR, f'{session.id}.part')
+
+
+def create_session(user, filename:str, size:int):
+    """Start an upload of `size` bytes, with an empty partial file to write the chunks into."""
+    filename = os.path.basename(filename or '')
+    extension = filename.rsplit('.', 1)[-1].lower() if '.' in filename else ''
+    if extension not in VIDEO_EXTENSIONS:
+        raise UploadError(f'Only {", ".join(sorted(VIDEO_EXTENSIONS))} videos can be uploaded.')
+    if not 0 < size <= settings.UPLOAD_MAX_SIZE:
+        raise UploadError(f'The size must be between 1 and {settings.UPLOAD_MAX_SIZE} bytes.')
+
+    session = UploadSession.objects.create(user=user, filename=filename, size=size)
+    os.makedirs(settings.UPLOAD_SESSION_DIR, exist_ok=True)
+    open(part_path(session), 'wb').close()
+    metrics.incr('uploads.sessions')
+    return session
+
+
+def write_chunk(session:UploadSession, offset:int, stream, length:int):
+    """
+    Write `length` bytes read from `stream` at `offset` of the partial file.
+
+    The body is copied UPLOAD_BUFFER_SIZE bytes at a time, so memory use does
+    not depend on the chunk or the video size. Chunks must start where the
+    received bytes end; when the client goes away mid-chunk, the bytes that
+    arrived are kept and the upload resumes from them.
+
+    The body is received into a temporary file first. Only the chunk whose
+    conditional UPDATE of the offset wins is copied into the partial file,
+    inside the same transaction, so of two concurrent chunks at one offset
+    the losing one never touches the file.
+
+    Returns:
+        int: The new offset.
+    """
+    if offset != session.offset:
+        raise UploadError('The chunk must start at the current offset.', status=409, offset=session.offset)
+    if length <= 0 or length > settings.UPLOAD_CHUNK_MAX_SIZE:
+        raise UploadError(f'A chunk holds between 1 and {settings.UPLOAD_CHUNK_MAX_SIZE} bytes.')
+    if offset + length > session.size:
+        raise UploadError('The chunk goes past the size of the upload.', offset=session.offset)
+    if not os.path.exists(part_path(session)):
+        raise UploadError('The upload session has expired.', status=404)
+
+    # Only reading the body may fail quietly; a failed write, e.g. a full disk,
+    # is an error of the server and must not be recorded as received bytes.
+    written = 0
+    with tempfile.TemporaryFile(dir=settings.UPLOAD_SESSION_DIR) as received:
+        while written < length:
+            try:
+                data = stream.read(min(settings.UPLOAD_BUFFER_SIZE, length - written))
+            except (UnreadablePostError, ConnectionError):
+                # The client disconnected: keep what was received.
+                break
+            if not data:
+                break
+            received.write(data)
+            written += len(data)
+
+        with transaction.atomic():
+            # Only one of two concurrent chunks at the same offset is accepted;
+            # the row stays locked until its bytes are in the partial file.
+            if not UploadSession.objects.filter(id=session.id, offset=offset).update(offset=offset + written):
+                session.refresh_from_db(fields=['offset'])
+                raise UploadError('Another chunk was written at this offset.', status=409, offset=session.offset)
+            try:
+                part = open(part_path(session), 'r+b')
+            except FileNotFoundError:
+                raise UploadError('The upload session has expired.', status=404)
+            with part:
+                part.seek(offset)
+                part.truncate()
+                received.seek(0)
+                shutil.copyfileobj(received, part, settings.UPLOAD_BUFFER_SIZE)
+
+    session.offset = offset + written
+    metrics.incr('uploads.bytes', written)
+    return session.offset
+
+
+def open_upload(session:UploadSession):
+    """The finished video of a session, to assign to a `FileField`. Close it once the row is saved."""
+    if session.offset != session.size:
+        raise UploadError('The upload is not complete.', status=409, offset=session.offset)
+    return SessionFile(open(part_path(session), 'rb'), name=session.filename)
+
+
+def delete_session(session:UploadSession):
+    UploadSession.objects.filter(id=session.id).delete()
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def expire_sessions():
+    """Delete the sessions started more than UPLOAD_SESSION_LIFETIME seconds ago, with their partial files."""
+    cutoff = now() - timedelta(seconds=settings.UPLOAD_SESSION_LIFETIME)
+    expired = list(UploadSession.objects.filter(created_at__lt=cutoff).only('id'))
+    for session in expired:
+        delete_session(session)
+    metrics.incr('uploads.expired', len(expired))
+    return len(expired)
+
+
+def schedule_expiry():
+    """Start, once per process, the removal of abandoned upload sessions every UPLOAD_SESSION_SWEEP_INTERVAL seconds."""
+    run_periodically('expire_upload_sessions', settings.UPLOAD_SESSION_SWEEP_INTERVAL, expire_sessions)
+
+
+def upload_metrics():
+    counters = metrics.get_counters('uploads.sessions', 'uploads.completed', 'uploads.bytes', 'uploads.expired')
+    return {
+        'sessions': counters['uploads.sessions'],
+        'completed': counters['uploads.completed'],
+        'bytes': counters['uploads.bytes'],
+        'expired': counters['uploads.expired'],
+    }
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.13 on 2026-10-18 11:02
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_followers(apps, schema_editor):
+    Profile = apps.get_model('profiles', 'Profile')
+    Followers = Profile.followers.through
+    counts = Followers.objects.filter(profile_id=OuterRef('pk')).order_by().values('profile_id') \
+        .annotate(count=Count('id')).values('count')
+    Profile.objects.update(follower_count=Coalesce(Subquery(counts), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('profiles', '0002_profile_picture_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_followers, migrations.RunPython.noop),
+    ]
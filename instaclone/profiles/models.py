@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
 from django.contrib.auth.models import AbstractUser
 
 
@@ -13,6 +14,18 @@ class CustomerUser(AbstractUser):
         return f'{self.email}'
 
 
+class ProfileQuerySet(models.QuerySet):
+    def visible_to(self, user):
+        """Profiles `user` may see: their own, open ones, and private ones they follow."""
+        if user.is_authenticated and user.is_staff:
+            return self
+        condition = Q(profile_status=self.model.OPEN_PROFILE)
+        if user.is_authenticated:
+            follows = self.model.followers.through.objects.filter(profile_id=OuterRef('pk'), customeruser_id=user.id)
+            condition |= Q(user_id=user.id) | Exists(follows)
+        return self.filter(condition)
+
+
 class Profile(models.Model):
     user = models.OneToOneField(CustomerUser, on_delete=models.CASCADE, related_name='profile')
     followers = models.ManyToManyField(CustomerUser, related_name='followings', symmetrical=False, blank=True)
@@ -27,10 +40,23 @@ class Profile(models.Model):
 
     profile_status = models.CharField(max_length=25, choices=STATUS_LIST, default=OPEN_PROFILE)
     profile_picture = models.ImageField(upload_to='profile_images/', null=True, blank=True)
+    profile_picture_width = models.PositiveIntegerField(null=True, blank=True)
+    profile_picture_height = models.PositiveIntegerField(null=True, blank=True)
+    profile_picture_size = models.PositiveBigIntegerField(null=True, blank=True)
     bio = models.CharField(max_length=150, null=True, blank=True)
+    # Kept in step with `followers` by `profiles.signals`, so the feed can find
+    # high-follower accounts without counting their followers.
+    follower_count = models.PositiveIntegerField(default=0)
     website_link = models.URLField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = ProfileQuerySet.as_manager()
+
+    def is_visible_to(self, user):
+        if self.profile_status == self.OPEN_PROFILE or user.is_staff or user.id == self.user_id:
+            return True
+        return user.is_authenticated and self.followers.filter(id=user.id).exists()
+
     def __str__(self):
         return f'{self.user.username}'
     
@@ -46,9 +46,9 @@ class CustomerUserRegisterDataSerializer(serializers.ModelSerializer):
 
 
 class ProfileSerializer(serializers.ModelSerializer):
-    posts = PostSerializer(many=True, read_only=True)
-    stories = StorySerializer(many=True, read_only=True)
+    posts = PostSerializer(source='user.posts', many=True, read_only=True)
+    stories = StorySerializer(source='user.stories', many=True, read_only=True)
     class Meta:
         model = Profile
         fields = '__all__'
-        exclude = ['id']
+        read_only_fields = ['profile_picture_width', 'profile_picture_height', 'profile_picture_size', 'follower_count']
@@ -0,0 +1,98 @@
+from collections import Counter, defaultdict
+
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts.timeline import remove_follows
+from profiles.models import CustomerUser, Profile
+from utils import versioning
+from utils.media import record_media_metadata
+
+
+@receiver(pre_save, sender=Profile)
+def profile_picture_uploaded(sender, instance, **kwargs):
+    record_media_metadata(instance)
+
+
+@receiver([post_save, post_delete], sender=Profile)
+def profile_changed(sender, instance, **kwargs):
+    versioning.bump('profile', instance.pk)
+    versioning.bump('profiles')
+    # The story tray shows the username and picture of every followed account.
+    versioning.bump('story_owner', instance.user_id)
+
+
+@receiver(post_save, sender=CustomerUser)
+def username_changed(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'username' in update_fields:
+        versioning.bump('story_owner', instance.pk)
+
+
+def follows_of(instance, pk_set):
+    """`(follower_ids, author_ids)` of the follows an m2m change of `instance` touches."""
+    if isinstance(instance, Profile):
+        followers = pk_set if pk_set is not None else instance.followers.values_list('id', flat=True)
+        return list(followers), [instance.user_id]
+    profiles = Profile.objects.filter(id__in=pk_set) if pk_set is not None else instance.followings.all()
+    return [instance.pk], list(profiles.values_list('user_id', flat=True))
+
+
+def followed_profiles(instance, pk_set):
+    """Profile id of each existing follow an m2m change of `instance` touches, once per follow."""
+    Followers = Profile.followers.through
+    if isinstance(instance, Profile):
+        follows = Followers.objects.filter(profile_id=instance.pk)
+        if pk_set is not None:
+            follows = follows.filter(customeruser_id__in=pk_set)
+    else:
+        follows = Followers.objects.filter(customeruser_id=instance.pk)
+        if pk_set is not None:
+            follows = follows.filter(profile_id__in=pk_set)
+    return list(follows.values_list('profile_id', flat=True))
+
+
+def add_to_follower_counts(profile_ids, sign:int):
+    """Move the `follower_count` of each profile by `sign` per occurrence in `profile_ids`, one UPDATE per step size."""
+    steps = defaultdict(list)
+    for profile_id, count in Counter(profile_ids).items():
+        steps[count].append(profile_id)
+    for count, ids in steps.items():
+        Profile.objects.filter(id__in=ids).update(
+            follower_count=Greatest(F('follower_count') + sign * count, Value(0))
+        )
+
+
+@receiver(m2m_changed, sender=Profile.followers.through)
+def followers_changed(sender, instance, action, pk_set=None, **kwargs):
+    # post_remove and post_clear no longer know the follows they removed, so they are read before.
+    if action in ('pre_remove', 'pre_clear'):
+        instance._removed_followings = followed_profiles(instance, pk_set)
+        if action == 'pre_clear':
+            instance._cleared_follows = follows_of(instance, None)
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if action == 'post_add':
+        # pk_set only holds the follows that did not exist yet.
+        added = [instance.pk] * len(pk_set) if isinstance(instance, Profile) else list(pk_set)
+        add_to_follower_counts(added, 1)
+        profile_ids = set(added)
+    else:
+        removed = instance.__dict__.pop('_removed_followings', [])
+        add_to_follower_counts(removed, -1)
+        profile_ids = set(removed)
+        if action == 'post_remove':
+            remove_follows(*follows_of(instance, pk_set))
+        else:
+            remove_follows(*instance.__dict__.pop('_cleared_follows', ([], [])))
+
+    with versioning.coalesced():
+        for profile_id in profile_ids:
+            versioning.bump('profile', profile_id)
+        versioning.bump('profiles')
+        # Following or unfollowing a private profile changes which posts and stories are visible.
+        versioning.bump('posts')
+        versioning.bump('stories')
@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+_periodic_tasks = {}
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.BACKGROUND_TASK_WORKERS,
+                thread_name_prefix='instaclone-background',
+            )
+    return _executor
+
+
+def _run(func, args, kwargs):
+    close_old_connections()
+    try:
+        func(*args, **kwargs)
+    except Exception:
+        logger.exception('Background task %s failed', func.__name__)
+    finally:
+        close_old_connections()
+
+
+def run_in_background(func, *args, **kwargs):
+    """Run `func(*args, **kwargs)` on the background pool once the current transaction commits."""
+    if settings.BACKGROUND_TASKS_EAGER:
+        transaction.on_commit(lambda: func(*args, **kwargs))
+        return
+    transaction.on_commit(lambda: _get_executor().submit(_run, func, args, kwargs))
+
+
+def _loop(interval, func):
+    while True:
+        time.sleep(interval)
+        _run(func, (), {})
+
+
+def run_periodically(name:str, interval:float, func):
+    """Start, once per process, a daemon thread that calls `func()` every `interval` seconds."""
+    with _executor_lock:
+        if name in _periodic_tasks:
+            return
+        thread = threading.Thread(target=_loop, args=(interval, func), name=f'instaclone-{name}', daemon=True)
+        _periodic_tasks[name] = thread
+    thread.start()
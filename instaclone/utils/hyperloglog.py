@@ -0,0 +1,55 @@
+import hashlib
+import math
+
+
+class HyperLogLog:
+    """
+    HyperLogLog sketch of a set of values, using `2 ** precision` one-byte registers.
+
+    Adding a value is O(1) and the size is fixed whatever the number of values;
+    `count()` estimates the number of distinct values with a standard error of
+    about `1.04 / sqrt(2 ** precision)`. Values are hashed with BLAKE2b, so
+    sketches built in different processes can be merged.
+    """
+
+    def __init__(self, precision:int, registers:bytes=None):
+        if not 4 <= precision <= 16:
+            raise ValueError('precision must be between 4 and 16')
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(registers) if registers is not None else bytearray(self.size)
+        if len(self.registers) != self.size:
+            raise ValueError(f'a sketch of precision {precision} has {self.size} registers')
+
+    @classmethod
+    def from_bytes(cls, data:bytes):
+        return cls(len(data).bit_length() - 1, data)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+    def add(self, value):
+        hashed = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = hashed >> (64 - self.precision)
+        rest = (hashed << self.precision) & 0xFFFFFFFFFFFFFFFF
+        rank = 64 - rest.bit_length() + 1 if rest else 64 - self.precision + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def update(self, values):
+        for value in values:
+            self.add(value)
+
+    def merge(self, other:'HyperLogLog'):
+        if other.precision != self.precision:
+            raise ValueError('only sketches of the same precision can be merged')
+        self.registers = bytearray(max(pair) for pair in zip(self.registers, other.registers))
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size * self.size / sum(2.0 ** -register for register in self.registers)
+        empty = self.registers.count(0)
+        if estimate <= 2.5 * self.size and empty:
+            # Linear counting is more accurate while many registers are still empty.
+            estimate = self.size * math.log(self.size / empty)
+        return int(round(estimate))
@@ -0,0 +1,107 @@
+import io
+
+from PIL import Image, ImageOps
+
+# This module must not import Django: its functions run in worker processes.
+
+SAVE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+ORIENTATION = 0x0112
+ROTATED = (5, 6, 7, 8)
+# Image metadata that can identify a user or a place, dropped from uploads.
+PRIVATE_INFO = ('exif', 'xmp', 'XML:com.adobe.xmp', 'photoshop', 'comment')
+
+
+def strip_metadata(data:bytes):
+    """
+    Read the size of an image and drop its EXIF and similar metadata.
+
+    Images without such metadata are left as they are. The others are saved
+    again in their own format, rotated upright first when EXIF says so; JPEGs
+    that need no rotation keep their quantization tables, so they lose no
+    quality.
+
+    Returns:
+        tuple: `(data, width, height)`, where `data` is None when the image was left as it is.
+    """
+    with Image.open(io.BytesIO(data)) as image:
+        private = [key for key in PRIVATE_INFO if key in image.info]
+        orientation = image.getexif().get(ORIENTATION, 1)
+        if (not private and orientation == 1) or getattr(image, 'is_animated', False):
+            width, height = image.size
+            if orientation in ROTATED:
+                width, height = height, width
+            return None, width, height
+
+        image_format = image.format
+        options = {}
+        if image.info.get('icc_profile'):
+            options['icc_profile'] = image.info['icc_profile']
+        if image_format == 'JPEG':
+            options['quality'] = 'keep' if orientation == 1 else 95
+            options['subsampling'] = 'keep' if orientation == 1 else 0
+            options['comment'] = b''
+        elif image_format == 'WEBP':
+            options['lossless'] = image.info.get('lossless', False)
+            options['quality'] = 90
+        upright = ImageOps.exif_transpose(image) if orientation != 1 else image
+        buffer = io.BytesIO()
+        upright.save(buffer, format=image_format, **options)
+        return buffer.getvalue(), upright.width, upright.height
+
+
+def render_image(data:bytes, sizes:dict, formats:tuple):
+    """
+    Render the renditions of an image.
+
+    Args:
+        data (bytes): The original image file.
+        sizes (dict): `{name: (width, height, crop)}`. Cropped renditions fill exactly
+            `width` x `height`; the others fit inside it, never upscaled.
+        formats (tuple): Output formats, keys of `SAVE_OPTIONS`.
+
+    Returns:
+        dict: `{name: {'width', 'height', <format>: bytes, ...}}`.
+    """
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGB')
+
+    # Largest first: each rendition is resized from the smallest uncropped one
+    # already made that is still big enough, which is much cheaper than
+    # resampling the full original every time.
+    sources = [image]
+    renditions = {}
+    for name, (width, height, crop) in sorted(sizes.items(), key=lambda item: -item[1][0] * item[1][1]):
+        if crop:
+            scale = max(width / image.width, height / image.height)
+        else:
+            scale = min(width / image.width, height / image.height, 1)
+        source = min(
+            (
+                source for source in sources
+                if source is image or (source.width >= image.width * scale and source.height >= image.height * scale)
+            ),
+            key=lambda source: source.width,
+        )
+        if crop:
+            rendition = ImageOps.fit(source, (width, height), Image.Resampling.LANCZOS)
+        else:
+            rendition = source.copy()
+            rendition.thumbnail((width, height), Image.Resampling.LANCZOS)
+            sources.append(rendition)
+        output = {'width': rendition.width, 'height': rendition.height}
+        for output_format in formats:
+            buffer = io.BytesIO()
+            rendition.save(buffer, **SAVE_OPTIONS[output_format])
+            output[output_format] = buffer.getvalue()
+        renditions[name] = output
+    return {name: renditions[name] for name in sizes}
+
+
+def rendition_files(renditions:dict):
+    """The stored file names of a `renditions` value, `{name: {'width', 'height', <format>: name, ...}}`."""
+    return {value for entry in renditions.values() for key, value in entry.items() if key in EXTENSIONS}
@@ -0,0 +1,115 @@
+import logging
+import struct
+
+from django.core.files.base import ContentFile
+from django.db import models
+from PIL import UnidentifiedImageError
+
+from utils.images import strip_metadata
+
+logger = logging.getLogger(__name__)
+
+
+def _boxes(file, start:int, end:int):
+    """Yield `(type, payload start, payload end)` for the boxes of an MP4 file between `start` and `end`."""
+    position = start
+    while end is None or position + 8 <= end:
+        file.seek(position)
+        header = file.read(8)
+        if len(header) < 8:
+            return
+        size, box_type = struct.unpack('>I4s', header)
+        payload = position + 8
+        if size == 1:
+            size = struct.unpack('>Q', file.read(8))[0]
+            payload += 8
+        elif size == 0:
+            yield box_type, payload, end
+            return
+        if size < payload - position:
+            return
+        yield box_type, payload, position + size
+        position += size
+
+
+def video_duration(file):
+    """
+    Duration in seconds of an MP4 or QuickTime video, read from its movie header.
+
+    Only the box headers are read: the media data is skipped over, whatever
+    its size. Returns None for other containers or damaged files.
+    """
+    try:
+        for box_type, start, end in _boxes(file, 0, None):
+            if box_type != b'moov':
+                continue
+            for child_type, child_start, _ in _boxes(file, start, end):
+                if child_type != b'mvhd':
+                    continue
+                file.seek(child_start)
+                version = file.read(4)[0]
+                if version == 1:
+                    _, _, timescale, duration = struct.unpack('>QQIQ', file.read(28))
+                else:
+                    _, _, timescale, duration = struct.unpack('>IIII', file.read(16))
+                return round(duration / timescale, 3) if timescale else None
+    except (struct.error, IndexError, OSError):
+        return None
+    return None
+
+
+def media_fields(model):
+    """The file fields of `model` with metadata columns, named `<field>_size`, `<field>_width`, ..."""
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and hasattr(model, f'{field.name}_size')
+    ]
+
+
+def read_metadata(field, file):
+    """
+    Read the metadata columns of a file, dropping EXIF from images.
+
+    Returns:
+        tuple: `(columns, data)`: the column values by name and, when the image
+        had metadata to drop, the bytes to store instead of the file.
+    """
+    name = field.name
+    data = None
+    if isinstance(field, models.ImageField):
+        file.seek(0)
+        try:
+            data, width, height = strip_metadata(file.read())
+        except (UnidentifiedImageError, OSError, ValueError):
+            logger.warning('Could not read the image %s', file.name)
+            width = height = None
+        columns = {f'{name}_width': width, f'{name}_height': height}
+        columns[f'{name}_size'] = len(data) if data is not None else file.size
+    else:
+        columns = {f'{name}_size': file.size, f'{name}_duration': video_duration(file)}
+    file.seek(0)
+    return columns, data
+
+
+def record_media_metadata(instance):
+    """
+    Fill the metadata columns of the files uploaded to `instance`, before it is saved.
+
+    Only newly assigned files are read, once, while the upload is still in
+    memory or in a temporary file; images are stored without their EXIF.
+    Serializers read the columns, so files are never opened to lay them out.
+    """
+    for field in media_fields(type(instance)):
+        file = getattr(instance, field.name)
+        if not file:
+            for column in (f'{field.name}_{suffix}' for suffix in ('size', 'width', 'height', 'duration')):
+                if hasattr(instance, column):
+                    setattr(instance, column, None)
+            continue
+        if file._committed:
+            continue
+        columns, data = read_metadata(field, file)
+        for column, value in columns.items():
+            setattr(instance, column, value)
+        if data is not None:
+            setattr(instance, field.name, ContentFile(data, name=file.name))
@@ -0,0 +1,26 @@
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+
+KEY_PREFIX = 'metrics:'
+
+
+def incr(name:str, amount:int=1, using:str=DEFAULT_CACHE_ALIAS):
+    """Atomically add `amount` to a named counter kept in the cache `using`."""
+    cache = caches[using]
+    key = f'{KEY_PREFIX}{name}'
+    if cache.add(key, amount, timeout=None):
+        return amount
+    try:
+        return cache.incr(key, amount)
+    except ValueError:
+        cache.set(key, amount, timeout=None)
+        return amount
+
+
+def get_counters(*names:str, using:str=DEFAULT_CACHE_ALIAS):
+    """Return the current value of each named counter, 0 if never incremented."""
+    values = caches[using].get_many([f'{KEY_PREFIX}{name}' for name in names])
+    return {name: values.get(f'{KEY_PREFIX}{name}', 0) for name in names}
+
+
+def ratio(numerator:int, denominator:int):
+    return round(numerator / denominator, 4) if denominator else None
@@ -0,0 +1,92 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from utils import metrics, versioning
+
+KEY_PREFIX = 'response:'
+
+
+class GenerationalResponseCache:
+    """
+    Cache of response payloads keyed by the generation of a collection version.
+
+    Bumping the collection version (see `utils.versioning`) moves every reader
+    to new keys, so invalidation is O(1) and no key is ever scanned. The last
+    payload of each variant is also kept for `stale_timeout` seconds: when the
+    current entry is missing, a single worker takes a lock and rebuilds it
+    while the others keep serving that previous copy.
+
+    Payloads, locks and hit counters live in the RESPONSE_CACHE_ALIAS cache.
+    Rebuilds are only coalesced across worker processes when that cache is
+    shared by them, like the database cache configured by default; with a
+    per-process backend such as LocMemCache each process rebuilds on its own.
+    """
+
+    def __init__(self, name:str, kind:str, timeout:int, stale_timeout:int, lock_timeout:int):
+        self.name = name
+        self.kind = kind
+        self.timeout = timeout
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+
+    @property
+    def cache(self):
+        return caches[settings.RESPONSE_CACHE_ALIAS]
+
+    def _count(self, event:str):
+        metrics.incr(f'{self.name}.{event}', using=settings.RESPONSE_CACHE_ALIAS)
+
+    def _keys(self, token:str, variant:str):
+        digest = hashlib.blake2b(variant.encode(), digest_size=16).hexdigest()
+        base = f'{KEY_PREFIX}{self.name}:'
+        return f'{base}{token}:{digest}', f'{base}last:{digest}', f'{base}lock:{digest}'
+
+    def get_or_build(self, variant:str, build):
+        """
+        Return `(payload, token)` for `variant`, rebuilding it in one worker at a time once a copy exists.
+
+        `token` is the collection version the payload was built for; it differs
+        from the current one when a stale copy is served. Payloads of None are
+        never cached.
+        """
+        token = versioning.get_list_version(self.kind).token
+        fresh_key, last_key, lock_key = self._keys(token, variant)
+        cache = self.cache
+
+        payload = cache.get(fresh_key)
+        if payload is not None:
+            self._count('hits')
+            return payload, token
+
+        last = cache.get(last_key)
+        if last is not None and not cache.add(lock_key, 1, timeout=self.lock_timeout):
+            self._count('stale')
+            return last
+
+        self._count('misses')
+        try:
+            payload = build()
+            self._count('rebuilds')
+            if payload is not None:
+                cache.set(fresh_key, payload, timeout=self.timeout)
+                cache.set(last_key, (payload, token), timeout=self.stale_timeout)
+        finally:
+            if last is not None:
+                cache.delete(lock_key)
+        return payload, token
+
+    def get_metrics(self):
+        counters = metrics.get_counters(
+            f'{self.name}.hits', f'{self.name}.misses', f'{self.name}.stale', f'{self.name}.rebuilds',
+            using=settings.RESPONSE_CACHE_ALIAS,
+        )
+        hits, misses, stale = (counters[f'{self.name}.{name}'] for name in ('hits', 'misses', 'stale'))
+        return {
+            'hits': hits,
+            'misses': misses,
+            'stale_served': stale,
+            'rebuilds': counters[f'{self.name}.rebuilds'],
+            'hit_rate': metrics.ratio(hits + stale, hits + stale + misses),
+        }
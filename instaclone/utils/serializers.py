@@ -0,0 +1,135 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import QuerySet
+from django.db.models.manager import BaseManager
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+_plans = {}
+
+# Each plan entry holds a converter factory. Factories are bound once per
+# render, so per-request state (the request, the active time zone) is looked
+# up once per list instead of once per value.
+
+
+def _identity_factory(request):
+    return lambda value: value
+
+
+def _plain_factory(field):
+    to_representation = field.to_representation
+    return lambda request: to_representation
+
+
+def file_url_factory(storage):
+    """
+    Representation factory of the files of `storage`: `factory(request)` returns a
+    function turning a stored file name into its absolute URL, or None for no file.
+    """
+    def bind(request):
+        def convert(name):
+            if not name:
+                return None
+            url = storage.url(name)
+            return request.build_absolute_uri(url) if request is not None else url
+        return convert
+    return bind
+
+
+def _datetime_factory(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return _plain_factory(field)
+
+    def bind(request):
+        field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+
+        def convert(value):
+            if field_timezone is None or isinstance(value, str) or not timezone.is_aware(value):
+                return field.to_representation(value)
+            value = value.astimezone(field_timezone).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+    return bind
+
+
+def compile_plan(serializer_class):
+    """
+    Build, once per serializer class, the list of `(key, column, factory)`
+    needed to render a `.values()` row exactly like the serializer would.
+
+    Returns None when a readable field cannot be read straight from a column
+    (nested serializers, dotted sources, method fields, many-to-many), in which
+    case callers fall back to the regular DRF path. Custom fields that need the
+    request can provide `representation_factory(model_field)`, returning a
+    factory like the ones below.
+    """
+    if serializer_class in _plans:
+        return _plans[serializer_class]
+
+    serializer = serializer_class()
+    model = serializer.Meta.model
+    plan = []
+    for field in serializer._readable_fields:
+        source = field.source
+        if source == '*' or '.' in source or isinstance(field, (serializers.BaseSerializer, serializers.ManyRelatedField)):
+            plan = None
+            break
+        try:
+            model_field = model._meta.get_field(source)
+        except FieldDoesNotExist:
+            plan = None
+            break
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField) and field.pk_field is None:
+            factory = _identity_factory
+        elif isinstance(field, serializers.RelatedField):
+            plan = None
+            break
+        elif hasattr(field, 'representation_factory'):
+            factory = field.representation_factory(model_field)
+        elif isinstance(field, serializers.FileField):
+            factory = file_url_factory(model_field.storage)
+        elif isinstance(field, serializers.DateTimeField):
+            factory = _datetime_factory(field)
+        else:
+            factory = _plain_factory(field)
+        plan.append((field.field_name, model_field.attname, factory))
+
+    _plans[serializer_class] = plan
+    return plan
+
+
+class CompiledListSerializer(serializers.ListSerializer):
+    """
+    Read-only fast path for `many=True` serialization.
+
+    Querysets are read with `.values()` and lists of `.values()` rows are used
+    as they are; each row is rendered with the precompiled plan of the child
+    serializer, skipping DRF's per-field attribute lookup. The output is the
+    same as the regular path, which is still used for model instances and for
+    serializers the plan cannot express.
+    """
+
+    def to_representation(self, data):
+        plan = compile_plan(type(self.child))
+        if plan is None:
+            return super().to_representation(data)
+        if isinstance(data, BaseManager):
+            data = data.all()
+        if isinstance(data, QuerySet):
+            rows = data.values(*[column for _, column, _ in plan])
+        elif isinstance(data, list) and all(isinstance(row, dict) for row in data):
+            rows = data
+        else:
+            return super().to_representation(data)
+
+        request = self.context.get('request')
+        converters = [(key, column, bind(request)) for key, column, bind in plan]
+        return [
+            {
+                key: None if row[column] is None else convert(row[column])
+                for key, column, convert in converters
+            }
+            for row in rows
+        ]
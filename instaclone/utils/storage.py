@@ -0,0 +1,242 @@
+import hashlib
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, models, transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from utils import metrics
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    File storage keeping one copy of each distinct file.
+
+    Saved files are hashed with SHA-256 while they are streamed to a temporary
+    file and stored as `MEDIA_BLOB_DIR/ab/cd/<digest>.<extension>`, whatever
+    name they were saved under. Saving a file that is already stored adds a
+    reference to its `MediaBlob` row instead of writing it again; `delete()`
+    removes a reference, and `collect_garbage()` removes the blobs nobody
+    references any more. Names outside MEDIA_BLOB_DIR, uploaded before the
+    storage was content-addressed, are saved and deleted as plain files.
+    """
+
+    def blob_name(self, digest:str, name:str):
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join((settings.MEDIA_BLOB_DIR, digest[:2], digest[2:4], digest + extension))
+
+    def is_blob(self, name:str):
+        return name.startswith(settings.MEDIA_BLOB_DIR + '/')
+
+    def _hash_file(self, content):
+        """Hash `content`, copying it to a temporary file unless it already is one; returns `(digest, path, size, ours)`."""
+        digest = hashlib.sha256()
+        if hasattr(content, 'temporary_file_path'):
+            path = content.temporary_file_path()
+            content.seek(0)
+            for chunk in content.chunks():
+                digest.update(chunk)
+            return digest.hexdigest(), path, os.path.getsize(path), False
+
+        directory = self.path(os.path.join(settings.MEDIA_BLOB_DIR, 'tmp'))
+        os.makedirs(directory, exist_ok=True)
+        size = 0
+        with tempfile.NamedTemporaryFile(dir=directory, delete=False) as temporary:
+            for chunk in content.chunks():
+                if isinstance(chunk, str):
+                    chunk = chunk.encode()
+                digest.update(chunk)
+                temporary.write(chunk)
+                size += len(chunk)
+        return digest.hexdigest(), temporary.name, size, True
+
+    def _save(self, name, content):
+        digest, source, size, ours = self._hash_file(content)
+        name = self.blob_name(digest, name)
+        # The reference is taken before looking at the file: the collector deletes
+        # a blob's row and file in one transaction, so once this returns the file
+        # is either kept or already gone.
+        created = add_reference(name, size)
+        path = self.path(name)
+        if os.path.exists(path):
+            if ours:
+                os.remove(source)
+            metrics.incr('media_blobs.dedup_hits')
+            metrics.incr('media_blobs.bytes_saved', size)
+            return name
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Like FileSystemStorage, temporary upload files are moved into place rather than copied.
+        file_move_safe(source, path, allow_overwrite=True)
+        if self.file_permissions_mode is not None:
+            os.chmod(path, self.file_permissions_mode)
+        if created:
+            metrics.incr('media_blobs.stored')
+        return name
+
+    def delete(self, name):
+        if not name:
+            raise ValueError('The name must be given to delete().')
+        if self.is_blob(name):
+            release_references([name])
+        else:
+            super().delete(name)
+
+
+def add_reference(name:str, size:int):
+    """Count one more reference to the blob `name`; True when its row was created."""
+    from posts.models import MediaBlob
+
+    for _ in range(2):
+        if MediaBlob.objects.filter(name=name).update(ref_count=F('ref_count') + 1, released_at=None):
+            return False
+        try:
+            with transaction.atomic():
+                MediaBlob.objects.create(name=name, size=size, ref_count=1)
+            return True
+        except IntegrityError:
+            continue
+    raise IntegrityError(f'Could not reference the media blob {name}')
+
+
+def release_references(names):
+    """Drop one reference to each blob in `names` (a name listed twice loses two)."""
+    from posts.models import MediaBlob
+
+    by_count = {}
+    for name, count in Counter(names).items():
+        by_count.setdefault(count, []).append(name)
+    for count, group in by_count.items():
+        MediaBlob.objects.filter(name__in=group).update(ref_count=F('ref_count') - count)
+    MediaBlob.objects.filter(name__in=set(names), ref_count__lte=0, released_at=None).update(released_at=now())
+
+
+def content_addressed_fields(model):
+    return [
+        field for field in model._meta.concrete_fields
+        if isinstance(field, models.FileField) and isinstance(field.storage, ContentAddressedStorage)
+    ]
+
+
+def remember_replaced_files(instance):
+    """Before a save, note the stored files of `instance` that newly uploaded ones replace."""
+    fields = [
+        field for field in content_addressed_fields(type(instance))
+        if getattr(instance, field.name) is not None and not getattr(instance, field.name)._committed
+    ]
+    if not fields or instance.pk is None:
+        return
+    row = type(instance).objects.filter(pk=instance.pk).values(*[field.attname for field in fields]).first()
+    if row:
+        instance._replaced_files = [(field, row[field.attname]) for field in fields if row[field.attname]]
+
+
+def release_replaced_files(instance):
+    """After a save, drop the references of the files noted by `remember_replaced_files`."""
+    for field, name in instance.__dict__.pop('_replaced_files', ()):
+        field.storage.delete(name)
+
+
+def release_files(instance):
+    """Drop the references of a deleted row to its content-addressed files."""
+    for field in content_addressed_fields(type(instance)):
+        name = getattr(instance, field.attname)
+        if name:
+            field.storage.delete(str(name))
+
+
+def collect_garbage(batch_size:int=None, grace:float=None):
+    """
+    Delete, in batches, the blobs that have had no reference for `grace` seconds.
+
+    Each blob's row and file are removed together in one transaction, so a
+    concurrent upload of the same content either keeps the blob alive or
+    stores it again. Returns `(blobs, bytes)` removed.
+    """
+    from posts.models import MediaBlob
+
+    storage = media_storage
+    batch_size = batch_size or settings.MEDIA_BLOB_GC_BATCH_SIZE
+    grace = settings.MEDIA_BLOB_GC_GRACE if grace is None else grace
+    cutoff = now() - timedelta(seconds=grace)
+    removed = removed_bytes = 0
+    last_id = 0
+    while True:
+        batch = list(
+            MediaBlob.objects.filter(id__gt=last_id, ref_count__lte=0, released_at__lt=cutoff)
+            .order_by('id').values_list('id', 'name', 'size')[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        for blob_id, name, size in batch:
+            with transaction.atomic():
+                if not MediaBlob.objects.filter(id=blob_id, ref_count__lte=0).delete()[0]:
+                    continue
+                try:
+                    os.remove(storage.path(name))
+                except FileNotFoundError:
+                    pass
+            removed += 1
+            removed_bytes += size
+    metrics.incr('media_blobs.collected', removed)
+    metrics.incr('media_blobs.collected_bytes', removed_bytes)
+    return removed, removed_bytes
+
+
+def recount_references(models_to_scan):
+    """Recompute every `ref_count` from the rows of `models_to_scan`, e.g. after rows were deleted outside Django."""
+    from posts.models import MediaBlob
+
+    counts = Counter()
+    for model in models_to_scan:
+        for field in content_addressed_fields(model):
+            names = model.objects.filter(**{f'{field.attname}__startswith': settings.MEDIA_BLOB_DIR + '/'})
+            counts.update(names.values_list(field.attname, flat=True).iterator())
+    updated = []
+    for blob in MediaBlob.objects.iterator():
+        ref_count = counts.get(blob.name, 0)
+        if ref_count != blob.ref_count:
+            blob.ref_count = ref_count
+            blob.released_at = now() if ref_count == 0 else None
+            updated.append(blob)
+    MediaBlob.objects.bulk_update(updated, ['ref_count', 'released_at'], batch_size=1000)
+    return len(updated)
+
+
+def blob_metrics():
+    """Stored and referenced bytes of the content-addressed storage, with the deduplication ratio."""
+    from posts.models import MediaBlob
+
+    totals = MediaBlob.objects.filter(ref_count__gt=0).aggregate(
+        blobs=models.Count('id'),
+        references=models.Sum('ref_count'),
+        stored=models.Sum('size'),
+        referenced=models.Sum(F('size') * F('ref_count')),
+    )
+    stored, referenced = totals['stored'] or 0, totals['referenced'] or 0
+    counters = metrics.get_counters(
+        'media_blobs.stored', 'media_blobs.dedup_hits', 'media_blobs.bytes_saved',
+        'media_blobs.collected', 'media_blobs.collected_bytes',
+    )
+    return {
+        'blobs': totals['blobs'],
+        'references': totals['references'] or 0,
+        'stored_bytes': stored,
+        'referenced_bytes': referenced,
+        'bytes_saved': referenced - stored,
+        'dedup_ratio': round(referenced / stored, 3) if stored else None,
+        'dedup_hits': counters['media_blobs.dedup_hits'],
+        'upload_bytes_saved': counters['media_blobs.bytes_saved'],
+        'collected': counters['media_blobs.collected'],
+        'collected_bytes': counters['media_blobs.collected_bytes'],
+    }
+
+
+media_storage = ContentAddressedStorage()
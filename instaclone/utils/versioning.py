@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+Version = namedtuple('Version', ['token', 'last_modified'])
+
+VERSION_KEY = '{}:{}'
+
+_coalescing = threading.local()
+
+
+def _key(kind:str, pk=None):
+    return VERSION_KEY.format(kind, '*' if pk is None else pk)
+
+
+def _new_row(key:str):
+    from posts.models import ContentVersion
+
+    return ContentVersion(key=key, token=uuid.uuid4().hex, last_modified=int(time.time()))
+
+
+def _read(keys):
+    from posts.models import ContentVersion
+
+    rows = ContentVersion.objects.filter(key__in=keys).values_list('key', 'token', 'last_modified')
+    return {key: Version(token, last_modified) for key, token, last_modified in rows}
+
+
+def _start(keys):
+    """Give the `keys` without a version one, keeping those another request started first."""
+    from posts.models import ContentVersion
+
+    ContentVersion.objects.bulk_create([_new_row(key) for key in keys], ignore_conflicts=True)
+    return _read(keys)
+
+
+def _write(rows):
+    from posts.models import ContentVersion
+
+    ContentVersion.objects.bulk_create(
+        rows, update_conflicts=True, unique_fields=['key'], update_fields=['token', 'last_modified']
+    )
+
+
+def bump(kind:str, pk=None):
+    """
+    Start a new version of one object (`pk`) or of a whole collection (`pk=None`).
+
+    Versions are random tokens kept in the `ContentVersion` table, which never
+    evicts them, so a validator only changes when its object does. A bump is
+    one INSERT ... ON CONFLICT DO UPDATE statement, or none inside `coalesced`.
+    """
+    row = _new_row(_key(kind, pk))
+    pending = getattr(_coalescing, 'rows', None)
+    if pending is not None:
+        pending[row.key] = row
+    else:
+        _write([row])
+    return Version(row.token, row.last_modified)
+
+
+@contextmanager
+def coalesced():
+    """
+    Hold back the bumps made by this thread inside the block and write them at the end.
+
+    Each version bumped in the block is written once, whatever the number of
+    bumps, and all of them in a single statement. Yields a list that receives
+    the number of versions written, for callers that count their writes.
+    """
+    if getattr(_coalescing, 'rows', None) is not None:
+        yield []
+        return
+    _coalescing.rows = {}
+    written = []
+    try:
+        yield written
+    finally:
+        rows, _coalescing.rows = _coalescing.rows, None
+    if rows:
+        _write(list(rows.values()))
+    written.append(len(rows))
+
+
+def get_version(kind:str, pk=None):
+    """
+    Return the current version, starting one if there is none.
+
+    Call it once the object is known to exist and be visible, so requests for
+    arbitrary ids do not fill the table with versions.
+    """
+    key = _key(kind, pk)
+    version = _read([key]).get(key)
+    if version is None:
+        version = _start([key])[key]
+    return version
+
+
+def get_versions(kind:str, pks):
+    """Return `{pk: version}` for many objects of `kind` with one query, starting the missing versions."""
+    keys = {_key(kind, pk): pk for pk in pks}
+    versions = _read(list(keys))
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions.update(_start(missing))
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_list_version(kind:str):
+    """
+    Version of the lists of a collection: its version, moved on every
+    CONDITIONAL_COUNTER_MAX_AGE seconds.
+
+    Like and comment counts only bump the version of their object, not of the
+    collection listing it, so a list validator also expires with the window
+    and a list never serves counts older than it.
+    """
+    version = get_version(kind)
+    window = int(time.time() // settings.CONDITIONAL_COUNTER_MAX_AGE) * settings.CONDITIONAL_COUNTER_MAX_AGE
+    return Version(f'{version.token}.{window}', max(version.last_modified, window))
+
+
+def get_etag(kind:str, version:Version, vary:str=''):
+    """Strong ETag for `version`; `vary` distinguishes viewers or query strings sharing one version."""
+    if vary:
+        digest = hashlib.blake2b(vary.encode(), digest_size=8).hexdigest()
+        return f'"{kind}-{version.token}-{digest}"'
+    return f'"{kind}-{version.token}"'
+
+
+def not_modified(request, kind:str, version:Version, vary:str=''):
+    """Return a 304 response when the client's `If-None-Match` / `If-Modified-Since` match `version`."""
+    return get_conditional_response(request, etag=get_etag(kind, version, vary), last_modified=version.last_modified)
+
+
+def set_validators(response, kind:str, version:Version, vary:str=''):
+    response['ETag'] = get_etag(kind, version, vary)
+    response['Last-Modified'] = http_date(version.last_modified)
+    return response